@@ -1,13 +1,26 @@
 import uvicorn
+import logging
 import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from src.database import init_db
+from src.database import close_db, init_db
+from src.models import Comment
+from src.backplane import MongoChangeStreamBackplane
+from src.cache import MongoCacheBackend, dashboard_comments_cache
+from src.websocket_manager import comment_connection_manager
+from src.middleware.jwt_middleware import init_auth_middleware, cleanup_auth_middleware, get_token_cache_stats
+from src.metrics import MetricsMiddleware, register_collectors
 from src.routes.comments_routes import router as comments_router
-from src.routes.websocket_routes import router as websocket_router
+from src.routes.health_routes import router as health_router
+from src.routes.metrics_routes import router as metrics_router
+from src.routes.websocket_routes import move_coalescer, router as websocket_router
 from src.graphql.schema import graphql_app 
 from src.config import Config
+from src.logger_config import setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 # Configurar CORS antes de crear la aplicación
 origins = [
@@ -21,15 +34,35 @@ origins = [
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Se ejecuta cuando la aplicación inicia."""
-    print("=== Starting Comments Service ===")
-    print(f"Registered routes:")
-    for route in app.routes:
-        print(f"  - {route.path} [{getattr(route, 'methods', 'WS' if 'websocket' in str(type(route)).lower() else 'N/A')}]")
-    await init_db()
+    logger.info("Starting Comments Service")
+    if logger.isEnabledFor(logging.DEBUG):
+        for route in app.routes:
+            logger.debug("Registered route %s %s", getattr(route, "path", route), getattr(route, "methods", "WS"))
+    app.state.mongo_client = await init_db()
+    await init_auth_middleware()
+    settings = Config()
+    if settings.BACKPLANE == "mongo":
+        events = Comment.get_motor_collection().database[settings.BACKPLANE_COLLECTION]
+        await comment_connection_manager.use_backplane(
+            MongoChangeStreamBackplane(events, settings.BACKPLANE_EVENT_TTL_SECONDS)
+        )
+    if settings.COMMENTS_CACHE_BACKEND == "mongo":
+        entries = Comment.get_motor_collection().database[settings.COMMENTS_CACHE_COLLECTION]
+        await dashboard_comments_cache.use_backend(MongoCacheBackend(entries))
     yield
+    # Guardar las posiciones de comentarios arrastrados aún pendientes
+    await move_coalescer.flush()
+    await comment_connection_manager.close_backplane()
+    await comment_connection_manager.shutdown()
+    await cleanup_auth_middleware()
+    close_db(app.state.mongo_client)
 
 app = FastAPI(lifespan=lifespan)
 
+# Métricas Prometheus: latencia por ruta y gauges leídos al hacer scrape
+app.add_middleware(MetricsMiddleware)
+register_collectors(comment_connection_manager, get_token_cache_stats, dashboard_comments_cache.stats)
+
 # Aplicar CORS middleware
 #app.add_middleware(
 #    CORSMiddleware,
@@ -43,14 +76,18 @@ app = FastAPI(lifespan=lifespan)
 app.include_router(comments_router, prefix="/comments", tags=["Comments"])
 # WebSocket
 app.include_router(websocket_router, prefix="/comments", tags=["WebSocket"])
+# Métricas y comprobaciones de salud
+app.include_router(metrics_router, tags=["Metrics"])
+app.include_router(health_router, tags=["Health"])
 # API GraphQL
 app.include_router(graphql_app, prefix="/graphql")
 
+def server_options(settings: Config) -> dict:
+    """Opciones de uvicorn.run; permessage-deflate ya está activo por defecto y solo se puede desactivar."""
+    options = {"host": os.getenv("SERVICE_HOST", "0.0.0.0"), "port": settings.SERVICE_PORT}
+    if not settings.WS_PER_MESSAGE_DEFLATE:
+        options["ws_per_message_deflate"] = False
+    return options
+
 if __name__ == "__main__":
-    settings = Config()
-    uvicorn.run(
-        "app:app",
-        host=os.getenv("SERVICE_HOST", "0.0.0.0"),
-        port=settings.SERVICE_PORT,
-        reload=True
-    )
\ No newline at end of file
+    uvicorn.run("app:app", reload=True, **server_options(Config()))
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""
+Run the benchmark suite and write one JSON file per benchmark.
+
+    python -m benchmarks                          # full sizes
+    python -m benchmarks --quick                  # small sizes, about a minute
+    python -m benchmarks --only rest_crud list_latency
+    python -m benchmarks --mongodb-url mongodb://localhost:27017/bench
+
+Results go to <output-dir>/<commit>/<benchmark>.json; compare two runs with
+python -m benchmarks.compare.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from benchmarks import (
+    broadcast_batching, broadcast_encoding, broadcast_fanout, frame_size, list_latency, logging_overhead, rest_crud,
+    token_validation,
+)
+from benchmarks.common import _git_commit, add_database_argument, emit
+
+# name -> (coroutine factory, quick arguments, full arguments)
+SUITE = {
+    "rest_crud": (rest_crud.main, {"operations": 200}, {"operations": 2000}),
+    "list_latency": (list_latency.main, {"sizes": [1000, 10000], "repeats": 3},
+                     {"sizes": [1000, 10000, 100000], "repeats": 5}),
+    "broadcast_fanout": (broadcast_fanout.main,
+                         {"subscriber_counts": [10, 1000], "events": 50, "include_sequential": False},
+                         {"subscriber_counts": [10, 100, 1000, 10000], "events": 200, "include_sequential": True}),
+    "broadcast_encoding": (broadcast_encoding.main, {"subscriber_counts": [1, 100], "events": 500},
+                           {"subscriber_counts": [1, 100, 1000], "events": 2000}),
+    "token_validation": (token_validation.main, {"validations": 200}, {"validations": 2000}),
+    "logging_overhead": (logging_overhead.main, {"events": 2000}, {"events": 20000}),
+    "frame_size": (frame_size.main, {"frames": 1000}, {"frames": 10000}),
+    "broadcast_batching": (broadcast_batching.main,
+                           {"subscriber_counts": [10, 100], "windows": [0, 20, 50], "events": 500},
+                           {"subscriber_counts": [10, 100, 1000], "windows": [0, 20, 50], "events": 2000}),
+}
+USES_DATABASE = {"rest_crud", "list_latency", "broadcast_fanout"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Small sizes, for a fast check.")
+    parser.add_argument("--only", nargs="+", choices=sorted(SUITE), help="Run only these benchmarks.")
+    parser.add_argument("--output-dir", default="benchmark-results")
+    add_database_argument(parser)
+    args = parser.parse_args()
+
+    directory = os.path.join(args.output_dir, _git_commit() or "unknown")
+    os.makedirs(directory, exist_ok=True)
+    for name in args.only or SUITE:
+        run, quick, full = SUITE[name]
+        kwargs = dict(quick if args.quick else full)
+        if name in USES_DATABASE:
+            kwargs["mongodb_url"] = args.mongodb_url
+        print(f"running {name}...", file=sys.stderr)
+        path = os.path.join(directory, f"{name}.json")
+        emit(name, asyncio.run(run(**kwargs)), path, echo=False)
+        print(f"  -> {path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Frames sent and CPU spent for a workshop-like burst, with and without the
+batching window (WS_BATCH_WINDOW_MS).
+
+A burst of comment events (20% created, 70% updates of recently created
+comments, 10% deleted) is broadcast at a fixed rate to every subscriber of
+one dashboard. For each window it reports:
+
+- frames_sent: send calls over all subscribers (one per frame per socket)
+- frames_per_second: frames_sent over the wall time of the burst
+- cpu_us_per_event: process CPU time per broadcast event, fan-out and sends included
+
+Batching adds at most the window to each event's delivery latency.
+
+    python -m benchmarks.broadcast_batching --subscribers 10 100 1000 --windows 0 20 50
+"""
+import asyncio
+import random
+import time
+
+from benchmarks.broadcast_encoding import make_comment
+from benchmarks.common import base_parser, emit
+from src.websocket_manager import CommentConnectionManager
+
+# Events broadcast per millisecond of the burst
+EVENTS_PER_TICK = 5
+
+
+class CountingWebSocket:
+    def __init__(self):
+        self.frames = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        self.frames += 1
+
+    async def close(self, code: int = 1000, reason: str = None):
+        pass
+
+
+def make_burst(events: int, seed: int = 7) -> list:
+    """(kind, comment) pairs; comment ids are reused by updates and deletes"""
+    rng = random.Random(seed)
+    recent = []
+    burst = []
+    for i in range(events):
+        roll = rng.random()
+        if roll < 0.2 or not recent:
+            comment = make_comment()
+            recent = (recent + [comment])[-20:]
+            burst.append(("created", comment))
+        elif roll < 0.9:
+            comment = dict(rng.choice(recent), content=f"Editado {i}")
+            burst.append(("updated", comment))
+        else:
+            comment = recent.pop(rng.randrange(len(recent)))
+            burst.append(("deleted", comment))
+    return burst
+
+
+async def run_burst(subscribers: int, window_ms: int, burst: list) -> dict:
+    manager = CommentConnectionManager(send_queue_size=1_000_000, broadcast_log_every=0, batch_window=window_ms / 1000)
+    sockets = [CountingWebSocket() for _ in range(subscribers)]
+    for socket in sockets:
+        await manager.connect(socket, "bench")
+
+    wall_started, cpu_started = time.perf_counter(), time.process_time()
+    for start in range(0, len(burst), EVENTS_PER_TICK):
+        for kind, comment in burst[start:start + EVENTS_PER_TICK]:
+            if kind == "created":
+                await manager.broadcast_comment_created("bench", comment)
+            elif kind == "updated":
+                await manager.broadcast_comment_updated("bench", comment)
+            else:
+                await manager.broadcast_comment_deleted("bench", str(comment["_id"]))
+        await asyncio.sleep(0.001)
+    # Let the last window close on its own, as it would in production
+    await asyncio.sleep(window_ms / 1000)
+    await manager.wait_until_idle()
+    wall, cpu = time.perf_counter() - wall_started, time.process_time() - cpu_started
+    await manager.shutdown()
+
+    frames = sum(socket.frames for socket in sockets)
+    return {
+        "subscribers": subscribers,
+        "window_ms": window_ms,
+        "events": len(burst),
+        "frames_sent": frames,
+        "frames_per_subscriber": frames // subscribers,
+        "frames_per_second": round(frames / wall),
+        "cpu_us_per_event": round(cpu / len(burst) * 1e6, 2),
+        "wall_s": round(wall, 3),
+    }
+
+
+async def main(subscriber_counts, windows, events: int):
+    burst = make_burst(events)
+    return [await run_burst(subscribers, window_ms, burst)
+            for subscribers in subscriber_counts for window_ms in windows]
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--windows", type=int, nargs="+", default=[0, 20, 50])
+    parser.add_argument("--events", type=int, default=2000)
+    args = parser.parse_args()
+    emit("broadcast_batching", asyncio.run(main(args.subscribers, args.windows, args.events)), args.output)
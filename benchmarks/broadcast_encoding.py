@@ -0,0 +1,129 @@
+"""
+Messages per second per core for encoding and fanning out one broadcast.
+
+Both variants go through the same CommentConnectionManager fan-out, so the
+difference is only the work done per event and per recipient:
+
+- "before": the previous path, with a hand-built dict, json.dumps per event,
+  and eager f-string log messages for every recipient (their cost is paid
+  even when INFO is disabled).
+- "after": the current path. The frame is encoded once from CommentOut and
+  the per-recipient loop only enqueues.
+
+    python -m benchmarks.broadcast_encoding --subscribers 1 100 1000
+"""
+import asyncio
+import json
+import logging
+import time
+import timeit
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from benchmarks.common import base_parser, emit
+from src.websocket_manager import CommentConnectionManager, encode_comment, encode_event
+
+logger = logging.getLogger("benchmarks.broadcast_encoding")
+
+
+class NullWebSocket:
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        pass
+
+    async def close(self, code: int = 1000, reason: str = None):
+        pass
+
+
+def make_comment() -> dict:
+    """A comment as returned by MongoDB."""
+    now = datetime.now(timezone.utc)
+    return {
+        "_id": ObjectId(),
+        "dashboard_id": ObjectId(),
+        "user_id": ObjectId(),
+        "user_name": "benchmark",
+        "content": "Gran dibujo",
+        "coordinates": [150.5, 320.0],
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def legacy_encode(comment: dict) -> str:
+    comment_dict = {
+        "_id": str(comment["_id"]),
+        "dashboard_id": str(comment["dashboard_id"]),
+        "user_id": str(comment["user_id"]),
+        "user_name": comment["user_name"],
+        "content": comment["content"],
+        "coordinates": comment["coordinates"],
+        "created_at": comment["created_at"].isoformat(),
+        "updated_at": comment["updated_at"].isoformat(),
+    }
+    return json.dumps({"type": "comment_created", "data": comment_dict})
+
+
+class LegacyManager(CommentConnectionManager):
+    """Fan-out with the per-recipient formatting of the previous implementation."""
+
+    async def broadcast_comment_created(self, dashboard_id: str, comment):
+        await self.broadcast_to_dashboard(dashboard_id, legacy_encode(comment))
+
+    def _fan_out(self, dashboard_id: str, message: str, sender=None):
+        connections = self.active_connections.get(dashboard_id)
+        if not connections:
+            return
+        logger.info(f"[BROADCAST] Dashboard: {dashboard_id}, Active dashboards: {list(self.active_connections.keys())}")
+        logger.info(f"[BROADCAST] Sending to {len(connections)} clients on dashboard {dashboard_id}: {message[:100]}...")
+        for connection in list(connections.values()):
+            connection.enqueue(message)
+            logger.info(f"[BROADCAST] ✅ Message sent successfully")
+
+
+async def messages_per_second(manager: CommentConnectionManager, comment: dict, subscribers: int, events: int) -> float:
+    for _ in range(subscribers):
+        await manager.connect(NullWebSocket(), "bench")
+    started = time.perf_counter()
+    for _ in range(events):
+        await manager.broadcast_comment_created("bench", comment)
+    await manager.wait_until_idle()
+    elapsed = time.perf_counter() - started
+    await manager.shutdown()
+    return events / elapsed
+
+
+async def main(subscriber_counts, events):
+    comment = make_comment()
+    encode_runs = 20000
+    results = [{
+        "stage": "encode",
+        "before_us_per_event": round(timeit.timeit(lambda: legacy_encode(comment), number=encode_runs) / encode_runs * 1e6, 2),
+        "after_us_per_event": round(timeit.timeit(
+            lambda: encode_event("comment_created", encode_comment(comment)), number=encode_runs
+        ) / encode_runs * 1e6, 2),
+    }]
+    for subscribers in subscriber_counts:
+        before = await messages_per_second(LegacyManager(send_queue_size=events + 1), comment, subscribers, events)
+        after = await messages_per_second(CommentConnectionManager(send_queue_size=events + 1), comment, subscribers, events)
+        results.append({
+            "stage": "encode_and_fan_out",
+            "subscribers": subscribers,
+            "events": events,
+            "before_msgs_per_s": round(before),
+            "after_msgs_per_s": round(after),
+            "speedup": round(after / before, 2),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--events", type=int, default=2000)
+    args = parser.parse_args()
+    results = asyncio.run(main(args.subscribers, args.events))
+    emit("broadcast_encoding", results, args.output)
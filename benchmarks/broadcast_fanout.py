@@ -0,0 +1,143 @@
+"""
+POST /comments/.../comments latency against the number of WebSocket
+subscribers on the dashboard.
+
+Requests go through the whole app via httpx.ASGITransport, several at a
+time, on the same event loop as the fan-out and the sender tasks, so the
+fan-out work competes with the requests as it does in a real worker. Two
+broadcast implementations are compared on that same path:
+
+- "queued": CommentConnectionManager, which hands the event to a fan-out
+  task and per-connection send queues.
+- "sequential": the previous implementation, which wrote to every socket
+  inside the request.
+
+Each simulated socket yields to the event loop on every send, like a real
+network write. For the queued mode, delivery_latency is the time from the
+broadcast call until the last subscriber has been sent the event.
+
+    python -m benchmarks.broadcast_fanout --subscribers 10 1000 10000 --concurrency 8
+"""
+import asyncio
+import time
+
+from bson import ObjectId
+from httpx import ASGITransport, AsyncClient
+
+from benchmarks.common import add_database_argument, base_parser, emit, init_database, summarize
+from src.websocket_manager import CommentConnectionManager
+
+
+class SimulatedWebSocket:
+    def __init__(self, arrivals: list = None):
+        # arrivals[i] ends up holding when the last socket received event i
+        self.arrivals = arrivals
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        await asyncio.sleep(0)
+        if self.arrivals is not None:
+            self.arrivals[self.received] = time.perf_counter()
+            self.received += 1
+
+    async def close(self, code: int = 1000, reason: str = None):
+        pass
+
+
+class QueuedManager(CommentConnectionManager):
+    """CommentConnectionManager noting when each event enters the fan-out."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.published_at = []
+
+    async def broadcast_to_dashboard(self, dashboard_id: str, message: str, sender=None):
+        self.published_at.append(time.perf_counter())
+        await super().broadcast_to_dashboard(dashboard_id, message, sender)
+
+
+class SequentialManager(CommentConnectionManager):
+    """The previous broadcast: every socket is written to inside the request."""
+
+    async def broadcast_to_dashboard(self, dashboard_id: str, message: str, sender=None):
+        for connection in list(self.active_connections.get(dashboard_id, {}).values()):
+            await connection.websocket.send_text(message)
+
+
+async def post_comments(client: AsyncClient, dashboard_id: ObjectId, events: int, concurrency: int) -> list:
+    """events POSTs, concurrency of them in flight at once; returns each request's latency"""
+    user_id = ObjectId()
+    url = f"/comments/dashboards/{dashboard_id}/users/{user_id}/comments"
+    remaining = iter(range(events))
+    latencies = []
+
+    async def worker():
+        for i in remaining:
+            t0 = time.perf_counter()
+            response = await client.post(url, json={"content": f"Comentario {i}", "coordinates": f"{i},0"})
+            latencies.append(time.perf_counter() - t0)
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def measure(client: AsyncClient, mode: str, subscribers: int, events: int, concurrency: int) -> dict:
+    from src.routes import comments_routes
+
+    if mode == "queued":
+        manager = QueuedManager(send_queue_size=events + 1, broadcast_log_every=0)
+    else:
+        manager = SequentialManager(broadcast_log_every=0)
+    arrivals = [0.0] * events
+    dashboard_id = ObjectId()
+    for _ in range(subscribers):
+        await manager.connect(SimulatedWebSocket(arrivals), str(dashboard_id))
+
+    # The routes broadcast through the module's manager
+    previous, comments_routes.comment_connection_manager = comments_routes.comment_connection_manager, manager
+    try:
+        started = time.perf_counter()
+        latencies = await post_comments(client, dashboard_id, events, concurrency)
+        await manager.wait_until_idle()
+        delivered_in = time.perf_counter() - started
+    finally:
+        comments_routes.comment_connection_manager = previous
+        await manager.shutdown()
+
+    result = {"mode": mode, "subscribers": subscribers, "concurrency": concurrency,
+              "create_latency": summarize(latencies), "all_delivered_s": round(delivered_in, 4)}
+    if mode == "queued":
+        # Events enter the fan-out, and reach every socket, in the same order
+        result["delivery_latency"] = summarize([a - p for a, p in zip(arrivals, manager.published_at)])
+    return result
+
+
+async def main(subscriber_counts, events, include_sequential, concurrency: int = 8, mongodb_url=None):
+    await init_database(mongodb_url)
+    from app import app
+
+    modes = ("queued", "sequential") if include_sequential else ("queued",)
+    results = []
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        # Warm up the app (first-request imports and caches) outside the samples
+        await post_comments(client, ObjectId(), 1, 1)
+        for subscribers in subscriber_counts:
+            for mode in modes:
+                results.append(await measure(client, mode, subscribers, events, concurrency))
+    return results
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once.")
+    parser.add_argument("--no-sequential", action="store_true", help="Skip the sequential baseline.")
+    add_database_argument(parser)
+    args = parser.parse_args()
+    results = asyncio.run(main(args.subscribers, args.events, not args.no_sequential, args.concurrency, args.mongodb_url))
+    emit("broadcast_fanout", results, args.output)
@@ -0,0 +1,101 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Every script prints one JSON document so results from different commits
+can be stored and compared with plain tools (jq, diff, a notebook...).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+# Importing app configures JSON logs on stdout, where the results go
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples_seconds: Sequence[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds."""
+    return {
+        "count": len(samples_seconds),
+        "p50_ms": round(percentile(samples_seconds, 50) * 1000, 4),
+        "p99_ms": round(percentile(samples_seconds, 99) * 1000, 4),
+        "max_ms": round(max(samples_seconds, default=0.0) * 1000, 4),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def base_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--output", help="Also write the JSON result to this file.")
+    return parser
+
+
+def add_database_argument(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--mongodb-url",
+        default=os.getenv("BENCH_MONGODB_URL"),
+        help="MongoDB to run against (default: in-memory mongomock). Its comments collection is emptied.",
+    )
+
+
+async def init_database(mongodb_url: Optional[str] = None):
+    """
+    Initialise Beanie on a real MongoDB or, by default, on mongomock and
+    empty the comments collection.
+
+    mongomock numbers measure the service code plus an in-memory Python
+    store; use --mongodb-url for figures comparable with production.
+    """
+    from beanie import init_beanie
+    from src.models import Comment
+
+    if mongodb_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        database = AsyncIOMotorClient(mongodb_url).get_default_database("comments_benchmark")
+    else:
+        import mongomock_motor
+        database = mongomock_motor.AsyncMongoMockClient()["comments_benchmark"]
+    await init_beanie(database=database, document_models=[Comment])
+    await Comment.get_motor_collection().delete_many({})
+    return database
+
+
+def emit(benchmark: str, results: List[Dict[str, Any]], output: Optional[str] = None, echo: bool = True):
+    document = {
+        "benchmark": benchmark,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    if echo:
+        print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    return document
+
+
+if __name__ == "__main__":
+    sys.exit("Run python -m benchmarks, or one of the benchmark modules, e.g. python -m benchmarks.broadcast_fanout")
@@ -0,0 +1,71 @@
+"""
+Compare two result files of the same benchmark (e.g. from two commits).
+
+Every numeric field is matched by its position in "results" and its key
+path. Latencies (*_ms, *_us) should go down and throughputs (*_per_s)
+up; --fail-above makes the command exit with 1 when any of them regresses
+by more than that percentage.
+
+    python -m benchmarks.compare old/rest_crud.json new/rest_crud.json --fail-above 20
+"""
+import argparse
+import json
+import sys
+from typing import Dict
+
+
+def flatten(value, prefix: str = "") -> Dict[str, float]:
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+    flat = {}
+    for key, item in items:
+        flat.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+def regression_pct(path: str, before: float, after: float) -> float:
+    """Positive when the change is for the worse"""
+    if before == 0:
+        return 0.0
+    change = (after - before) / abs(before) * 100
+    leaf = path.rsplit(".", 1)[-1]
+    if leaf.endswith("_per_s") or leaf == "speedup":
+        return -change
+    if leaf.endswith(("_ms", "_us", "_s")) or leaf.startswith("us_") or "_us_per" in leaf:
+        return change
+    return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--fail-above", type=float, help="Regression percentage that makes the command fail.")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before_doc = json.load(f)
+    with open(args.after) as f:
+        after_doc = json.load(f)
+    if before_doc["benchmark"] != after_doc["benchmark"]:
+        sys.exit(f"Different benchmarks: {before_doc['benchmark']} vs {after_doc['benchmark']}")
+
+    before, after = flatten(before_doc["results"]), flatten(after_doc["results"])
+    print(f"{before_doc['benchmark']}: {before_doc['commit']} -> {after_doc['commit']}")
+    worst = 0.0
+    for path in sorted(before.keys() & after.keys()):
+        regression = regression_pct(path, before[path], after[path])
+        worst = max(worst, regression)
+        flag = "  REGRESSION" if args.fail_above is not None and regression > args.fail_above else ""
+        print(f"  {path:<50} {before[path]:>14} {after[path]:>14} {regression:+8.1f}%{flag}")
+
+    if args.fail_above is not None and worst > args.fail_above:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
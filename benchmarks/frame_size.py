@@ -0,0 +1,83 @@
+"""
+Bytes on the wire per WebSocket frame, and the cost of producing them.
+
+A stream of comment_created / comment_updated / comment_moved frames is
+encoded as:
+
+- "json": the text frames sent by default.
+- "msgpack": the binary frames sent with ?encoding=msgpack.
+- "json_deflate" / "msgpack_deflate": the same frames compressed as
+  permessage-deflate does with context takeover (one raw deflate stream per
+  connection, flushed after every message).
+
+For each variant it reports the mean bytes per frame and the microseconds
+spent encoding (and compressing) one frame.
+
+    python -m benchmarks.frame_size --frames 5000
+"""
+import asyncio
+import time
+import zlib
+
+from bson import ObjectId
+
+from benchmarks.broadcast_encoding import make_comment
+from benchmarks.common import base_parser, emit
+from src.websocket_manager import EventLog, encode_comment, encode_event, encode_msgpack
+
+
+def make_frames(count: int) -> list:
+    log = EventLog(count)
+    comment = make_comment()
+    frames = []
+    for i in range(count):
+        comment["content"] = f"Comentario {i}"
+        comment["coordinates"] = [float(i % 1000), float(i // 1000)]
+        kind = i % 3
+        if kind == 0:
+            comment["_id"] = ObjectId()
+            frame = encode_event("comment_created", encode_comment(comment))
+        elif kind == 1:
+            frame = encode_event("comment_updated", encode_comment(comment))
+        else:
+            frame = encode_event(
+                "comment_moved", '{"comment_id":"%s","coordinates":[%s,%s]}' % (comment["_id"], *comment["coordinates"])
+            )
+        # comment_moved frames are not numbered, as in CommentConnectionManager
+        frames.append(frame if kind == 2 else log.append(frame))
+    return frames
+
+
+def measure(frames: list, encode, deflate: bool) -> dict:
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS) if deflate else None
+    total = 0
+    started = time.perf_counter()
+    for frame in frames:
+        payload = encode(frame)
+        if isinstance(payload, str):
+            payload = payload.encode()
+        if compressor is not None:
+            # permessage-deflate strips the trailing 00 00 ff ff of each flush
+            payload = compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH)[:-4]
+        total += len(payload)
+    elapsed = time.perf_counter() - started
+    return {"bytes_per_frame": round(total / len(frames), 1), "us_per_frame": round(elapsed / len(frames) * 1e6, 3)}
+
+
+async def main(frames: int):
+    stream = make_frames(frames)
+    variants = {
+        "json": (lambda frame: frame, False),
+        "msgpack": (encode_msgpack, False),
+        "json_deflate": (lambda frame: frame, True),
+        "msgpack_deflate": (encode_msgpack, True),
+    }
+    return [{"variant": name, "frames": frames, **measure(stream, encode, deflate)}
+            for name, (encode, deflate) in variants.items()]
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__)
+    parser.add_argument("--frames", type=int, default=5000)
+    args = parser.parse_args()
+    emit("frame_size", asyncio.run(main(args.frames)), args.output)
@@ -0,0 +1,92 @@
+"""
+GET /comments/dashboards/{id} latency against the number of comments on the
+dashboard.
+
+For each size a fresh dashboard is seeded with raw insert_many and read as:
+
+- full_uncached: whole list, cache cleared before every request
+- full_cached: whole list served from the in-process cache
+- first_page: ?limit=100
+- stream: ?stream=true, body read to the end
+
+    python -m benchmarks.list_latency --sizes 1000 10000 100000
+    python -m benchmarks.list_latency --mongodb-url mongodb://localhost:27017/bench
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from httpx import ASGITransport, AsyncClient
+
+from benchmarks.common import add_database_argument, base_parser, emit, init_database, summarize
+
+SEED_CHUNK = 10_000
+
+
+async def seed_dashboard(collection, size: int) -> ObjectId:
+    dashboard_id, user_id = ObjectId(), ObjectId()
+    start = datetime.now(timezone.utc)
+    for offset in range(0, size, SEED_CHUNK):
+        documents = []
+        for i in range(offset, min(size, offset + SEED_CHUNK)):
+            created_at = start + timedelta(milliseconds=i)
+            documents.append({
+                "_id": ObjectId(),
+                "dashboard_id": dashboard_id,
+                "user_id": user_id,
+                "user_name": "benchmark",
+                "content": f"Comentario {i}",
+                "coordinates": [float(i % 1000), float(i // 1000)],
+                "created_at": created_at,
+                "updated_at": created_at,
+            })
+        await collection.insert_many(documents)
+    return dashboard_id
+
+
+async def measure(client: AsyncClient, url: str, repeats: int, before_each=None) -> dict:
+    samples = []
+    for _ in range(repeats):
+        if before_each is not None:
+            before_each()
+        t0 = time.perf_counter()
+        response = await client.get(url)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples)
+
+
+async def main(sizes, repeats: int, mongodb_url=None):
+    await init_database(mongodb_url)
+    from app import app
+    from src.cache import dashboard_comments_cache
+    from src.models import Comment
+
+    collection = Comment.get_motor_collection()
+    results = []
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        for size in sizes:
+            dashboard_id = await seed_dashboard(collection, size)
+            url = f"/comments/dashboards/{dashboard_id}"
+            full_uncached = await measure(client, url, repeats, dashboard_comments_cache.clear)
+            await client.get(url)
+            results.append({
+                "comments": size,
+                "full_uncached": full_uncached,
+                "full_cached": await measure(client, url, repeats),
+                "first_page": await measure(client, f"{url}?limit=100", repeats),
+                "stream": await measure(client, f"{url}?stream=true", repeats),
+            })
+            await collection.delete_many({"dashboard_id": dashboard_id})
+            dashboard_comments_cache.clear()
+    return results
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeats", type=int, default=5)
+    add_database_argument(parser)
+    args = parser.parse_args()
+    emit("list_latency", asyncio.run(main(args.sizes, args.repeats, args.mongodb_url)), args.output)
@@ -0,0 +1,87 @@
+"""
+Logging cost per broadcast, with the service's JSON handler attached.
+
+Each variant broadcasts the same comment to a few subscribers and reports
+microseconds per broadcast at two root log levels (WARNING and INFO):
+
+- "eager": the previous broadcast_comment_created, with two f-string INFO
+  lines per event (formatted even when INFO is disabled).
+- "sampled_every_1": lazy %-style logging, every event logged.
+- "sampled_default": lazy logging, 1 in WS_BROADCAST_LOG_EVERY events logged.
+- "off": broadcast logging disabled (the baseline).
+
+    python -m benchmarks.logging_overhead --events 20000
+"""
+import asyncio
+import io
+import logging
+import time
+
+from benchmarks.broadcast_encoding import NullWebSocket, make_comment
+from benchmarks.common import base_parser, emit
+from src.logger_config import setup_logging
+from src.websocket_manager import CommentConnectionManager, encode_comment, encode_event, logger
+
+SUBSCRIBERS = 10
+
+
+class EagerLoggingManager(CommentConnectionManager):
+    """broadcast_comment_created as it logged before sampling."""
+
+    async def broadcast_comment_created(self, dashboard_id: str, comment):
+        logger.info(f"[CREATE_BROADCAST] Starting broadcast for dashboard '{dashboard_id}'")
+        await self.broadcast_to_dashboard(dashboard_id, encode_event("comment_created", encode_comment(comment)))
+        logger.info(f"[CREATE_BROADCAST] ✅ Completed broadcast for dashboard {dashboard_id}")
+
+
+def variants():
+    return {
+        "eager": lambda: EagerLoggingManager(send_queue_size=1_000_000, broadcast_log_every=0),
+        "sampled_every_1": lambda: CommentConnectionManager(send_queue_size=1_000_000, broadcast_log_every=1),
+        "sampled_default": lambda: CommentConnectionManager(send_queue_size=1_000_000),
+        "off": lambda: CommentConnectionManager(send_queue_size=1_000_000, broadcast_log_every=0),
+    }
+
+
+async def us_per_broadcast(manager: CommentConnectionManager, comment: dict, events: int) -> float:
+    for _ in range(SUBSCRIBERS):
+        await manager.connect(NullWebSocket(), "bench")
+    started = time.perf_counter()
+    for _ in range(events):
+        await manager.broadcast_comment_created("bench", comment)
+    await manager.wait_until_idle()
+    elapsed = time.perf_counter() - started
+    await manager.shutdown()
+    return elapsed / events * 1e6
+
+
+async def main(events: int):
+    comment = make_comment()
+    root = setup_logging("WARNING")
+    # Keep the JSON formatting cost but not the terminal output
+    for handler in root.handlers:
+        if handler.get_name() == "json":
+            handler.setStream(io.StringIO())
+
+    results = []
+    for level in ("WARNING", "INFO"):
+        root.setLevel(level)
+        timings = {name: await us_per_broadcast(make(), comment, events) for name, make in variants().items()}
+        for name, us in timings.items():
+            results.append({
+                "level": level,
+                "variant": name,
+                "events": events,
+                "us_per_broadcast": round(us, 2),
+                "overhead_us": round(us - timings["off"], 2),
+            })
+    return results
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__)
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+    results = asyncio.run(main(args.events))
+    logging.getLogger().setLevel(logging.WARNING)
+    emit("logging_overhead", results, args.output)
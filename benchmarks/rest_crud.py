@@ -0,0 +1,70 @@
+"""
+Create / get / list / update / delete throughput through the FastAPI app.
+
+Requests go through the whole ASGI stack (routing, validation, metrics
+middleware, cache, broadcast) in-process via httpx.ASGITransport, one at a
+time, so the numbers are per-core service overhead without network.
+
+    python -m benchmarks.rest_crud --operations 1000
+    python -m benchmarks.rest_crud --operations 1000 --mongodb-url mongodb://localhost:27017/bench
+"""
+import asyncio
+import time
+
+from bson import ObjectId
+from httpx import ASGITransport, AsyncClient
+
+from benchmarks.common import add_database_argument, base_parser, emit, init_database, summarize
+
+
+async def timed(samples: list, request):
+    t0 = time.perf_counter()
+    response = await request
+    samples.append(time.perf_counter() - t0)
+    response.raise_for_status()
+    return response
+
+
+def result(operation: str, samples: list) -> dict:
+    return {
+        "operation": operation,
+        "ops_per_s": round(len(samples) / sum(samples)) if samples else 0,
+        "latency": summarize(samples),
+    }
+
+
+async def main(operations: int, mongodb_url=None):
+    await init_database(mongodb_url)
+    from app import app
+
+    dashboard_id, user_id = ObjectId(), ObjectId()
+    samples = {name: [] for name in ("create", "get", "list_page", "list_cached", "update", "delete")}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        ids = []
+        for i in range(operations):
+            response = await timed(samples["create"], client.post(
+                f"/comments/dashboards/{dashboard_id}/users/{user_id}/comments",
+                json={"content": f"Comentario {i}", "coordinates": f"{i},{i}"},
+            ))
+            ids.append(response.json()["_id"])
+
+        for comment_id in ids:
+            await timed(samples["get"], client.get(f"/comments/{comment_id}"))
+        for _ in range(operations):
+            await timed(samples["list_page"], client.get(f"/comments/dashboards/{dashboard_id}?limit=50"))
+        for _ in range(operations):
+            await timed(samples["list_cached"], client.get(f"/comments/dashboards/{dashboard_id}"))
+        for comment_id in ids:
+            await timed(samples["update"], client.put(f"/comments/{comment_id}", json={"content": "Editado"}))
+        for comment_id in ids:
+            await timed(samples["delete"], client.delete(f"/comments/{comment_id}"))
+
+    return [result(name, values) for name, values in samples.items()]
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__)
+    parser.add_argument("--operations", type=int, default=1000)
+    add_database_argument(parser)
+    args = parser.parse_args()
+    emit("rest_crud", asyncio.run(main(args.operations, args.mongodb_url)), args.output)
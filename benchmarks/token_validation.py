@@ -0,0 +1,82 @@
+"""
+Token validations per second: local JWT verification vs the Auth Service call,
+each with and without the validation cache (same token every time).
+
+The "remote" numbers use an in-process stub Auth Service over ASGITransport,
+so they exclude real network latency and TLS; a deployed Auth Service is
+slower still.
+
+    python -m benchmarks.token_validation --validations 2000
+"""
+import asyncio
+import json
+import time
+
+import httpx
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, Request
+
+from benchmarks.common import base_parser, emit
+from src.middleware.jwt_middleware import LocalTokenVerifier, TokenValidator
+
+PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+JWK = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(PRIVATE_KEY.public_key()))
+JWK.update({"kid": "bench", "alg": "RS256"})
+
+
+def build_stub_auth_service() -> FastAPI:
+    stub = FastAPI()
+
+    @stub.get("/.well-known/jwks.json")
+    async def jwks():
+        return {"keys": [JWK]}
+
+    @stub.post("/auth/token/validate")
+    async def validate(request: Request):
+        token = request.headers["authorization"].removeprefix("Bearer ")
+        claims = jwt.decode(token, PRIVATE_KEY.public_key(), algorithms=["RS256"])
+        return {"valid": True, "user_id": claims["sub"], "email": None,
+                "scopes": [], "expires_at": claims["exp"]}
+
+    return stub
+
+
+def make_validator(mode: str, cached: bool) -> TokenValidator:
+    validator = TokenValidator(mode="remote", cache_max_entries=1000 if cached else 0)
+    validator.auth_service_url = "http://auth"
+    validator._client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=build_stub_auth_service()), base_url="http://auth"
+    )
+    validator.mode = mode
+    validator.local_verifier = LocalTokenVerifier(
+        validator.get_client, jwks_url="http://auth/.well-known/jwks.json", algorithms=["RS256"]
+    )
+    return validator
+
+
+async def validations_per_second(mode: str, cached: bool, token: str, validations: int) -> dict:
+    validator = make_validator(mode, cached)
+    await validator.validate_token(token)  # warm up (JWKS fetch, client setup)
+    started = time.perf_counter()
+    for _ in range(validations):
+        await validator.validate_token(token)
+    elapsed = time.perf_counter() - started
+    await validator.close()
+    return {"mode": mode, "cached": cached, "validations": validations,
+            "validations_per_s": round(validations / elapsed),
+            "us_per_validation": round(elapsed / validations * 1e6, 1)}
+
+
+async def main(validations: int):
+    token = jwt.encode({"sub": "bench", "exp": int(time.time()) + 3600}, PRIVATE_KEY,
+                       algorithm="RS256", headers={"kid": "bench"})
+    return [await validations_per_second(mode, cached, token, validations)
+            for mode in ("remote", "local") for cached in (False, True)]
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__)
+    parser.add_argument("--validations", type=int, default=2000)
+    args = parser.parse_args()
+    emit("token_validation", asyncio.run(main(args.validations)), args.output)
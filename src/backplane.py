@@ -0,0 +1,120 @@
+# src/backplane.py
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# (dashboard_id, message, sender) -> delivered to the sockets held by this
+# process; sender is the id of the connection that caused the event, if any,
+# which does not receive it back
+DeliveryHandler = Callable[[str, str, Optional[str]], Awaitable[None]]
+
+
+class Backplane:
+    """
+    Carries broadcast messages between every process serving WebSockets.
+
+    publish() hands a message to the backplane; every subscribed handler, in
+    this process and in every other one, receives it and delivers it to its
+    own sockets.
+    """
+
+    def __init__(self):
+        self._handlers: List[DeliveryHandler] = []
+
+    def subscribe(self, handler: DeliveryHandler):
+        self._handlers.append(handler)
+
+    async def _dispatch(self, dashboard_id: str, message: str, sender: Optional[str] = None):
+        for handler in self._handlers:
+            await handler(dashboard_id, message, sender)
+
+    async def publish(self, dashboard_id: str, message: str, sender: Optional[str] = None):
+        raise NotImplementedError
+
+    async def start(self):
+        """Start receiving messages published by other processes."""
+
+    async def stop(self):
+        """Stop receiving messages and release resources."""
+
+
+class InMemoryBackplane(Backplane):
+    """
+    Delivers messages to the handlers subscribed in this process.
+
+    This is the single-worker default. Sharing one instance between several
+    CommentConnectionManager objects simulates several workers in tests.
+    """
+
+    async def publish(self, dashboard_id: str, message: str, sender: Optional[str] = None):
+        await self._dispatch(dashboard_id, message, sender)
+
+
+class MongoChangeStreamBackplane(Backplane):
+    """
+    Backplane over a MongoDB collection watched with a change stream.
+
+    publish() inserts the event. Every process watches the collection for
+    inserts and delivers the events locally. Old events are removed by a TTL
+    index. Change streams require a replica set or a sharded cluster.
+    """
+
+    RETRY_DELAY_SECONDS = 1.0
+
+    def __init__(self, collection, event_ttl_seconds: int = 300):
+        super().__init__()
+        self.collection = collection
+        self.event_ttl_seconds = event_ttl_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token = None
+
+    async def publish(self, dashboard_id: str, message: str, sender: Optional[str] = None):
+        event = {
+            "dashboard_id": dashboard_id,
+            "message": message,
+            "created_at": datetime.now(timezone.utc),
+        }
+        if sender is not None:
+            event["sender"] = sender
+        await self.collection.insert_one(event)
+
+    async def start(self):
+        await self.collection.create_index(
+            [("created_at", ASCENDING)],
+            name="created_at_ttl",
+            expireAfterSeconds=self.event_ttl_seconds,
+        )
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self):
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with self.collection.watch(pipeline, resume_after=self._resume_token) as stream:
+                    async for change in stream:
+                        self._resume_token = change["_id"]
+                        event = change["fullDocument"]
+                        try:
+                            await self._dispatch(event["dashboard_id"], event["message"], event.get("sender"))
+                        except Exception as e:
+                            logger.error("[BACKPLANE] Error delivering event: %s", e, exc_info=True)
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logger.error("[BACKPLANE] Change stream interrupted, retrying: %s", e)
+                await asyncio.sleep(self.RETRY_DELAY_SECONDS)
@@ -0,0 +1,263 @@
+# src/cache.py
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional
+
+from pymongo import ASCENDING
+
+from .config import Config
+
+settings = Config()
+
+
+class LRUCache:
+    """
+    Bounded in-process LRU cache whose entries expire after a TTL.
+
+    With max_bytes, entries are also evicted to keep the sum of
+    sizeof(value) within it; a value larger than max_bytes is not stored.
+
+    Not thread-safe; it is meant to be used from the event loop only.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = len,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._clock = clock
+        # key -> (expires_at, value, size)
+        self._entries: "OrderedDict[Hashable, tuple[float, Any, int]]" = OrderedDict()
+        self.bytes = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at <= self._clock():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        if self.max_entries <= 0:
+            return
+        self.delete(key)
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        ttl = self.ttl_seconds if ttl is None else ttl
+        self._entries[key] = (self._clock() + ttl, value, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+
+    def delete(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CachedResponse(NamedTuple):
+    """Serialized response body plus the validators sent with it."""
+
+    body: bytes
+    etag: str
+    last_modified: Optional[str] = None
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({"etag": self.etag, "last_modified": self.last_modified})
+        return header.encode() + b"\n" + self.body
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "CachedResponse":
+        header, body = raw.split(b"\n", 1)
+        validators = json.loads(header)
+        return cls(body, validators["etag"], validators["last_modified"])
+
+
+def _body_size(cached: CachedResponse) -> int:
+    return len(cached.body)
+
+
+class CacheBackend:
+    """
+    Shared store behind the in-process cache (see MongoCacheBackend).
+
+    Implementations only need to store opaque bytes with a TTL. Every
+    worker talking to the same backend sees the others' entries and
+    invalidations.
+    """
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def start(self):
+        """Prepare the store (indexes, connections) before the first request."""
+
+
+class MongoCacheBackend(CacheBackend):
+    """
+    Shared store over a MongoDB collection, one document per key.
+
+    Each document carries its own expires_at: get() ignores expired entries
+    and a TTL index removes them later. Values larger than MAX_VALUE_BYTES
+    are not stored, since a document cannot exceed 16 MiB.
+    """
+
+    MAX_VALUE_BYTES = 15 * 1024 * 1024
+
+    def __init__(self, collection, clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc)):
+        self.collection = collection
+        self._clock = clock
+
+    async def start(self):
+        await self.collection.create_index([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        document = await self.collection.find_one({"_id": key, "expires_at": {"$gt": self._clock()}})
+        return None if document is None else bytes(document["value"])
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float):
+        if len(value) > self.MAX_VALUE_BYTES:
+            # Drop any older copy so readers rebuild the list instead
+            await self.delete(key)
+            return
+        expires_at = self._clock() + timedelta(seconds=ttl_seconds)
+        await self.collection.update_one(
+            {"_id": key}, {"$set": {"value": value, "expires_at": expires_at}}, upsert=True
+        )
+
+    async def delete(self, key: str):
+        await self.collection.delete_one({"_id": key})
+
+
+class DashboardCommentsCache:
+    """
+    Read-through cache of the serialized comment list of each dashboard.
+
+    Lookups go to the local LRU first, then to the optional shared backend.
+    Writes to a dashboard must call invalidate() so the next read rebuilds
+    the entry from MongoDB. The local copies are bounded by count and by the
+    total size of their bodies (max_bytes); a body larger than that is not
+    cached at all.
+    """
+
+    KEY_PREFIX = "comments:dashboard:"
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        backend: Optional[CacheBackend] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self._local = LRUCache(max_entries, ttl_seconds, max_bytes=max_bytes, sizeof=_body_size)
+        # Generation at which each dashboard was last invalidated, so a read
+        # that started before a write cannot store its stale result.
+        self._generation = 0
+        self._invalidated_at = LRUCache(max_entries, ttl_seconds)
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    async def use_backend(self, backend: CacheBackend):
+        """Share entries with the other workers through backend, once started"""
+        await backend.start()
+        self.backend = backend
+
+    @property
+    def generation(self) -> int:
+        """Token to take before reading MongoDB and pass back to set()."""
+        return self._generation
+
+    async def get(self, dashboard_id: str) -> Optional[CachedResponse]:
+        cached = self._local.get(dashboard_id)
+        if cached is not None:
+            self.local_hits += 1
+            return cached
+
+        if self.backend is not None:
+            raw = await self.backend.get(self.KEY_PREFIX + dashboard_id)
+            if raw is not None:
+                self.shared_hits += 1
+                cached = CachedResponse.from_bytes(raw)
+                self._local.set(dashboard_id, cached)
+                return cached
+
+        self.misses += 1
+        return None
+
+    async def set(self, dashboard_id: str, cached: CachedResponse, generation: int):
+        invalidated_at = self._invalidated_at.get(dashboard_id)
+        if invalidated_at is not None and invalidated_at > generation:
+            return
+        if self.max_bytes is not None and len(cached.body) > self.max_bytes:
+            # Too large for this process's budget; not worth a shared copy either
+            return
+        self._local.set(dashboard_id, cached)
+        if self.backend is not None:
+            await self.backend.set(self.KEY_PREFIX + dashboard_id, cached.to_bytes(), self.ttl_seconds)
+
+    async def invalidate(self, dashboard_id: str):
+        self.invalidate_local(dashboard_id)
+        if self.backend is not None:
+            await self.backend.delete(self.KEY_PREFIX + dashboard_id)
+
+    def invalidate_local(self, dashboard_id: str):
+        """
+        Drop this process's copy only. Used when another worker's write is
+        learnt from its broadcast; that worker already cleared the backend.
+        """
+        self._generation += 1
+        self._invalidated_at.set(dashboard_id, self._generation)
+        self._local.delete(dashboard_id)
+
+    def clear(self):
+        self._local.clear()
+        self._invalidated_at.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._local),
+            "bytes": self._local.bytes,
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+        }
+
+
+# Global instance
+dashboard_comments_cache = DashboardCommentsCache(
+    max_entries=settings.COMMENTS_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.COMMENTS_CACHE_TTL_SECONDS,
+    max_bytes=settings.COMMENTS_CACHE_MAX_BYTES,
+)
@@ -1,16 +1,165 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Dict
+
 import motor.motor_asyncio
 from beanie import init_beanie
+from pymongo import monitoring
 from .config import Config
 from .models import Comment
 
 settings = Config()
 
-async def init_db():
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Cuenta los eventos del pool de conexiones de cada servidor.
+
+    pymongo llama a estos métodos de forma síncrona desde sus hilos, por lo
+    que solo actualizan contadores (bajo un lock).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, Dict[str, int]] = defaultdict(lambda: {
+            "open": 0, "checked_out": 0, "checkout_failures": 0, "cleared": 0,
+        })
+
+    @staticmethod
+    def _key(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def _count(self, event, counter: str, delta: int = 1):
+        with self._lock:
+            self._pools[self._key(event)][counter] += delta
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pools[self._key(event)]
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._count(event, "cleared")
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(self._key(event), None)
+
+    def connection_created(self, event):
+        self._count(event, "open")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._count(event, "open", -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._count(event, "checkout_failures")
+
+    def connection_checked_out(self, event):
+        self._count(event, "checked_out")
+
+    def connection_checked_in(self, event):
+        self._count(event, "checked_out", -1)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {address: dict(counters) for address, counters in self._pools.items()}
+
+
+pool_monitor = PoolMonitor()
+
+
+async def sync_index_options(database, config: Config = settings):
+    """
+    Ajusta los índices existentes cuyas opciones vienen de la configuración,
+    antes de init_beanie: este no modifica un índice existente y, si sus
+    opciones cambiaron, el arranque falla con IndexOptionsConflict.
+
+    - deleted_at_ttl: si COMMENT_TOMBSTONE_TTL_SECONDS cambió, se actualiza
+      expireAfterSeconds con collMod (sin reconstruir el índice).
+    - coordinates_2d_dashboard: los límites de un índice 2d no se pueden
+      modificar; si COORDINATES_INDEX_MIN/MAX cambiaron hay que reconstruirlo
+      a mano (ver README), y se avisa con un error claro.
+    """
+    collection_name = Comment.Settings.name
+    indexes = await database[collection_name].index_information()
+
+    ttl_index = indexes.get("deleted_at_ttl")
+    if ttl_index is not None and ttl_index.get("expireAfterSeconds") != config.COMMENT_TOMBSTONE_TTL_SECONDS:
+        await database.command(
+            "collMod", collection_name,
+            index={"name": "deleted_at_ttl", "expireAfterSeconds": config.COMMENT_TOMBSTONE_TTL_SECONDS},
+        )
+
+    geo_index = indexes.get("coordinates_2d_dashboard")
+    if geo_index is not None and (
+        geo_index.get("min") != config.COORDINATES_INDEX_MIN or geo_index.get("max") != config.COORDINATES_INDEX_MAX
+    ):
+        raise RuntimeError(
+            "El índice coordinates_2d_dashboard tiene límites "
+            f"[{geo_index.get('min')}, {geo_index.get('max')}) y la configuración pide "
+            f"[{config.COORDINATES_INDEX_MIN}, {config.COORDINATES_INDEX_MAX}). Los límites de un "
+            "índice 2d no se pueden cambiar: bórrelo (dropIndex) para que se cree de nuevo, "
+            "o restaure COORDINATES_INDEX_MIN/MAX."
+        )
+
+
+def client_options(config: Config = settings) -> dict:
+    """Opciones de AsyncIOMotorClient a partir de la configuración."""
+    options = {
+        "maxPoolSize": config.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": config.MONGO_MIN_POOL_SIZE,
+        "readPreference": config.MONGO_READ_PREFERENCE,
+        "serverSelectionTimeoutMS": config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": config.MONGO_CONNECT_TIMEOUT_MS,
+    }
+    if config.MONGO_MAX_IDLE_TIME_MS:
+        options["maxIdleTimeMS"] = config.MONGO_MAX_IDLE_TIME_MS
+    if config.MONGO_COMPRESSORS:
+        options["compressors"] = config.MONGO_COMPRESSORS
+    if config.MONGO_WRITE_CONCERN:
+        w = config.MONGO_WRITE_CONCERN
+        options["w"] = int(w) if w.isdigit() else w
+    return options
+
+
+async def init_db() -> motor.motor_asyncio.AsyncIOMotorClient:
     """
     Inicializa la conexión a la base de datos MongoDB y Beanie.
+
+    init_beanie crea los índices declarados en Comment.Settings.indexes
+    si todavía no existen en la colección; antes, sync_index_options adapta
+    los que dependen de la configuración. Devuelve el cliente para que la
+    aplicación lo cierre al apagarse (close_db).
     """
     client = motor.motor_asyncio.AsyncIOMotorClient(
-        settings.DATABASE_URL
+        settings.DATABASE_URL,
+        event_listeners=[pool_monitor],
+        **client_options(),
     )
 
-    await init_beanie(database=client.get_default_database(), document_models=[Comment])
\ No newline at end of file
+    database = client.get_default_database()
+    await sync_index_options(database)
+    await init_beanie(database=database, document_models=[Comment])
+    return client
+
+
+def close_db(client: motor.motor_asyncio.AsyncIOMotorClient):
+    """Cierra el cliente y sus conexiones."""
+    client.close()
+
+
+async def ping_ms(client) -> float:
+    """Latencia de un ping al servidor, en milisegundos."""
+    started = time.perf_counter()
+    await client.admin.command("ping")
+    return round((time.perf_counter() - started) * 1000, 3)
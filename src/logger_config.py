@@ -1,23 +1,31 @@
 import logging
 import sys
+from typing import Optional
 from pythonjsonlogger import jsonlogger
 from .config import Config
 
-def setup_logging():
+def setup_logging(level: Optional[str] = None):
     """
     Sets up JSON logging format for the service.
+
+    The level comes from LOG_LEVEL unless given. Calling it again replaces
+    the handler instead of adding a second one.
     """
     logger = logging.getLogger()
     
-    logger.setLevel(Config.LOG_LEVEL)
+    logger.setLevel((level or Config().LOG_LEVEL).upper())
 
     handler = logging.StreamHandler(sys.stdout)
+    handler.set_name("json")
 
     formatter = jsonlogger.JsonFormatter(
         "%(asctime)s %(levelname)s %(name)s %(message)s"
     )
     handler.setFormatter(formatter)
 
+    for existing in list(logger.handlers):
+        if existing.get_name() == "json":
+            logger.removeHandler(existing)
     logger.addHandler(handler)
 
-    return logger
\ No newline at end of file
+    return logger
@@ -0,0 +1,174 @@
+# src/metrics.py
+"""
+Prometheus metrics exposed on /metrics.
+
+Histograms are observed inline (a perf_counter delta and a bucket
+increment). Connection and queue gauges are not updated on every
+connect/send; collectors read them from the live objects when /metrics is
+scraped, so they cost nothing between scrapes.
+"""
+import time
+from typing import Callable, Dict
+
+from prometheus_client import REGISTRY, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Buckets in seconds, from sub-millisecond database calls to slow requests
+_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+MONGO_OPERATION_DURATION = Histogram(
+    "mongo_operation_duration_seconds",
+    "Duration of MongoDB operations issued by the comment routes",
+    ["operation"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+BROADCAST_FANOUT_DURATION = Histogram(
+    "ws_broadcast_fanout_duration_seconds",
+    "Time to hand one broadcast to every local connection's send queue",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+)
+
+
+def route_template(scope) -> str:
+    """
+    Path with its parameters put back as placeholders
+    (/comments/6650.../coordinates -> /comments/{comment_id}/coordinates)
+    """
+    if "route" not in scope:
+        return "unmatched"
+    path = scope["path"]
+    params = scope.get("path_params")
+    if not params:
+        return path
+    placeholders = {str(value): "{" + name + "}" for name, value in params.items()}
+    return "/".join(placeholders.get(segment, segment) for segment in path.split("/"))
+
+
+def mongo_timer(operation: str):
+    """Context manager timing one MongoDB operation"""
+    return MONGO_OPERATION_DURATION.labels(operation).time()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request.
+
+    Requests are labelled with the route template (e.g.
+    /comments/{comment_id}), not the raw path, to keep cardinality bounded;
+    paths that match no route share the "unmatched" label.
+    WebSocket connections are not measured here.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], route_template(scope), str(status_code)
+            ).observe(time.perf_counter() - started)
+
+
+class ConnectionCollector:
+    """Reads WebSocket connection counts and queue depths from a CommentConnectionManager at scrape time"""
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def collect(self):
+        per_dashboard = GaugeMetricFamily(
+            "ws_active_connections", "WebSocket connections per dashboard", labels=["dashboard_id"]
+        )
+        total = 0
+        queued = 0
+        deepest = 0
+        for dashboard_id, connections in list(self.manager.active_connections.items()):
+            per_dashboard.add_metric([dashboard_id], len(connections))
+            total += len(connections)
+            for connection in list(connections.values()):
+                depth = connection.queue.qsize()
+                queued += depth
+                deepest = max(deepest, depth)
+
+        yield per_dashboard
+        yield GaugeMetricFamily("ws_active_connections_total", "WebSocket connections in this process", value=total)
+        yield GaugeMetricFamily(
+            "ws_send_queue_depth", "Messages waiting in per-connection send queues", value=queued
+        )
+        yield GaugeMetricFamily(
+            "ws_send_queue_depth_max", "Deepest per-connection send queue", value=deepest
+        )
+        yield GaugeMetricFamily(
+            "ws_fanout_queue_depth", "Broadcasts waiting to be fanned out",
+            value=self.manager.fanout_queue_depth(),
+        )
+
+
+class TokenCacheCollector:
+    """Exposes the token validation cache counters (see TokenValidator.cache_stats)"""
+
+    def __init__(self, get_stats: Callable[[], Dict]):
+        self.get_stats = get_stats
+
+    def collect(self):
+        stats = self.get_stats()
+        for name in ("hits", "coalesced", "misses", "stale_served", "auth_service_calls", "circuit_rejections"):
+            yield CounterMetricFamily(f"auth_token_cache_{name}", f"Token validation {name.replace('_', ' ')}",
+                                      value=stats[name])
+        yield GaugeMetricFamily("auth_token_cache_entries", "Cached token validations", value=stats["entries"])
+        yield GaugeMetricFamily("auth_token_cache_hit_ratio", "Share of validations answered without a call",
+                                value=stats["hit_ratio"])
+        yield GaugeMetricFamily("auth_circuit_open", "1 while the Auth Service circuit is not closed",
+                                value=0 if stats["circuit_state"] == "closed" else 1)
+
+
+class DashboardCacheCollector:
+    """Exposes the comment list cache counters (see DashboardCommentsCache.stats)"""
+
+    def __init__(self, get_stats: Callable[[], Dict]):
+        self.get_stats = get_stats
+
+    def collect(self):
+        stats = self.get_stats()
+        for name in ("local_hits", "shared_hits", "misses"):
+            yield CounterMetricFamily(f"comments_cache_{name}", f"Comment list cache {name.replace('_', ' ')}",
+                                      value=stats[name])
+        yield GaugeMetricFamily("comments_cache_entries", "Comment lists cached in this process",
+                                value=stats["entries"])
+        yield GaugeMetricFamily("comments_cache_bytes", "Size of the comment list bodies cached in this process",
+                                value=stats["bytes"])
+
+
+def register_collectors(
+    manager,
+    get_token_stats: Callable[[], Dict],
+    get_cache_stats: Callable[[], Dict],
+    registry=REGISTRY,
+):
+    """Register the scrape-time collectors (call once, at application start-up)"""
+    registry.register(ConnectionCollector(manager))
+    registry.register(TokenCacheCollector(get_token_stats))
+    registry.register(DashboardCacheCollector(get_cache_stats))
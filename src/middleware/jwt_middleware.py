@@ -5,6 +5,23 @@ JWT Authentication Middleware for FastAPI Services
 This middleware validates JWT tokens from the centralized Auth Service.
 Can be used by User_Service, Canvas_Service, Chat_Service, Comments_Service.
 
+Validation modes (AUTH_VALIDATION_MODE):
+    remote               POST every token to the Auth Service (default)
+    local                Verify signature and claims here, with a PEM public key
+                         or a JWKS fetched from the Auth Service and refreshed
+                         in the background
+    local_with_fallback  Like local, but ask the Auth Service when no key can
+                         verify the token (JWKS unreachable, unknown kid)
+
+Successful validations are cached per token (keyed by its SHA-256) until the
+token expires or AUTH_TOKEN_CACHE_TTL_SECONDS elapse, whichever comes first.
+Concurrent validations of the same token share a single call.
+
+Calls to the Auth Service go through a circuit breaker: after
+AUTH_CIRCUIT_FAILURE_THRESHOLD consecutive failures (timeouts, connection
+errors, 5xx) requests fail fast for AUTH_CIRCUIT_RESET_SECONDS, and tokens
+validated earlier are still accepted until they expire.
+
 Usage:
     from src.middleware.jwt_middleware import require_auth
     
@@ -15,11 +32,21 @@ Usage:
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+import asyncio
+import hashlib
 import httpx
+import jwt
+import logging
 import os
+import time
+from datetime import datetime, timezone
 from functools import lru_cache
 
+from src.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
 # Security scheme for Swagger UI
 security = HTTPBearer()
 
@@ -27,29 +54,303 @@ security = HTTPBearer()
 AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "https://auth_service:8443")
 CA_CERT_PATH = os.getenv("CA_CERT_PATH", "/etc/ssl/certs/ca.crt")
 
+# Local verification configuration
+AUTH_VALIDATION_MODE = os.getenv("AUTH_VALIDATION_MODE", "remote")
+AUTH_JWKS_URL = os.getenv("AUTH_JWKS_URL", f"{AUTH_SERVICE_URL}/.well-known/jwks.json")
+AUTH_PUBLIC_KEY_PATH = os.getenv("AUTH_PUBLIC_KEY_PATH")
+AUTH_JWT_ALGORITHMS = os.getenv("AUTH_JWT_ALGORITHMS", "RS256").split(",")
+AUTH_JWT_ISSUER = os.getenv("AUTH_JWT_ISSUER")
+AUTH_JWT_AUDIENCE = os.getenv("AUTH_JWT_AUDIENCE")
+AUTH_JWKS_REFRESH_SECONDS = float(os.getenv("AUTH_JWKS_REFRESH_SECONDS", 300))
+
+# Auth Service HTTP client
+AUTH_HTTP2 = os.getenv("AUTH_HTTP2", "true").lower() in ("1", "true", "yes")
+AUTH_HTTP_MAX_CONNECTIONS = int(os.getenv("AUTH_HTTP_MAX_CONNECTIONS", 100))
+AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+AUTH_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("AUTH_HTTP_KEEPALIVE_EXPIRY", 30))
+AUTH_CONNECT_TIMEOUT = float(os.getenv("AUTH_CONNECT_TIMEOUT", 1.0))
+AUTH_READ_TIMEOUT = float(os.getenv("AUTH_READ_TIMEOUT", 3.0))
+AUTH_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("AUTH_CIRCUIT_FAILURE_THRESHOLD", 5))
+AUTH_CIRCUIT_RESET_SECONDS = float(os.getenv("AUTH_CIRCUIT_RESET_SECONDS", 30))
+
+# Validation result cache
+AUTH_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", 10000))
+AUTH_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("AUTH_TOKEN_CACHE_TTL_SECONDS", 60))
+
+VALIDATION_MODES = ("remote", "local", "local_with_fallback")
+
+
+class SigningKeyUnavailable(Exception):
+    """No local key can verify the token (JWKS not loaded or unknown kid)"""
+
+
+class LocalTokenVerifier:
+    """
+    Verifies JWTs locally with a static PEM key or a cached JWKS
+    
+    The JWKS is fetched once, refreshed every refresh_interval seconds by a
+    background task, and re-fetched early (at most once per
+    min_refresh_interval) when a token carries an unknown kid.
+    """
+    
+    def __init__(
+        self,
+        get_client,
+        jwks_url: Optional[str] = AUTH_JWKS_URL,
+        public_key: Optional[str] = None,
+        algorithms: List[str] = AUTH_JWT_ALGORITHMS,
+        issuer: Optional[str] = AUTH_JWT_ISSUER,
+        audience: Optional[str] = AUTH_JWT_AUDIENCE,
+        refresh_interval: float = AUTH_JWKS_REFRESH_SECONDS,
+        min_refresh_interval: float = 10.0,
+    ):
+        self._get_client = get_client
+        self.jwks_url = jwks_url
+        self.algorithms = algorithms
+        self.issuer = issuer
+        self.audience = audience
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._static_key = public_key
+        # kid -> key object usable by jwt.decode
+        self._keys: Dict[Optional[str], Any] = {}
+        self._last_refresh = float("-inf")
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+    
+    async def refresh_keys(self):
+        """Fetch the JWKS and replace the cached keys"""
+        client = await self._get_client()
+        response = await client.get(self.jwks_url)
+        response.raise_for_status()
+        jwk_set = jwt.PyJWKSet.from_dict(response.json())
+        self._keys = {key.key_id: key.key for key in jwk_set.keys}
+        self._last_refresh = time.monotonic()
+    
+    async def _refresh_if_allowed(self):
+        async with self._refresh_lock:
+            if time.monotonic() - self._last_refresh < self.min_refresh_interval:
+                return
+            try:
+                await self.refresh_keys()
+            except (httpx.HTTPError, jwt.PyJWKSetError, ValueError) as e:
+                # Do not hammer an unreachable Auth Service
+                self._last_refresh = time.monotonic()
+                logger.error("Could not refresh JWKS from %s: %s", self.jwks_url, e)
+    
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self._refresh_if_allowed()
+    
+    async def start(self):
+        """Load the keys and start the background refresh"""
+        if self._static_key is not None:
+            return
+        await self._refresh_if_allowed()
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+    
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+    
+    def _find_key(self, kid: Optional[str]):
+        if self._static_key is not None:
+            return self._static_key
+        if kid in self._keys:
+            return self._keys[kid]
+        if kid is None and len(self._keys) == 1:
+            return next(iter(self._keys.values()))
+        return None
+    
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify signature, expiry and (if configured) issuer and audience
+        
+        Raises:
+            SigningKeyUnavailable: If no local key matches the token
+            jwt.InvalidTokenError: If the token is invalid
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self._find_key(kid)
+        if key is None:
+            await self._refresh_if_allowed()
+            key = self._find_key(kid)
+            if key is None:
+                raise SigningKeyUnavailable(f"No signing key for kid {kid!r}")
+        
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=self.algorithms,
+            issuer=self.issuer,
+            audience=self.audience,
+            options={"require": ["exp"], "verify_aud": self.audience is not None},
+        )
+        scopes = claims.get("scopes")
+        if scopes is None:
+            scopes = claims.get("scope", "").split()
+        return {
+            "user_id": claims.get("user_id", claims.get("sub")),
+            "email": claims.get("email"),
+            "scopes": scopes,
+            "expires_at": claims["exp"]
+        }
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for the Auth Service
+    
+    closed     calls go through; failure_threshold failures in a row open it
+    open       calls are refused until reset_timeout has elapsed
+    half_open  a single trial call is let through; success closes the
+               circuit, failure opens it again
+    """
+    
+    def __init__(
+        self,
+        failure_threshold: int = AUTH_CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = AUTH_CIRCUIT_RESET_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started_at = 0.0
+    
+    def allow_request(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and self._clock() - self._opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self._trial_in_flight = False
+        if self.state == "half_open":
+            # A trial that never reported back (e.g. cancelled) is retried
+            if not self._trial_in_flight or self._clock() - self._trial_started_at >= self.reset_timeout:
+                self._trial_in_flight = True
+                self._trial_started_at = self._clock()
+                return True
+        return False
+    
+    def record_success(self):
+        if self.state != "closed":
+            logger.info("Auth Service recovered, closing circuit")
+        self.state = "closed"
+        self._failures = 0
+        self._trial_in_flight = False
+    
+    def record_failure(self):
+        self._failures += 1
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("Auth Service unhealthy after %d failures, opening circuit", self._failures)
+            self.state = "open"
+            self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+
+def seconds_until_expiry(expires_at: Any) -> Optional[float]:
+    """Seconds left before expires_at (epoch seconds or ISO 8601), None if unknown"""
+    if expires_at is None or isinstance(expires_at, bool):
+        return None
+    if isinstance(expires_at, (int, float)):
+        return expires_at - time.time()
+    if isinstance(expires_at, str):
+        try:
+            return float(expires_at) - time.time()
+        except ValueError:
+            pass
+        try:
+            moment = datetime.fromisoformat(expires_at.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return (moment - datetime.now(timezone.utc)).total_seconds()
+    return None
+
 
 class TokenValidator:
     """
     Token validator that communicates with Auth Service
+    
+    Valid tokens are cached in a bounded LRU keyed by the token's SHA-256, so
+    the raw token is never kept in memory. An entry lives until the token's
+    expires_at or cache_ttl seconds, whichever is sooner; cache_ttl therefore
+    bounds how long a revoked token keeps being accepted. Rejections are not
+    cached.
+    
+    Entries are kept until the token expires: while the Auth Service is
+    unavailable (circuit open, timeout, 5xx) a token whose cache_ttl has
+    elapsed is still accepted instead of answering 503.
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        mode: str = AUTH_VALIDATION_MODE,
+        local_verifier: Optional[LocalTokenVerifier] = None,
+        cache_max_entries: int = AUTH_TOKEN_CACHE_MAX_ENTRIES,
+        cache_ttl: float = AUTH_TOKEN_CACHE_TTL_SECONDS,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        if mode not in VALIDATION_MODES:
+            raise ValueError(f"AUTH_VALIDATION_MODE must be one of {VALIDATION_MODES}, got {mode!r}")
+        self.cache_ttl = cache_ttl
+        # token hash -> (fresh until, user); kept until the token expires
+        self._cache = LRUCache(cache_max_entries, cache_ttl)
+        # token hash -> task validating that token, shared by concurrent callers
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._stats = {
+            "hits": 0, "coalesced": 0, "misses": 0, "stale_served": 0,
+            "auth_service_calls": 0, "circuit_rejections": 0,
+        }
+        self.breaker = breaker or CircuitBreaker()
         self.auth_service_url = AUTH_SERVICE_URL
         self.ca_cert_path = CA_CERT_PATH
         self._client: Optional[httpx.AsyncClient] = None
+        self.mode = mode
+        self.local_verifier = local_verifier
+        if self.local_verifier is None and mode != "remote":
+            public_key = None
+            if AUTH_PUBLIC_KEY_PATH:
+                with open(AUTH_PUBLIC_KEY_PATH) as f:
+                    public_key = f.read()
+            self.local_verifier = LocalTokenVerifier(self.get_client, public_key=public_key)
     
     async def get_client(self) -> httpx.AsyncClient:
         """Get or create async HTTP client"""
         if self._client is None:
             self._client = httpx.AsyncClient(
                 verify=self.ca_cert_path if os.path.exists(self.ca_cert_path) else True,
-                timeout=httpx.Timeout(5.0)
+                http2=AUTH_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=AUTH_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=AUTH_HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(
+                    connect=AUTH_CONNECT_TIMEOUT,
+                    read=AUTH_READ_TIMEOUT,
+                    write=AUTH_READ_TIMEOUT,
+                    pool=AUTH_CONNECT_TIMEOUT,
+                ),
             )
         return self._client
     
     async def validate_token(self, token: str) -> Dict[str, Any]:
         """
-        Validate token against Auth Service
+        Validate token, answering from the cache when possible
         
         Args:
             token: JWT access token
@@ -60,53 +361,182 @@ class TokenValidator:
         Raises:
             HTTPException: If token is invalid or validation fails
         """
-        client = await self.get_client()
+        key = hashlib.sha256(token.encode()).hexdigest()
+        entry = self._cache.get(key)
+        stale = None
+        if entry is not None:
+            fresh_until, user = entry
+            if time.monotonic() < fresh_until:
+                self._stats["hits"] += 1
+                return dict(user)
+            stale = user
         
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self._stats["coalesced"] += 1
+        else:
+            self._stats["misses"] += 1
+            # The validation runs in its own task so that no caller owns it:
+            # a caller that is cancelled (client gone) leaves it running for
+            # the others, and the shield keeps the cancellation out of it
+            pending = asyncio.ensure_future(self._validate_and_cache(key, token, stale))
+            pending.add_done_callback(lambda task: self._finish_in_flight(key, task))
+            self._in_flight[key] = pending
+        return dict(await asyncio.shield(pending))
+    
+    def _finish_in_flight(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Every caller may have gone; do not warn about an unretrieved exception
+        task.cancelled() or task.exception()
+    
+    async def _validate_and_cache(self, key: str, token: str, stale: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         try:
-            response = await client.post(
-                f"{self.auth_service_url}/auth/token/validate",
-                headers={"Authorization": f"Bearer {token}"},
-                timeout=5.0
+            user = await self._validate_uncached(token)
+        except HTTPException as e:
+            if e.status_code != status.HTTP_503_SERVICE_UNAVAILABLE or stale is None:
+                raise
+            # Auth Service down: keep accepting a token it already validated
+            self._stats["stale_served"] += 1
+            return stale
+        
+        remaining = seconds_until_expiry(user.get("expires_at"))
+        if remaining is None or remaining > 0:
+            fresh_for = self.cache_ttl if remaining is None else min(remaining, self.cache_ttl)
+            self._cache.set(
+                key, (time.monotonic() + fresh_for, user),
+                ttl=self.cache_ttl if remaining is None else remaining,
             )
+        return user
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Validation cache counters; hits and coalesced calls are Auth Service calls saved"""
+        lookups = self._stats["hits"] + self._stats["coalesced"] + self._stats["misses"]
+        saved = self._stats["hits"] + self._stats["coalesced"]
+        return {
+            **self._stats,
+            "entries": len(self._cache),
+            "hit_ratio": saved / lookups if lookups else 0.0,
+            "auth_service_calls_saved": saved,
+            "circuit_state": self.breaker.state,
+        }
+    
+    async def _validate_uncached(self, token: str) -> Dict[str, Any]:
+        """
+        Validate token locally or against the Auth Service, depending on mode
+        
+        Args:
+            token: JWT access token
             
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Token validation failed",
-                    headers={"WWW-Authenticate": "Bearer"}
-                )
-            
-            data = response.json()
+        Returns:
+            User information dict
             
-            if not data.get("valid"):
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail=data.get("message", "Invalid token"),
-                    headers={"WWW-Authenticate": "Bearer"}
-                )
+        Raises:
+            HTTPException: If token is invalid or validation fails
+        """
+        if self.mode == "remote":
+            return await self.validate_token_remote(token)
+        
+        try:
+            return await self.local_verifier.verify(token)
+        except SigningKeyUnavailable:
+            if self.mode == "local_with_fallback":
+                return await self.validate_token_remote(token)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="No signing key available to validate the token"
+            )
+        except jwt.InvalidTokenError as e:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Invalid token: {e}",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+    
+    async def validate_token_remote(self, token: str) -> Dict[str, Any]:
+        """
+        Validate token against Auth Service
+        
+        Args:
+            token: JWT access token
             
-            return {
-                "user_id": data.get("user_id"),
-                "email": data.get("email"),
-                "scopes": data.get("scopes", []),
-                "expires_at": data.get("expires_at")
-            }
+        Returns:
+            User information dict
             
+        Raises:
+            HTTPException: If token is invalid or validation fails
+        """
+        if not self.breaker.allow_request():
+            self._stats["circuit_rejections"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Auth service unavailable"
+            )
+        
+        client = await self.get_client()
+        self._stats["auth_service_calls"] += 1
+        
+        try:
+            response = await client.post(
+                f"{self.auth_service_url}/auth/token/validate",
+                headers={"Authorization": f"Bearer {token}"}
+            )
         except httpx.TimeoutException:
+            self.breaker.record_failure()
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Auth service timeout"
             )
         except httpx.RequestError as e:
+            self.breaker.record_failure()
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail=f"Auth service unreachable: {str(e)}"
             )
+        
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Auth service error ({response.status_code})"
+            )
+        self.breaker.record_success()
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token validation failed",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        
+        data = response.json()
+        
+        if not data.get("valid"):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=data.get("message", "Invalid token"),
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        
+        return {
+            "user_id": data.get("user_id"),
+            "email": data.get("email"),
+            "scopes": data.get("scopes", []),
+            "expires_at": data.get("expires_at")
+        }
+    
+    async def start(self):
+        """Load signing keys for local validation"""
+        if self.local_verifier is not None:
+            await self.local_verifier.start()
     
     async def close(self):
-        """Close HTTP client"""
+        """Stop the key refresh and close HTTP client"""
+        if self.local_verifier is not None:
+            await self.local_verifier.stop()
         if self._client:
             await self._client.aclose()
+            self._client = None
 
 
 # Singleton validator instance
@@ -200,6 +630,17 @@ def require_scopes(*required_scopes: str):
     return _require_scopes
 
 
+def get_token_cache_stats() -> Dict[str, Any]:
+    """Counters of the token validation cache (hit ratio, Auth Service calls saved)"""
+    return _validator.cache_stats()
+
+
+# Startup function for app lifespan
+async def init_auth_middleware():
+    """Call this in FastAPI lifespan startup"""
+    await _validator.start()
+
+
 # Cleanup function for app shutdown
 async def cleanup_auth_middleware():
     """Call this in FastAPI lifespan shutdown"""
@@ -1,8 +1,12 @@
 # src/models.py
 from beanie import Document, PydanticObjectId #si
 from pydantic import Field, validator
+from pymongo import IndexModel, ASCENDING, GEO2D, HASHED
 from typing import List, Optional
 from datetime import datetime, timezone
+from .config import Config
+
+settings = Config()
 
 class Comment(Document):
     dashboard_id: PydanticObjectId
@@ -12,6 +16,11 @@ class Comment(Document):
     coordinates: List[float]
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Se incrementa en cada actualización; es el ETag del comentario (If-Match)
+    version: int = 0
+    # Borrado lógico: los comentarios borrados quedan como marca (tombstone)
+    # para /changes y el índice TTL los elimina pasado COMMENT_TOMBSTONE_TTL_SECONDS
+    deleted_at: Optional[datetime] = None
 
     @validator('content')
     def content_must_not_be_empty(cls, v):
@@ -26,4 +35,43 @@ class Comment(Document):
         return v
 
     class Settings:
-        name = "comments"
\ No newline at end of file
+        name = "comments"
+        # Beanie crea estos índices en init_beanie (ver src/database.py).
+        indexes = [
+            # Listado de comentarios de un tablero, paginado por (created_at, _id).
+            IndexModel(
+                [("dashboard_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+                name="dashboard_created_at_id",
+            ),
+            # Versión del tablero (conteo y último updated_at) para ETag y
+            # cambios desde un cursor (/dashboards/{id}/changes).
+            IndexModel(
+                [("dashboard_id", ASCENDING), ("updated_at", ASCENDING)],
+                name="dashboard_updated_at",
+            ),
+            # Comentarios de un usuario dentro de un tablero.
+            IndexModel(
+                [("dashboard_id", ASCENDING), ("user_id", ASCENDING)],
+                name="dashboard_user",
+            ),
+            # Búsquedas exactas por contenido (rutas /update/{text} y /text/{text}).
+            # Un índice hashed mantiene acotado el tamaño de cada clave.
+            IndexModel([("content", HASHED)], name="content_hashed"),
+            # Consultas por viewport ($geoWithin/$box). Las coordenadas [x, y] ya
+            # son pares "legacy" indexables; el lienzo no está limitado a ±180,
+            # por eso se amplían los límites y la precisión del índice.
+            IndexModel(
+                [("coordinates", GEO2D), ("dashboard_id", ASCENDING)],
+                name="coordinates_2d_dashboard",
+                min=settings.COORDINATES_INDEX_MIN,
+                max=settings.COORDINATES_INDEX_MAX,
+                bits=32,
+            ),
+            # Elimina las marcas de borrado caducadas; los documentos sin
+            # deleted_at (no borrados) no expiran.
+            IndexModel(
+                [("deleted_at", ASCENDING)],
+                name="deleted_at_ttl",
+                expireAfterSeconds=settings.COMMENT_TOMBSTONE_TTL_SECONDS,
+            ),
+        ]
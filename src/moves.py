@@ -0,0 +1,72 @@
+# src/moves.py
+"""
+Coalesced persistence of comment moves received over WebSocket.
+
+While a pin is dragged the client sends many "move" messages. Peers get each
+position straight away (see CommentConnectionManager.broadcast_comment_moved),
+but MongoDB only sees the latest position of each comment, at most once per
+interval: the first move of a comment starts a timer, later moves overwrite
+the pending position, and when the timer fires the last one is written.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (dashboard_id, comment_id, coordinates) -> writes the position
+PersistMove = Callable[[str, str, List[float]], Awaitable[None]]
+
+
+class MoveCoalescer:
+    def __init__(self, persist: PersistMove, interval_seconds: float):
+        self.persist = persist
+        self.interval_seconds = interval_seconds
+        # comment_id -> (dashboard_id, latest coordinates) not yet written
+        self._pending: Dict[str, Tuple[str, List[float]]] = {}
+        # comment_id -> task writing that comment's position every interval
+        self._writers: Dict[str, asyncio.Task] = {}
+        self.moves = 0
+        self.writes = 0
+
+    def move(self, dashboard_id: str, comment_id: str, coordinates: List[float]):
+        """Record the latest position of a comment; it is written within interval_seconds"""
+        self.moves += 1
+        self._pending[comment_id] = (dashboard_id, coordinates)
+        if comment_id not in self._writers:
+            self._writers[comment_id] = asyncio.create_task(self._write_loop(comment_id))
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def _write_loop(self, comment_id: str):
+        try:
+            # Moves that arrive while a write is in flight are picked up by the next round
+            while comment_id in self._pending:
+                await asyncio.sleep(self.interval_seconds)
+                await self._write(comment_id)
+        finally:
+            self._writers.pop(comment_id, None)
+
+    async def _write(self, comment_id: str):
+        entry = self._pending.get(comment_id)
+        if entry is None:
+            return
+        dashboard_id, coordinates = entry
+        try:
+            await self.persist(dashboard_id, comment_id, coordinates)
+            self.writes += 1
+        except Exception as e:
+            logger.error("[MOVE] Error persisting position of comment %s: %s", comment_id, e, exc_info=True)
+        # Only drop the entry if no newer position arrived during the write
+        if self._pending.get(comment_id) is entry:
+            del self._pending[comment_id]
+
+    async def flush(self):
+        """Write every pending position now (application shutdown)"""
+        writers = list(self._writers.values())
+        for task in writers:
+            task.cancel()
+        await asyncio.gather(*writers, return_exceptions=True)
+        for comment_id in list(self._pending):
+            await self._write(comment_id)
@@ -0,0 +1,80 @@
+# src/read_routing.py
+import time
+from typing import Callable, Dict, Hashable, Tuple
+
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+from .cache import LRUCache
+from .config import Config
+
+settings = Config()
+
+
+class ReadRouter:
+    """
+    Chooses the read preference of comment reads.
+
+    Reads go to secondaries (SecondaryPreferred with max_staleness) unless
+    this process wrote the dashboard or comment being read during the last
+    recent_write_window seconds; those reads stay on the primary so a client
+    sees its own writes. The window should be at least max_staleness, the
+    most a selected secondary may lag behind.
+
+    Writes are only known to the process that made them: another worker may
+    serve a read from a secondary up to max_staleness seconds old.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        max_staleness_seconds: int,
+        recent_write_window_seconds: float,
+        max_tracked_writes: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.enabled = enabled
+        self.secondary = SecondaryPreferred(max_staleness=max_staleness_seconds)
+        self.primary = Primary()
+        # Keys written recently; entries expire when the window closes
+        self._recent_writes = LRUCache(max_tracked_writes, recent_write_window_seconds, clock=clock)
+        # (collection full name, use primary) -> collection with that read preference
+        self._collections: Dict[Tuple[str, bool], object] = {}
+
+    def note_write(self, *keys: Hashable):
+        """Record a write to these dashboards / comments (call after every write)"""
+        for key in keys:
+            self._recent_writes.set(str(key), True)
+
+    def recently_wrote(self, *keys: Hashable) -> bool:
+        return any(self._recent_writes.get(str(key)) is not None for key in keys)
+
+    def read_preference(self, *keys: Hashable):
+        if not self.enabled or self.recently_wrote(*keys):
+            return self.primary
+        return self.secondary
+
+    def collection_for_read(self, collection, *keys: Hashable):
+        """The collection to read these dashboards / comments from"""
+        if not self.enabled:
+            return collection
+        use_primary = self.recently_wrote(*keys)
+        cache_key = (collection.full_name, use_primary)
+        routed = self._collections.get(cache_key)
+        if routed is None or routed.database.client is not collection.database.client:
+            routed = collection.with_options(
+                read_preference=self.primary if use_primary else self.secondary
+            )
+            self._collections[cache_key] = routed
+        return routed
+
+    def clear(self):
+        self._recent_writes.clear()
+        self._collections.clear()
+
+
+# Global instance
+read_router = ReadRouter(
+    enabled=settings.READ_FROM_SECONDARIES,
+    max_staleness_seconds=settings.READ_MAX_STALENESS_SECONDS,
+    recent_write_window_seconds=settings.READ_RECENT_WRITE_WINDOW_SECONDS,
+)
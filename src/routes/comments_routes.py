@@ -1,13 +1,37 @@
-from fastapi import APIRouter, HTTPException, status, Response, Query, Depends
+from fastapi import APIRouter, HTTPException, status, Response, Query, Depends, Header
+from fastapi.responses import StreamingResponse
 from beanie import PydanticObjectId 
+from bson import ObjectId
+from bson.errors import InvalidId
 from src import schemas
+from src.config import Config
 from src.models import Comment
+from src.cache import CachedResponse, dashboard_comments_cache
+from src.metrics import mongo_timer
+from src.read_routing import read_router
 from src.websocket_manager import comment_connection_manager
-from typing import List
-from datetime import datetime, timezone
+from pymongo import ReturnDocument, UpdateOne
+from typing import AsyncIterator, List, Optional, Tuple
+from pydantic import TypeAdapter
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import base64
+import math
+import binascii
 
 router = APIRouter()
 
+settings = Config()
+
+# Paginación por cursor del listado de un tablero
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+DASHBOARD_SORT = [("created_at", 1), ("_id", 1)]
+# Orden de /changes: por última modificación (índice dashboard_updated_at)
+CHANGES_SORT = [("updated_at", 1), ("_id", 1)]
+
+_comment_list_adapter = TypeAdapter(List[schemas.CommentOut])
+
 # Handle CORS preflight OPTIONS requests
 @router.options("/dashboards/{dashboard_id}/users/{user_id}/comments")
 async def options_comments():
@@ -27,12 +51,312 @@ async def parse_coordinates(
 ) -> List[float]:
     try:
         coords_list = [float(c.strip()) for c in coordinates.split(',')]
-        if len(coords_list) != 2:
-            raise ValueError("Las coordenadas deben tener dos valores (x,y).")
-        return coords_list
+        return schemas.validate_coordinates(coords_list)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Formato de coordenadas inválido: {e}")
 
+def encode_page_cursor(created_at: datetime, comment_id: ObjectId) -> str:
+    """Codifica la posición (created_at, _id) del último comentario de una página."""
+    raw = f"{created_at.isoformat()}|{comment_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_page_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, comment_id = raw.split("|")
+        return datetime.fromisoformat(created_at), ObjectId(comment_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, InvalidId):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginación inválido")
+
+def viewport_query(dashboard_id: PydanticObjectId, x0: float, y0: float, x1: float, y1: float) -> dict:
+    """Filtro de comentarios dentro del rectángulo visible, resuelto por el índice 2d."""
+    lower_left = [min(x0, x1), min(y0, y1)]
+    upper_right = [max(x0, x1), max(y0, y1)]
+    return {
+        "dashboard_id": dashboard_id,
+        "coordinates": {"$geoWithin": {"$box": [lower_left, upper_right]}},
+        "deleted_at": None,
+    }
+
+def _keyset_after(field: str, position: Tuple[datetime, ObjectId]) -> list:
+    """Condición $or de los documentos posteriores a (field, _id) en el orden (field, _id)."""
+    value, last_id = position
+    return [
+        {field: {"$gt": value}},
+        {field: value, "_id": {"$gt": last_id}},
+    ]
+
+def dashboard_page_query(dashboard_id: PydanticObjectId, after: Optional[Tuple[datetime, ObjectId]] = None) -> dict:
+    """Filtro de una página del listado, en el orden DASHBOARD_SORT, tras el cursor after."""
+    query = {"dashboard_id": dashboard_id, "deleted_at": None}
+    if after is not None:
+        query["$or"] = _keyset_after("created_at", after)
+    return query
+
+def changes_query(dashboard_id: PydanticObjectId, since: Optional[Tuple[datetime, ObjectId]] = None) -> dict:
+    """Filtro de /changes, en el orden CHANGES_SORT; incluye los borrados (tombstones)."""
+    query = {"dashboard_id": dashboard_id}
+    if since is not None:
+        query["$or"] = _keyset_after("updated_at", since)
+    return query
+
+def cluster_pipeline(dashboard_id: PydanticObjectId, cell_size: float) -> list:
+    """Agrupa los comentarios de un tablero en celdas de cell_size x cell_size."""
+    x = {"$arrayElemAt": ["$coordinates", 0]}
+    y = {"$arrayElemAt": ["$coordinates", 1]}
+    return [
+        {"$match": {"dashboard_id": dashboard_id, "deleted_at": None}},
+        {"$group": {
+            "_id": {
+                "x": {"$floor": {"$divide": [x, cell_size]}},
+                "y": {"$floor": {"$divide": [y, cell_size]}},
+            },
+            "count": {"$sum": 1},
+            "centroid_x": {"$avg": x},
+            "centroid_y": {"$avg": y},
+            "comment_id": {"$first": "$_id"},
+        }},
+    ]
+
+def _as_utc(value: datetime) -> datetime:
+    # MongoDB devuelve fechas naive en UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def _naive_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def _http_date(value: Optional[datetime]) -> Optional[str]:
+    return format_datetime(_as_utc(value), usegmt=True) if value else None
+
+def dashboard_etag(count: int, last_updated: Optional[datetime]) -> str:
+    """ETag débil de un tablero: número de comentarios y último updated_at (ms)."""
+    last_ms = int(_as_utc(last_updated).timestamp() * 1000) if last_updated else 0
+    return f'W/"{count}-{last_ms}"'
+
+def comment_etag(document: dict) -> str:
+    """ETag fuerte de un comentario: su versión, que cambia en cada actualización."""
+    return f'"{document.get("version", 0)}"'
+
+def if_match_versions(if_match: str) -> Optional[List[Optional[int]]]:
+    """
+    Versiones aceptadas por una cabecera If-Match (None si es "*").
+
+    If-Match usa comparación fuerte: las etiquetas débiles (W/) no coinciden.
+    Los comentarios anteriores al campo version cuentan como versión 0.
+    """
+    if if_match.strip() == "*":
+        return None
+    versions = []
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        if tag.startswith('"') and tag.endswith('"') and tag[1:-1].isdigit():
+            versions.append(int(tag[1:-1]))
+    if 0 in versions:
+        versions.append(None)
+    return versions
+
+async def dashboard_version(dashboard_id: PydanticObjectId) -> Tuple[int, Optional[datetime]]:
+    """Número de comentarios y último updated_at, sin leer los documentos completos."""
+    with mongo_timer("aggregate_version"):
+        result = await _read_collection(dashboard_id).aggregate([
+            {"$match": {"dashboard_id": dashboard_id, "deleted_at": None}},
+            {"$group": {"_id": None, "count": {"$sum": 1}, "last_updated": {"$max": "$updated_at"}}},
+        ]).to_list(length=1)
+    if not result:
+        return 0, None
+    return result[0]["count"], result[0]["last_updated"]
+
+def _read_collection(*keys):
+    """Colección para leer estos tableros / comentarios (secundario salvo escritura reciente)."""
+    return read_router.collection_for_read(Comment.get_motor_collection(), *keys)
+
+def is_not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    etag: str,
+    last_modified: Optional[str],
+) -> bool:
+    """Evalúa If-None-Match (prioritario) o If-Modified-Since según RFC 9110."""
+    if if_none_match is not None:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or etag.removeprefix("W/") in candidates
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _validator_headers(etag: str, last_modified: Optional[str]) -> dict:
+    headers = {"ETag": etag}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+async def _stream_ndjson(cursor) -> AsyncIterator[str]:
+    """Genera una línea JSON por documento sin acumular el resultado en memoria."""
+    async for document in cursor:
+        yield schemas.CommentOut.model_validate(document).model_dump_json(by_alias=True) + "\n"
+
+def _checked_coordinates(coordinates: List[float]) -> List[float]:
+    """schemas.validate_coordinates con un 400 en lugar de un WriteError del índice 2d."""
+    try:
+        return schemas.validate_coordinates(coordinates)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def _update_fields(comment_update: schemas.CommentUpdate, no_data_detail: str = "No se enviaron datos") -> dict:
+    """
+    Campos enviados en una actualización, listos para un $set: responde 400 si
+    no hay ninguno o alguno es null (se escribiría tal cual en MongoDB), y
+    guarda el contenido sin espacios alrededor.
+    """
+    update_data = comment_update.model_dump(exclude_unset=True, exclude={"id"})
+    if not update_data:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=no_data_detail)
+    null_fields = [field for field, value in update_data.items() if value is None]
+    if null_fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Los campos no pueden ser null: {', '.join(null_fields)}"
+        )
+
+    # Validar que el contenido no esté vacío si se está actualizando
+    if 'content' in update_data:
+        content = update_data['content'].strip()
+        if not content:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El contenido del comentario no puede estar vacío"
+            )
+        update_data['content'] = content
+    if 'coordinates' in update_data:
+        _checked_coordinates(update_data['coordinates'])
+    return update_data
+
+async def _update_comment_atomically(query: dict, update_data: dict, if_match: Optional[str]) -> dict:
+    """
+    Aplica update_data con un único find_one_and_update ($set de los campos
+    cambiados, updated_at y versión + 1) y devuelve el documento resultante.
+
+    Con If-Match la actualización solo se aplica si la versión coincide;
+    si no, responde 412 en lugar de sobrescribir cambios ajenos.
+    """
+    update_data["updated_at"] = datetime.now(timezone.utc)
+    query = {**query, "deleted_at": None}
+    guarded_query = dict(query)
+    if if_match is not None:
+        versions = if_match_versions(if_match)
+        if versions is not None:
+            guarded_query["version"] = {"$in": versions}
+
+    collection = Comment.get_motor_collection()
+    with mongo_timer("find_one_and_update"):
+        document = await collection.find_one_and_update(
+            guarded_query,
+            {"$set": update_data, "$inc": {"version": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+    if document is None:
+        if "version" in guarded_query:
+            with mongo_timer("find_one"):
+                exists = await collection.find_one(query, projection={"_id": 1})
+            if exists is not None:
+                raise HTTPException(
+                    status_code=status.HTTP_412_PRECONDITION_FAILED,
+                    detail="El comentario fue modificado por otra petición"
+                )
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comentario no encontrado")
+    return document
+
+async def _publish_update(document: dict):
+    """Invalida cachés y notifica a los clientes un comentario actualizado."""
+    read_router.note_write(document["dashboard_id"], document["_id"])
+    await dashboard_comments_cache.invalidate(str(document["dashboard_id"]))
+
+    # Broadcast the updated comment to all connected clients
+    await comment_connection_manager.broadcast_comment_updated(
+        str(document["dashboard_id"]),
+        document
+    )
+
+async def _soft_delete(query: dict) -> Optional[dict]:
+    """
+    Marca como borrado el primer comentario vivo que cumpla query, con un único
+    find_one_and_update. updated_at y version cambian para que el borrado
+    aparezca en /changes. Devuelve dashboard_id e _id, o None si no existe.
+    """
+    now = datetime.now(timezone.utc)
+    with mongo_timer("soft_delete"):
+        return await Comment.get_motor_collection().find_one_and_update(
+            {**query, "deleted_at": None},
+            {"$set": {"deleted_at": now, "updated_at": now}, "$inc": {"version": 1}},
+            projection={"dashboard_id": 1},
+        )
+
+async def _after_update(document: dict, response: Response) -> dict:
+    """Invalida cachés, notifica a los clientes y añade el nuevo ETag a la respuesta."""
+    await _publish_update(document)
+    response.headers["ETag"] = comment_etag(document)
+    return document
+
+async def persist_comment_move(dashboard_id: str, comment_id: str, coordinates: List[float]):
+    """
+    Guarda la última posición de un comentario arrastrado por WebSocket
+    (llamado por MoveCoalescer, como mucho una vez por intervalo).
+
+    Los clientes ya recibieron cada posición como comment_moved; el
+    comment_updated final les lleva la nueva versión. Un comentario que no
+    existe en ese tablero se ignora.
+    """
+    query = {"_id": ObjectId(comment_id), "dashboard_id": ObjectId(dashboard_id)}
+    try:
+        document = await _update_comment_atomically(query, {"coordinates": coordinates}, None)
+    except HTTPException:
+        return
+    await _publish_update(document)
+
+def _cached_list(comments: List[dict]) -> CachedResponse:
+    """Listado completo serializado una vez, con sus validadores, tal como se guarda en caché."""
+    last_updated = max((c["updated_at"] for c in comments), default=None)
+    return CachedResponse(
+        body=_comment_list_adapter.dump_json(
+            _comment_list_adapter.validate_python(comments), by_alias=True
+        ),
+        etag=dashboard_etag(len(comments), last_updated),
+        last_modified=_http_date(last_updated),
+    )
+
+async def dashboard_snapshot_body(dashboard_id: str) -> bytes:
+    """
+    Listado completo de un tablero (JSON) para el snapshot del WebSocket,
+    compartido con GET /dashboards/{id} a través de la caché.
+
+    El snapshot debe incluir todo evento ya numerado: las entradas de la
+    caché se invalidan antes de numerar cada evento (ver deliver_local) y,
+    si hay lecturas en secundarios, se lee siempre del primario.
+    """
+    if not read_router.enabled:
+        cached = await dashboard_comments_cache.get(dashboard_id)
+        if cached is not None:
+            return cached.body
+    generation = dashboard_comments_cache.generation
+    cursor = Comment.get_motor_collection().find(
+        {"dashboard_id": ObjectId(dashboard_id), "deleted_at": None},
+        sort=DASHBOARD_SORT,
+        batch_size=STREAM_BATCH_SIZE,
+    )
+    with mongo_timer("find_snapshot"):
+        comments = await cursor.to_list(length=None)
+    cached = _cached_list(comments)
+    await dashboard_comments_cache.set(dashboard_id, cached, generation)
+    return cached.body
+
+# GET Estadísticas de la caché de listados por tablero.
+@router.get("/cache/stats", summary="Estadísticas de la caché de comentarios")
+async def get_cache_stats():
+    return dashboard_comments_cache.stats()
+
 # POST Crea un nuevo comentario en un tablero.
 @router.post(
     "/dashboards/{dashboard_id}/users/{user_id}/comments",
@@ -54,12 +378,7 @@ async def create_comment(
             detail="El contenido del comentario no puede estar vacío"
         )
     
-    coords_list = [float(c.strip()) for c in comment_in.coordinates.split(',')]
-    if len(coords_list) != 2:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Las coordenadas deben tener dos valores (x,y)."
-        )
+    coords_list = _checked_coordinates([float(c.strip()) for c in comment_in.coordinates.split(',')])
 
     new_comment = Comment(
         content=content,  # Usar el contenido limpio
@@ -68,22 +387,15 @@ async def create_comment(
         user_name=comment_in.user_name,  # Store the username
         coordinates=coords_list
     )
-    await new_comment.insert()
+    with mongo_timer("insert_one"):
+        await new_comment.insert()
+    read_router.note_write(dashboard_id, new_comment.id)
+    await dashboard_comments_cache.invalidate(str(dashboard_id))
     
     # Broadcast the new comment to all connected clients
-    comment_dict = {
-        "_id": str(new_comment.id),
-        "dashboard_id": str(new_comment.dashboard_id),
-        "user_id": str(new_comment.user_id),
-        "user_name": new_comment.user_name,  # Include username in broadcast
-        "content": new_comment.content,
-        "coordinates": new_comment.coordinates,
-        "created_at": new_comment.created_at.isoformat(),
-        "updated_at": new_comment.updated_at.isoformat()
-    }
     await comment_connection_manager.broadcast_comment_created(
         str(dashboard_id),
-        comment_dict
+        new_comment
     )
     
     return new_comment
@@ -94,159 +406,271 @@ async def create_comment(
     response_model=schemas.CommentOut,
     summary="Obtener un comentario por su ID"
 )
-async def get_comment(comment_id: PydanticObjectId):
-    comment = await Comment.get(comment_id)
-    if not comment:
+async def get_comment(
+    comment_id: PydanticObjectId,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+):
+    with mongo_timer("find_one"):
+        document = await _read_collection(comment_id).find_one({"_id": comment_id, "deleted_at": None})
+    if not document:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comentario no encontrado")
-    return comment
+
+    headers = _validator_headers(comment_etag(document), _http_date(document["updated_at"]))
+    if is_not_modified(if_none_match, if_modified_since, headers["ETag"], headers.get("Last-Modified")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return document
 
 # GET Obtiene todos los comentarios de un tablero.
 @router.get(
     "/dashboards/{dashboard_id}",
     response_model=List[schemas.CommentOut],
-    summary="Obtener todos los comentarios de un tablero"
+    summary="Obtener todos los comentarios de un tablero",
+    description=(
+        "Devuelve los comentarios del tablero ordenados por (created_at, _id). "
+        "Con `limit` se pagina por cursor: la cabecera `X-Next-Cursor` trae el valor "
+        "para `after` de la siguiente página. Con `stream=true` la respuesta es NDJSON "
+        "generada directamente desde el cursor de MongoDB. El listado completo admite "
+        "If-None-Match / If-Modified-Since y responde 304 si el tablero no cambió."
+    )
 )
-async def get_all_comments_from_dashboard(dashboard_id: PydanticObjectId):
-    comments = await Comment.find(
-        Comment.dashboard_id == dashboard_id
-    ).to_list()
+async def get_all_comments_from_dashboard(
+    dashboard_id: PydanticObjectId,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamaño máximo de la página."),
+    after: Optional[str] = Query(None, description="Cursor de la página anterior (cabecera X-Next-Cursor)."),
+    stream: bool = Query(False, description="Devolver los comentarios como NDJSON en streaming."),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+):
+    # El listado completo se sirve desde la caché como bytes ya serializados.
+    use_cache = limit is None and after is None and not stream
+    if use_cache:
+        cache_key = str(dashboard_id)
+        cached = await dashboard_comments_cache.get(cache_key)
+        if cached is not None:
+            headers = _validator_headers(cached.etag, cached.last_modified)
+            if is_not_modified(if_none_match, if_modified_since, cached.etag, cached.last_modified):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            return Response(content=cached.body, media_type="application/json", headers=headers)
+        generation = dashboard_comments_cache.generation
+
+        if if_none_match is not None or if_modified_since is not None:
+            count, last_updated = await dashboard_version(dashboard_id)
+            etag, last_modified = dashboard_etag(count, last_updated), _http_date(last_updated)
+            if is_not_modified(if_none_match, if_modified_since, etag, last_modified):
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers=_validator_headers(etag, last_modified),
+                )
+
+    query = dashboard_page_query(dashboard_id, decode_page_cursor(after) if after is not None else None)
+    cursor = _read_collection(dashboard_id).find(
+        query,
+        sort=DASHBOARD_SORT,
+        limit=limit or 0,
+        batch_size=STREAM_BATCH_SIZE,
+    )
+
+    if stream:
+        return StreamingResponse(_stream_ndjson(cursor), media_type="application/x-ndjson")
+
+    with mongo_timer("find_dashboard"):
+        comments = await cursor.to_list(length=None)
+    if use_cache:
+        cached = _cached_list(comments)
+        await dashboard_comments_cache.set(cache_key, cached, generation)
+        return Response(
+            content=cached.body,
+            media_type="application/json",
+            headers=_validator_headers(cached.etag, cached.last_modified),
+        )
+
+    if limit is not None and len(comments) == limit:
+        last = comments[-1]
+        response.headers["X-Next-Cursor"] = encode_page_cursor(last["created_at"], last["_id"])
     return comments
 
+# GET Obtiene los comentarios dentro del área visible de un tablero.
+@router.get(
+    "/dashboards/{dashboard_id}/viewport",
+    response_model=List[schemas.CommentOut],
+    summary="Obtener los comentarios visibles en un área del tablero",
+    description="Devuelve los comentarios cuyas coordenadas caen dentro del rectángulo (x0,y0)-(x1,y1)."
+)
+async def get_comments_in_viewport(
+    dashboard_id: PydanticObjectId,
+    x0: float = Query(..., description="Coordenada x de una esquina del rectángulo."),
+    y0: float = Query(..., description="Coordenada y de una esquina del rectángulo."),
+    x1: float = Query(..., description="Coordenada x de la esquina opuesta."),
+    y1: float = Query(..., description="Coordenada y de la esquina opuesta."),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Número máximo de comentarios."),
+):
+    # FastAPI acepta nan/inf en un float; el índice 2d los rechaza con un error
+    if not all(math.isfinite(value) for value in (x0, y0, x1, y1)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Las esquinas del rectángulo deben ser números finitos."
+        )
+    cursor = _read_collection(dashboard_id).find(
+        viewport_query(dashboard_id, x0, y0, x1, y1),
+        limit=limit or 0,
+    )
+    with mongo_timer("find_viewport"):
+        return await cursor.to_list(length=None)
+
+# GET Agrupa los comentarios de un tablero por celdas (vista general).
+@router.get(
+    "/dashboards/{dashboard_id}/clusters",
+    response_model=List[schemas.CommentCluster],
+    summary="Agrupar los comentarios de un tablero en una cuadrícula",
+    description=(
+        "Devuelve, por cada celda de tamaño `cell_size` que contiene comentarios, "
+        "el número de comentarios y su centroide. Pensado para la vista alejada del tablero."
+    )
+)
+async def get_comment_clusters(
+    dashboard_id: PydanticObjectId,
+    cell_size: float = Query(..., gt=0, description="Lado de cada celda en unidades del lienzo."),
+):
+    with mongo_timer("aggregate_clusters"):
+        clusters = await _read_collection(dashboard_id).aggregate(
+            cluster_pipeline(dashboard_id, cell_size)
+        ).to_list(length=None)
+    return [
+        schemas.CommentCluster(
+            cell=[int(c["_id"]["x"]), int(c["_id"]["y"])],
+            count=c["count"],
+            centroid=[c["centroid_x"], c["centroid_y"]],
+            comment_id=c["comment_id"] if c["count"] == 1 else None,
+        )
+        for c in clusters
+    ]
+
+# GET Cambios de un tablero desde un cursor (sincronización incremental).
+@router.get(
+    "/dashboards/{dashboard_id}/changes",
+    response_model=schemas.CommentChanges,
+    summary="Obtener los cambios de un tablero desde un cursor",
+    description=(
+        "Devuelve los comentarios creados o modificados y los IDs borrados desde `since`, "
+        "ordenados por updated_at. Sin `since` devuelve el estado completo del tablero. "
+        "El `cursor` de la respuesta es el `since` de la siguiente llamada; si `has_more` es "
+        "true hay más cambios. Un cursor más antiguo que las marcas de borrado conservadas "
+        "responde 410 y el cliente debe volver a cargar el tablero completo."
+    )
+)
+async def get_dashboard_changes(
+    dashboard_id: PydanticObjectId,
+    since: Optional[str] = Query(None, description="Cursor devuelto por la llamada anterior."),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Número máximo de cambios."),
+):
+    now = datetime.now(timezone.utc)
+    position = None
+    if since is not None:
+        position = decode_page_cursor(since)
+        if _as_utc(position[0]) < now - timedelta(seconds=settings.COMMENT_TOMBSTONE_TTL_SECONDS):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="El cursor es anterior a los borrados conservados; vuelva a cargar el tablero"
+            )
+
+    # Siempre del primario: un secundario puede ir hasta READ_MAX_STALENESS_SECONDS
+    # por detrás, más que el margen del cursor, y el cliente perdería esas escrituras.
+    # Se pide uno más para saber si quedan cambios sin devolver.
+    cursor = Comment.get_motor_collection().find(changes_query(dashboard_id, position), sort=CHANGES_SORT, limit=limit + 1)
+    with mongo_timer("find_changes"):
+        documents = await cursor.to_list(length=None)
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    if documents:
+        position = (_naive_utc(documents[-1]["updated_at"]), documents[-1]["_id"])
+
+    if not has_more:
+        # Una escritura concurrente puede guardarse con un updated_at algo anterior
+        # al último devuelto; el cursor se queda CHANGES_CURSOR_LAG_SECONDS atrás y
+        # esos cambios recientes se vuelven a enviar en la siguiente llamada.
+        settled = (_naive_utc(now - timedelta(seconds=settings.CHANGES_CURSOR_LAG_SECONDS)), ObjectId("0" * 24))
+        if position is None or _naive_utc(position[0]) > settled[0]:
+            position = settled
+
+    return schemas.CommentChanges(
+        updated=[d for d in documents if d.get("deleted_at") is None],
+        deleted=[d["_id"] for d in documents if d.get("deleted_at") is not None],
+        cursor=encode_page_cursor(*position),
+        has_more=has_more,
+    )
+
 # PUT Actualiza un comentario por su contenido.
 @router.put(
     "/update/{comment_text}",
     response_model=schemas.CommentOut,
-    summary="Actualizar un comentario por su contenido"
+    summary="Actualizar un comentario por su contenido",
+    description="Admite If-Match con el ETag del comentario; si la versión no coincide responde 412."
 )
-async def update_comment_by_text(comment_text: str, comment_update: schemas.CommentUpdate):
-    comment = await Comment.find_one(Comment.content == comment_text)
-    if not comment:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comentario no encontrado")
-
-    update_data = comment_update.model_dump(exclude_unset=True)
-    if not update_data:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No se enviaron datos para actualizar")
-
-    for key, value in update_data.items():
-        setattr(comment, key, value)
-    comment.updated_at = datetime.now(timezone.utc)
+async def update_comment_by_text(
+    comment_text: str,
+    comment_update: schemas.CommentUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+):
+    update_data = _update_fields(comment_update, "No se enviaron datos para actualizar")
 
-    await comment.save()
-    
-    # Broadcast the updated comment to all connected clients
-    comment_dict = {
-        "_id": str(comment.id),
-        "dashboard_id": str(comment.dashboard_id),
-        "user_id": str(comment.user_id),
-        "content": comment.content,
-        "coordinates": comment.coordinates,
-        "created_at": comment.created_at.isoformat(),
-        "updated_at": comment.updated_at.isoformat()
-    }
-    await comment_connection_manager.broadcast_comment_updated(
-        str(comment.dashboard_id),
-        comment_dict
-    )
-    
-    return comment
+    document = await _update_comment_atomically({"content": comment_text}, update_data, if_match)
+    return await _after_update(document, response)
 
 # PUT Actualiza un comentario por Id.
 @router.put(
     "/{comment_id}",
     response_model=schemas.CommentOut,
-    summary="Actualizar un comentario por ID"
+    summary="Actualizar un comentario por ID",
+    description="Admite If-Match con el ETag del comentario; si la versión no coincide responde 412."
 )
-async def update_comment(comment_id: PydanticObjectId, comment_update: schemas.CommentUpdate):
-    comment = await Comment.get(comment_id)
-    if not comment:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comentario no encontrado")
-
-    update_data = comment_update.model_dump(exclude_unset=True)
-    if not update_data:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No se enviaron datos")
-
-    # Validar que el contenido no esté vacío si se está actualizando
-    if 'content' in update_data:
-        content = update_data['content'].strip()
-        if not content:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El contenido del comentario no puede estar vacío"
-            )
-        update_data['content'] = content
-
-    for key, value in update_data.items():
-        setattr(comment, key, value)
-    comment.updated_at = datetime.now(timezone.utc)
-
-    await comment.save()
-    
-    # Broadcast the updated comment to all connected clients
-    comment_dict = {
-        "_id": str(comment.id),
-        "dashboard_id": str(comment.dashboard_id),
-        "user_id": str(comment.user_id),
-        "content": comment.content,
-        "coordinates": comment.coordinates,
-        "created_at": comment.created_at.isoformat(),
-        "updated_at": comment.updated_at.isoformat()
-    }
-    await comment_connection_manager.broadcast_comment_updated(
-        str(comment.dashboard_id),
-        comment_dict
-    )
-    
-    return comment
+async def update_comment(
+    comment_id: PydanticObjectId,
+    comment_update: schemas.CommentUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+):
+    update_data = _update_fields(comment_update)
+    document = await _update_comment_atomically({"_id": comment_id}, update_data, if_match)
+    return await _after_update(document, response)
 
 # PUT Actualiza solo las coordenadas de un comentario
 @router.put(
     "/{comment_id}/coordinates",
     response_model=schemas.CommentOut,
-    summary="Actualizar coordenadas de un comentario"
+    summary="Actualizar coordenadas de un comentario",
+    description=(
+        "Solo modifica las coordenadas, por lo que no pisa ediciones concurrentes del contenido. "
+        "Admite If-Match con el ETag del comentario."
+    )
 )
-async def update_comment_coordinates(comment_id: PydanticObjectId, coordinates: List[float]):
-    comment = await Comment.get(comment_id)
-    if not comment:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comentario no encontrado")
-    
-    if len(coordinates) != 2:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Las coordenadas deben tener dos valores (x,y)."
-        )
+async def update_comment_coordinates(
+    comment_id: PydanticObjectId,
+    coordinates: List[float],
+    response: Response,
+    if_match: Optional[str] = Header(None),
+):
+    _checked_coordinates(coordinates)
 
-    comment.coordinates = coordinates
-    comment.updated_at = datetime.now(timezone.utc)
-    await comment.save()
-    
-    # Broadcast the updated comment to all connected clients
-    comment_dict = {
-        "_id": str(comment.id),
-        "dashboard_id": str(comment.dashboard_id),
-        "user_id": str(comment.user_id),
-        "content": comment.content,
-        "coordinates": comment.coordinates,
-        "created_at": comment.created_at.isoformat(),
-        "updated_at": comment.updated_at.isoformat()
-    }
-    await comment_connection_manager.broadcast_comment_updated(
-        str(comment.dashboard_id),
-        comment_dict
-    )
-    
-    return comment
+    document = await _update_comment_atomically({"_id": comment_id}, {"coordinates": coordinates}, if_match)
+    return await _after_update(document, response)
 
 # DELETE Elimina un comentario por Id.
 @router.delete("/{comment_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Eliminar un comentario por ID")
 async def delete_comment(comment_id: PydanticObjectId):
-    comment = await Comment.get(comment_id)
-    if not comment:
+    deleted = await _soft_delete({"_id": comment_id})
+    if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comentario no encontrado")
 
-    dashboard_id = str(comment.dashboard_id)
-    comment_id_str = str(comment.id)
+    dashboard_id = str(deleted["dashboard_id"])
+    comment_id_str = str(deleted["_id"])
     
-    await comment.delete()
+    read_router.note_write(dashboard_id, comment_id_str)
+    await dashboard_comments_cache.invalidate(dashboard_id)
     
     # Broadcast the deletion to all connected clients
     await comment_connection_manager.broadcast_comment_deleted(
@@ -259,15 +683,16 @@ async def delete_comment(comment_id: PydanticObjectId):
 # DELETE Elimina un comentario por texto específico.
 @router.delete("/text/{comment_text}", status_code=status.HTTP_200_OK, summary="Eliminar un comentario por su contenido")
 async def delete_comment_by_text(comment_text: str):
-    # Busca el primer comentario que coincida exactamente con el texto.
-    comment = await Comment.find_one(Comment.content == comment_text)
-    if not comment:
+    # Marca como borrado el primer comentario que coincida exactamente con el texto.
+    deleted = await _soft_delete({"content": comment_text})
+    if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comentario no encontrado")
 
-    dashboard_id = str(comment.dashboard_id)
-    comment_id_str = str(comment.id)
+    dashboard_id = str(deleted["dashboard_id"])
+    comment_id_str = str(deleted["_id"])
     
-    await comment.delete()
+    read_router.note_write(dashboard_id, comment_id_str)
+    await dashboard_comments_cache.invalidate(dashboard_id)
     
     # Broadcast the deletion to all connected clients
     await comment_connection_manager.broadcast_comment_deleted(
@@ -276,3 +701,121 @@ async def delete_comment_by_text(comment_text: str):
     )
     
     return {"message": "Comentario eliminado"}
+
+# POST Crea varios comentarios en un tablero con una sola escritura.
+@router.post(
+    "/dashboards/{dashboard_id}/users/{user_id}/comments/batch",
+    response_model=List[schemas.CommentOut],
+    status_code=status.HTTP_201_CREATED,
+    summary="Crear varios comentarios",
+    description="Inserta todos los comentarios con un único insert_many y emite un solo evento WebSocket."
+)
+async def create_comments_batch(
+    dashboard_id: PydanticObjectId,
+    user_id: PydanticObjectId,
+    batch: schemas.CommentBatchCreate
+):
+    new_comments = []
+    for comment_in in batch.comments:
+        content = comment_in.content.strip()
+        if not content:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El contenido del comentario no puede estar vacío"
+            )
+        new_comments.append(Comment(
+            id=PydanticObjectId(),
+            content=content,
+            dashboard_id=dashboard_id,
+            user_id=user_id,
+            user_name=comment_in.user_name,
+            coordinates=_checked_coordinates([float(c.strip()) for c in comment_in.coordinates.split(',')])
+        ))
+
+    with mongo_timer("insert_many"):
+        await Comment.insert_many(new_comments)
+    read_router.note_write(dashboard_id, *(comment.id for comment in new_comments))
+    await dashboard_comments_cache.invalidate(str(dashboard_id))
+
+    await comment_connection_manager.broadcast_comments_created_batch(
+        str(dashboard_id),
+        new_comments
+    )
+
+    return new_comments
+
+# PUT Actualiza varios comentarios de un tablero con una sola escritura.
+@router.put(
+    "/dashboards/{dashboard_id}/comments/batch",
+    response_model=List[schemas.CommentOut],
+    summary="Actualizar varios comentarios",
+    description=(
+        "Aplica todas las actualizaciones con un único bulk_write y emite un solo evento WebSocket. "
+        "Devuelve los comentarios actualizados; los IDs que no existen en el tablero se ignoran."
+    )
+)
+async def update_comments_batch(dashboard_id: PydanticObjectId, batch: schemas.CommentBatchUpdate):
+    now = datetime.now(timezone.utc)
+    operations = []
+    for item in batch.comments:
+        update_data = _update_fields(item)
+        update_data['updated_at'] = now
+        operations.append(UpdateOne(
+            {"_id": item.id, "dashboard_id": dashboard_id, "deleted_at": None},
+            {"$set": update_data, "$inc": {"version": 1}}
+        ))
+
+    collection = Comment.get_motor_collection()
+    with mongo_timer("bulk_write"):
+        await collection.bulk_write(operations, ordered=False)
+    read_router.note_write(dashboard_id, *(item.id for item in batch.comments))
+    await dashboard_comments_cache.invalidate(str(dashboard_id))
+    with mongo_timer("find_many"):
+        updated = await collection.find({
+            "_id": {"$in": [item.id for item in batch.comments]},
+            "dashboard_id": dashboard_id,
+            "deleted_at": None,
+        }).to_list(length=None)
+
+    if updated:
+        await comment_connection_manager.broadcast_comments_updated_batch(
+            str(dashboard_id),
+            updated
+        )
+
+    return updated
+
+# POST Elimina varios comentarios de un tablero con una sola escritura.
+@router.post(
+    "/dashboards/{dashboard_id}/comments/batch/delete",
+    response_model=schemas.CommentBatchDeleteOut,
+    summary="Eliminar varios comentarios",
+    description=(
+        "Marca como borrados los comentarios indicados con un único update_many "
+        "y emite un solo evento WebSocket."
+    )
+)
+async def delete_comments_batch(dashboard_id: PydanticObjectId, batch: schemas.CommentBatchDelete):
+    collection = Comment.get_motor_collection()
+    query = {"_id": {"$in": batch.ids}, "dashboard_id": dashboard_id, "deleted_at": None}
+    with mongo_timer("find_many"):
+        existing = await collection.find(query, projection={"_id": 1}).to_list(length=None)
+    existing_ids = [document["_id"] for document in existing]
+    if not existing_ids:
+        return {"deleted": 0}
+
+    now = datetime.now(timezone.utc)
+    with mongo_timer("soft_delete_many"):
+        result = await collection.update_many(
+            {"_id": {"$in": existing_ids}, "deleted_at": None},
+            {"$set": {"deleted_at": now, "updated_at": now}, "$inc": {"version": 1}},
+        )
+    read_router.note_write(dashboard_id, *existing_ids)
+    await dashboard_comments_cache.invalidate(str(dashboard_id))
+
+    await comment_connection_manager.broadcast_comments_deleted_batch(
+        str(dashboard_id),
+        [str(comment_id) for comment_id in existing_ids]
+    )
+
+    return {"deleted": result.modified_count}
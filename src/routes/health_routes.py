@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Request, status
+from fastapi.responses import JSONResponse
+from pymongo.errors import PyMongoError
+from src.database import ping_ms, pool_monitor
+from src.models import Comment
+
+router = APIRouter()
+
+# GET El proceso está vivo (no consulta dependencias).
+@router.get("/health/live", summary="Comprobación de vida")
+async def liveness():
+    return {"status": "alive"}
+
+# GET El servicio puede atender peticiones: MongoDB responde.
+@router.get(
+    "/health/ready",
+    summary="Comprobación de disponibilidad",
+    description=(
+        "Hace ping a MongoDB y devuelve la latencia y el estado del pool de conexiones "
+        "de cada servidor. Responde 503 si MongoDB no está disponible."
+    )
+)
+async def readiness(request: Request):
+    client = getattr(request.app.state, "mongo_client", None) or Comment.get_motor_collection().database.client
+    try:
+        latency = await ping_ms(client)
+    except PyMongoError as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "mongo": {"error": str(e), "pools": pool_monitor.stats()}},
+        )
+    return {"status": "ready", "mongo": {"ping_ms": latency, "pools": pool_monitor.stats()}}
@@ -1,39 +1,124 @@
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
-from src.websocket_manager import comment_connection_manager
+import orjson
+from src.config import Config
+from src.moves import MoveCoalescer
+from src.routes.comments_routes import dashboard_snapshot_body, persist_comment_move
+from src.schemas import validate_coordinates
+from src.websocket_manager import ClientConnection, comment_connection_manager, encode_event, encode_snapshot
 import logging
 
 logger = logging.getLogger(__name__)
 
+settings = Config()
+
 router = APIRouter()
 
+# Positions sent with "move" are written to MongoDB at most once per interval per comment
+move_coalescer = MoveCoalescer(persist_comment_move, settings.WS_MOVE_PERSIST_INTERVAL_MS / 1000)
+
+
+def parse_move(message: dict) -> Tuple[str, List[float]]:
+    """
+    Validate a client "move" message:
+    {"type": "move", "comment_id": "<id>", "coordinates": [x, y]}
+    """
+    comment_id = message.get("comment_id")
+    if not isinstance(comment_id, str) or not ObjectId.is_valid(comment_id):
+        raise ValueError("comment_id must be a valid ObjectId")
+    coordinates = message.get("coordinates")
+    if (
+        not isinstance(coordinates, list)
+        or len(coordinates) != 2
+        or not all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in coordinates)
+    ):
+        raise ValueError("coordinates must be [x, y]")
+    # Same bounds as the REST routes: MongoDB rejects points outside the 2d index
+    return comment_id, validate_coordinates([float(c) for c in coordinates])
+
+
+def error_frame(detail: str) -> str:
+    return encode_event("error", orjson.dumps({"detail": detail}).decode())
+
+
+async def send_snapshot(connection: ClientConnection):
+    """Send the dashboard's current comments, then start the live events queued meanwhile"""
+    dashboard_id = connection.dashboard_id
+    body = await dashboard_snapshot_body(dashboard_id) if ObjectId.is_valid(dashboard_id) else b"[]"
+    for frame in encode_snapshot(connection.snapshot_seq, body, settings.WS_SNAPSHOT_CHUNK_SIZE):
+        await connection.send_now(frame)
+    connection.start()
+
+
 @router.websocket("/ws/dashboards/{dashboard_id}/comments")
 async def websocket_comments_endpoint(
     websocket: WebSocket,
     dashboard_id: str,
-    user_id: str = Query(None)  # Optional query parameter
+    user_id: str = Query(None),  # Optional query parameter
+    last_seq: Optional[int] = Query(None),  # seq of the last frame received, to resume
+    snapshot: bool = Query(False),  # send the current comments before live events
+    encoding: str = Query("json", pattern="^(json|msgpack)$"),  # msgpack: binary frames
 ):
     """
     WebSocket endpoint for real-time comment updates on a specific dashboard.
-    
+
     Clients connect to this endpoint to receive notifications when:
     - A new comment is created
     - A comment is updated
     - A comment is deleted
+    - A comment is being moved by another client (comment_moved)
+
+    Every frame but comment_moved carries a per-dashboard "seq". A client that
+    reconnects with ?last_seq=N gets the frames after N replayed first; if
+    they are no longer buffered it gets a snapshot of the current comments
+    instead, whose seq is the last event it includes. ?snapshot=1 asks for
+    that snapshot on a fresh connection, so no separate GET is needed. Large
+    boards are sent in several "snapshot" frames, the last with "done": true.
+
+    With ?encoding=msgpack every server frame is sent as a binary MessagePack
+    message with the same structure; client messages stay JSON text.
+
+    Clients may send {"type": "move", "comment_id": ..., "coordinates": [x, y]}
+    while dragging a comment. Other clients get a comment_moved event right away;
+    the position is persisted at most once per WS_MOVE_PERSIST_INTERVAL_MS.
     """
-    logger.info(f"WebSocket connection attempt for dashboard: {dashboard_id}, user: {user_id}")
-    
-    await comment_connection_manager.connect(websocket, dashboard_id)
-    
+    logger.debug("WebSocket connection attempt for dashboard: %s, user: %s", dashboard_id, user_id)
+
+    connection = await comment_connection_manager.connect(
+        websocket, dashboard_id, last_seq=last_seq, snapshot=snapshot, encoding=encoding
+    )
+
     try:
+        if connection.needs_snapshot:
+            await send_snapshot(connection)
+
         while True:
-            # Keep the connection alive and listen for any messages from client
-            # We don't expect clients to send data, but we need to keep the loop running
-            data = await websocket.receive_text()
-            logger.info(f"Received message from client on dashboard {dashboard_id}: {data}")
-            
+            raw = await websocket.receive_text()
+            try:
+                message = orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                connection.enqueue(connection.encode(error_frame("Messages must be JSON")))
+                continue
+            if not isinstance(message, dict) or message.get("type") != "move":
+                continue
+
+            if not ObjectId.is_valid(dashboard_id):
+                connection.enqueue(connection.encode(error_frame("dashboard_id must be a valid ObjectId")))
+                continue
+            try:
+                comment_id, coordinates = parse_move(message)
+            except ValueError as e:
+                connection.enqueue(connection.encode(error_frame(str(e))))
+                continue
+            await comment_connection_manager.broadcast_comment_moved(
+                dashboard_id, comment_id, coordinates, sender=connection.id
+            )
+            move_coalescer.move(dashboard_id, comment_id, coordinates)
+
     except WebSocketDisconnect:
-        logger.info(f"Client disconnected from comments for dashboard {dashboard_id}")
         await comment_connection_manager.disconnect(websocket, dashboard_id)
     except Exception as e:
-        logger.error(f"Error in WebSocket connection for dashboard {dashboard_id}: {e}")
+        logger.error("Error in WebSocket connection for dashboard %s: %s", dashboard_id, e)
         await comment_connection_manager.disconnect(websocket, dashboard_id)
@@ -1,7 +1,32 @@
+import math
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional, List
 from beanie import PydanticObjectId
 from datetime import datetime
+from .config import Config
+
+settings = Config()
+
+# Número máximo de comentarios por petición en las rutas de lote
+MAX_BATCH_SIZE = 500
+
+def validate_coordinates(coordinates: List[float]) -> List[float]:
+    """
+    Comprueba que las coordenadas sean finitas y estén dentro de los límites
+    [COORDINATES_INDEX_MIN, COORDINATES_INDEX_MAX) del índice 2d: MongoDB
+    rechaza la escritura de cualquier punto fuera de ellos. Lanza ValueError.
+    """
+    if len(coordinates) != 2:
+        raise ValueError("Las coordenadas deben tener dos valores (x,y).")
+    for value in coordinates:
+        if not math.isfinite(value):
+            raise ValueError("Las coordenadas deben ser números finitos.")
+        if not settings.COORDINATES_INDEX_MIN <= value < settings.COORDINATES_INDEX_MAX:
+            raise ValueError(
+                f"Las coordenadas deben estar en [{settings.COORDINATES_INDEX_MIN:g}, "
+                f"{settings.COORDINATES_INDEX_MAX:g})."
+            )
+    return coordinates
 
 class CommentBase(BaseModel):
     content: str = Field(..., min_length=1, max_length=500, json_schema_extra={"example": "Gran dibujo"})
@@ -14,6 +39,21 @@ class CommentUpdate(BaseModel):
     content: Optional[str] = Field(None, min_length=1, max_length=500, json_schema_extra={"example": "He actualizado mi comentario."})
     coordinates: Optional[List[float]] = Field(None, min_items=2, max_items=2, json_schema_extra={"example": [150.5, 320.0]})
 
+class CommentBatchCreate(BaseModel):
+    comments: List[CommentCreate] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class CommentBatchUpdateItem(CommentUpdate):
+    id: PydanticObjectId = Field(..., json_schema_extra={"example": "68dca9b72cbdae9d5f189556"})
+
+class CommentBatchUpdate(BaseModel):
+    comments: List[CommentBatchUpdateItem] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class CommentBatchDelete(BaseModel):
+    ids: List[PydanticObjectId] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class CommentBatchDeleteOut(BaseModel):
+    deleted: int
+
 class CommentOut(CommentBase):
     id: PydanticObjectId = Field(..., alias="_id")
     dashboard_id: PydanticObjectId
@@ -22,5 +62,18 @@ class CommentOut(CommentBase):
     coordinates: List[float]
     created_at: datetime
     updated_at: datetime
+    version: int = 0
     
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+class CommentChanges(BaseModel):
+    updated: List[CommentOut]  # Comentarios creados o modificados desde el cursor
+    deleted: List[PydanticObjectId]  # IDs borrados desde el cursor
+    cursor: str = Field(..., json_schema_extra={"example": "MjAyNS0wMS0wMVQwMDowMDowMHw2NjUw..."})
+    has_more: bool  # True si hay más cambios: repetir la petición con el nuevo cursor
+
+class CommentCluster(BaseModel):
+    cell: List[int] = Field(..., json_schema_extra={"example": [3, 7]})
+    count: int = Field(..., json_schema_extra={"example": 42})
+    centroid: List[float] = Field(..., json_schema_extra={"example": [310.2, 745.9]})
+    comment_id: Optional[PydanticObjectId] = None  # Solo cuando la celda tiene un único comentario
@@ -1,117 +1,602 @@
 # src/websocket_manager.py
+import asyncio
+import itertools
 import json
 import logging
-from typing import Dict
-from fastapi import WebSocket
+import secrets
+import time
+import uuid
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+from fastapi import WebSocket, status
+import msgpack
+import orjson
+from bson import ObjectId
+from src import schemas
+from src.backplane import Backplane, InMemoryBackplane
+from src.cache import LRUCache, dashboard_comments_cache
+from src.config import Config
+from src.metrics import BROADCAST_FANOUT_DURATION
 
 logger = logging.getLogger(__name__)
 
-class CommentConnectionManager:
+settings = Config()
+
+# (attribute on Comment, key on the wire / in MongoDB), following CommentOut
+_COMMENT_FIELDS = tuple(
+    (name, field.alias or name) for name, field in schemas.CommentOut.model_fields.items()
+)
+
+def _encode_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def _comment_payload(comment) -> dict:
+    if isinstance(comment, dict):
+        return {key: comment.get(key) for _, key in _COMMENT_FIELDS}
+    return {key: getattr(comment, name) for name, key in _COMMENT_FIELDS}
+
+def encode_comment(comment) -> str:
+    """JSON of a comment (Comment document or raw MongoDB dict) as sent to clients"""
+    return orjson.dumps(_comment_payload(comment), default=_encode_default).decode()
+
+def encode_comment_list(comments: list) -> str:
+    return orjson.dumps([_comment_payload(c) for c in comments], default=_encode_default).decode()
+
+def encode_event(event_type: str, data_json: str) -> str:
+    """
+    Build the frame sent to every client. Called once per event; the
+    resulting string is shared by all recipients.
+    """
+    return '{"type":"' + event_type + '","data":' + data_json + '}'
+
+def encode_msgpack(frame: str) -> bytes:
+    """The same frame as MessagePack, for clients connected with ?encoding=msgpack"""
+    return msgpack.packb(orjson.loads(frame))
+
+def encode_snapshot(seq: int, comments_json: bytes, chunk_size: int) -> Iterator[str]:
+    """
+    Frames with a dashboard's comments (a JSON array, e.g. the cached list
+    body), current up to the event numbered seq. Boards with more than
+    chunk_size comments are split over several frames; the last one has
+    "done": true.
+    """
+    prefix = '{"seq":' + str(seq) + ',"type":"snapshot","data":{"comments":'
+    comments = orjson.loads(comments_json)
+    if len(comments) <= chunk_size:
+        # The common case reuses the serialized body as is
+        yield prefix + comments_json.decode() + ',"done":true}}'
+        return
+    for start in range(0, len(comments), chunk_size):
+        chunk = orjson.dumps(comments[start:start + chunk_size]).decode()
+        done = "true" if start + chunk_size >= len(comments) else "false"
+        yield prefix + chunk + ',"done":' + done + '}}'
+
+class EventLog:
+    """
+    The last max_events frames broadcast to one dashboard, numbered with a
+    monotonic seq so that a client that reconnects can get what it missed.
+    """
+
+    def __init__(self, max_events: int):
+        self.frames = deque(maxlen=max_events)
+        # Random start: a last_seq from another worker, or from before a
+        # restart, falls outside this log and is answered with a snapshot
+        self.last_seq = secrets.randbelow(2 ** 52)
+
+    def append(self, message: str) -> str:
+        """Stamp the next seq into an encoded frame and keep it"""
+        self.last_seq += 1
+        frame = '{"seq":' + str(self.last_seq) + ',' + message[1:]
+        self.frames.append(frame)
+        return frame
+
+    def since(self, seq: int) -> Optional[List[str]]:
+        """Frames after seq, or None if they are no longer (or never were) in the log"""
+        first_seq = self.last_seq - len(self.frames) + 1
+        if seq < first_seq - 1 or seq > self.last_seq:
+            return None
+        return list(itertools.islice(self.frames, seq - first_seq + 1, None))
+
+# Events merged by the batching window; any other numbered event flushes it
+BATCHED_EVENTS = ("comment_created", "comment_updated", "comment_deleted")
+
+class EventBatch:
+    """
+    Events of one dashboard waiting for the batching window to close, one per
+    comment in first-seen order. A later event replaces the comment's earlier
+    one, except that an update of a comment created in the window is still
+    sent as comment_created.
+    """
+
     def __init__(self):
-        # Dashboard ID -> List of WebSockets
-        self.active_connections: Dict[str, list[WebSocket]] = {}
+        self.frames: Dict[str, str] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def add(self, event_type: str, comment_id: str, message: str):
+        previous = self.frames.get(comment_id)
+        if event_type == "comment_updated" and previous is not None and previous.startswith('{"type":"comment_created"'):
+            message = '{"type":"comment_created"' + message[len('{"type":"comment_updated"'):]
+        self.frames[comment_id] = message
+
+    def encode(self) -> str:
+        """A single event goes out as is; several as {"type":"batch","data":{"events":[...]}}"""
+        frames = list(self.frames.values())
+        if len(frames) == 1:
+            return frames[0]
+        return '{"type":"batch","data":{"events":[' + ",".join(frames) + ']}}'
+
+class ClientConnection:
+    """A subscribed WebSocket with its own bounded outbound queue and sender task"""
+
+    def __init__(
+        self, websocket: WebSocket, dashboard_id: str, max_queue_size: int, on_send_error, encoding: str = "json"
+    ):
+        # Identifies the connection across processes (see Backplane sender)
+        self.id = uuid.uuid4().hex
+        self.websocket = websocket
+        self.dashboard_id = dashboard_id
+        # "msgpack" clients get binary frames; the queue then holds bytes
+        self.binary = encoding == "msgpack"
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._on_send_error = on_send_error
+        self._sender: Optional[asyncio.Task] = None
+        # Set by CommentConnectionManager.connect: the client asked to resume
+        # from a seq the event log no longer covers, and the seq of the last
+        # event a snapshot sent now must include
+        self.needs_snapshot = False
+        self.snapshot_seq = 0
+
+    def start(self, backlog: List[str] = ()):
+        """Start sending: first the backlog (replayed frames), then the queue"""
+        self._sender = asyncio.create_task(self._send_loop(backlog))
+
+    def encode(self, frame: str):
+        """A JSON frame in this connection's encoding"""
+        return encode_msgpack(frame) if self.binary else frame
+
+    async def send_now(self, frame: str):
+        """Send a JSON frame right away, bypassing the queue (snapshots, before start())"""
+        await self._send(self.encode(frame))
 
-    async def connect(self, websocket: WebSocket, dashboard_id: str):
-        """Connect a client to receive comment updates for a specific dashboard"""
+    async def _send(self, message):
+        if isinstance(message, bytes):
+            await self.websocket.send_bytes(message)
+        else:
+            await self.websocket.send_text(message)
+
+    def enqueue(self, message) -> bool:
+        """Queue a message without waiting. Returns False if the queue is full"""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _send_loop(self, backlog: List[str]):
+        try:
+            for frame in backlog:
+                await self.send_now(frame)
+        except Exception as e:
+            logger.debug("[REPLAY] Error sending to a client on dashboard %s: %s", self.dashboard_id, e)
+            self._on_send_error(self)
+            return
+        while True:
+            message = await self.queue.get()
+            try:
+                await self._send(message)
+            except Exception as e:
+                # Usually a client that went away mid-send
+                logger.debug("[BROADCAST] Error sending to a client on dashboard %s: %s", self.dashboard_id, e)
+                self._on_send_error(self)
+                return
+            finally:
+                self.queue.task_done()
+
+    @property
+    def started(self) -> bool:
+        return self._sender is not None
+
+    def stop(self):
+        """Stop the sender task; queued messages are dropped"""
+        if self._sender is not None and self._sender is not asyncio.current_task():
+            self._sender.cancel()
+
+class CommentConnectionManager:
+    def __init__(
+        self,
+        backplane: Optional[Backplane] = None,
+        send_queue_size: int = settings.WS_SEND_QUEUE_SIZE,
+        broadcast_log_every: int = settings.WS_BROADCAST_LOG_EVERY,
+        replay_buffer_size: int = settings.WS_REPLAY_BUFFER_SIZE,
+        replay_idle_ttl: float = settings.WS_REPLAY_IDLE_TTL_SECONDS,
+        batch_window: float = settings.WS_BATCH_WINDOW_MS / 1000,
+        move_interval: float = settings.WS_MOVE_BROADCAST_INTERVAL_MS / 1000,
+    ):
+        # Dashboard ID -> {WebSocket: ClientConnection}
+        self.active_connections: Dict[str, Dict[WebSocket, ClientConnection]] = {}
+        # Messages a client may have pending before it is evicted as too slow
+        self.send_queue_size = send_queue_size
+        # Every broadcast goes through the backplane, which calls
+        # deliver_local in each process (including this one).
+        self.backplane = backplane or InMemoryBackplane()
+        self.backplane.subscribe(self.deliver_local)
+        # deliver_local only enqueues here; a single task fans messages out
+        # to the per-connection queues, keeping dashboard order.
+        self._fanout_queue: Optional[asyncio.Queue] = None
+        self._fanout_task: Optional[asyncio.Task] = None
+        self._background_tasks = set()
+        # Broadcast logs are sampled: one INFO line every broadcast_log_every
+        # events of each type (0 disables them)
+        self.broadcast_log_every = broadcast_log_every
+        self._broadcast_counts: Dict[str, int] = {}
+        # Event logs of the dashboards with local clients; when the last one
+        # leaves, the log is kept for replay_idle_ttl in case it reconnects
+        self.replay_buffer_size = replay_buffer_size
+        self._event_logs: Dict[str, EventLog] = {}
+        self._idle_event_logs = LRUCache(settings.WS_REPLAY_IDLE_DASHBOARDS, replay_idle_ttl)
+        # With a batch window (seconds, 0 = off), created/updated/deleted
+        # events of a dashboard are held that long and sent as one frame
+        self.batch_window = batch_window
+        self._batches: Dict[str, EventBatch] = {}
+        # comment_moved is published at most once per move_interval (seconds,
+        # 0 = every move) per comment: the first move right away, then the
+        # latest one when the interval ends. comment_id -> latest unpublished
+        # (dashboard_id, message, sender), and the task publishing it
+        self.move_interval = move_interval
+        self._latest_moves: Dict[str, tuple] = {}
+        self._move_publishers: Dict[str, asyncio.Task] = {}
+
+    async def use_backplane(self, backplane: Backplane):
+        """Replace the backplane (e.g. with a cross-process one) and start it"""
+        await self.backplane.stop()
+        self.backplane = backplane
+        self.backplane.subscribe(self.deliver_local)
+        await self.backplane.start()
+
+    async def close_backplane(self):
+        """Stop receiving events from other processes"""
+        await self.backplane.stop()
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        dashboard_id: str,
+        last_seq: Optional[int] = None,
+        snapshot: bool = False,
+        encoding: str = "json",
+    ) -> ClientConnection:
+        """
+        Connect a client to receive comment updates for a specific dashboard.
+
+        With last_seq, the frames broadcast after it are replayed before live
+        ones. If the log no longer has them, or the client asked for a
+        snapshot without a resumable last_seq, the connection is returned with
+        needs_snapshot set and not started: the caller sends a snapshot
+        (encode_snapshot with connection.snapshot_seq) and then calls start().
+        Live events that arrive meanwhile wait in the connection's queue.
+        """
         await websocket.accept()
-        
+
+        # From here to the registration there is no await, so no event is
+        # stamped in between: the replay and the live frames neither overlap
+        # nor leave a gap
+        event_log = self._event_logs.get(dashboard_id)
+        if event_log is None:
+            event_log = self._idle_event_logs.get(dashboard_id) or EventLog(self.replay_buffer_size)
+            self._idle_event_logs.delete(dashboard_id)
+            self._event_logs[dashboard_id] = event_log
+
+        connection = ClientConnection(
+            websocket, dashboard_id, self.send_queue_size, self._on_send_error, encoding
+        )
+        connection.snapshot_seq = event_log.last_seq
+        missed = event_log.since(last_seq) if last_seq is not None else None
+        if missed is not None:
+            connection.start(missed)
+        elif snapshot or last_seq is not None:
+            connection.needs_snapshot = True
+        else:
+            connection.start()
+
         # Initialize dashboard connections if not exists
         if dashboard_id not in self.active_connections:
-            self.active_connections[dashboard_id] = []
+            self.active_connections[dashboard_id] = {}
         
         # Add connection
-        self.active_connections[dashboard_id].append(websocket)
+        self.active_connections[dashboard_id][websocket] = connection
         
-        logger.info(f"[CONNECT] ✅ Client connected to dashboard '{dashboard_id}'. Total connections for this dashboard: {len(self.active_connections[dashboard_id])}, All dashboards: {list(self.active_connections.keys())}")
+        logger.debug(
+            "[CONNECT] Client connected to dashboard %s (%d connections)",
+            dashboard_id, len(self.active_connections[dashboard_id])
+        )
+        return connection
 
     async def disconnect(self, websocket: WebSocket, dashboard_id: str):
         """Disconnect a client from comment updates"""
-        if dashboard_id in self.active_connections:
-            if websocket in self.active_connections[dashboard_id]:
-                self.active_connections[dashboard_id].remove(websocket)
-                logger.info(f"Client disconnected from comments for dashboard {dashboard_id}. Remaining connections: {len(self.active_connections[dashboard_id])}")
-            
-            # Remove empty dashboard
-            if not self.active_connections[dashboard_id]:
-                del self.active_connections[dashboard_id]
-                logger.info(f"No more connections for dashboard {dashboard_id}, removed from active connections")
-
-    async def broadcast_to_dashboard(self, dashboard_id: str, message: str):
-        """Broadcast a message to all clients connected to a specific dashboard"""
-        logger.info(f"[BROADCAST] Dashboard: {dashboard_id}, Active dashboards: {list(self.active_connections.keys())}")
+        self._remove(websocket, dashboard_id)
+
+    def _remove(self, websocket: WebSocket, dashboard_id: str) -> Optional[ClientConnection]:
+        connections = self.active_connections.get(dashboard_id)
+        if connections is None:
+            return None
+
+        connection = connections.pop(websocket, None)
+        if connection is not None:
+            connection.stop()
+            logger.debug(
+                "Client disconnected from dashboard %s (%d connections left)", dashboard_id, len(connections)
+            )
         
-        if dashboard_id not in self.active_connections:
-            logger.warning(f"[BROADCAST] No active connections for dashboard {dashboard_id}")
+        # Remove empty dashboard; its event log is kept for a while for resumes
+        if not connections:
+            del self.active_connections[dashboard_id]
+            event_log = self._event_logs.pop(dashboard_id, None)
+            if event_log is not None:
+                self._idle_event_logs.set(dashboard_id, event_log)
+        return connection
+
+    def _on_send_error(self, connection: ClientConnection):
+        self._remove(connection.websocket, connection.dashboard_id)
+
+    def _evict(self, connection: ClientConnection):
+        """Drop a client that cannot keep up and close its socket in the background"""
+        logger.warning("[BROADCAST] Evicting slow client on dashboard %s: send queue full", connection.dashboard_id)
+        self._remove(connection.websocket, connection.dashboard_id)
+        task = asyncio.create_task(self._close_quietly(connection.websocket))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Client too slow")
+        except Exception:
+            pass
+
+    async def broadcast_to_dashboard(self, dashboard_id: str, message: str, sender: Optional[str] = None):
+        """
+        Broadcast a message to all clients connected to a dashboard, in every
+        process, except the connection whose id is sender
+        """
+        await self.backplane.publish(dashboard_id, message, sender)
+
+    async def deliver_local(self, dashboard_id: str, message: str, sender: Optional[str] = None):
+        """Hand a message to the fan-out task for the clients connected to this process"""
+        if sender is None:
+            # The write may come from another worker: drop this process's cached
+            # list before the event is numbered, so snapshots include it
+            dashboard_comments_cache.invalidate_local(dashboard_id)
+        if dashboard_id not in self._event_logs and self._idle_event_logs.get(dashboard_id) is None:
             return
-        
-        connections = self.active_connections[dashboard_id].copy()
-        disconnected_websockets = []
-        
-        logger.info(f"[BROADCAST] Sending to {len(connections)} clients on dashboard {dashboard_id}: {message[:100]}...")
-        
-        for websocket in connections:
+
+        loop = asyncio.get_running_loop()
+        if self._fanout_task is None or self._fanout_task.done() or self._fanout_task.get_loop() is not loop:
+            self._fanout_queue = asyncio.Queue()
+            self._fanout_task = loop.create_task(self._fanout_loop(self._fanout_queue))
+        self._fanout_queue.put_nowait((dashboard_id, message, sender))
+
+    async def _fanout_loop(self, queue: asyncio.Queue):
+        while True:
+            dashboard_id, message, sender = await queue.get()
             try:
-                await websocket.send_text(message)
-                logger.info(f"[BROADCAST] ✅ Message sent successfully")
+                started = time.perf_counter()
+                self._fan_out(dashboard_id, message, sender)
+                BROADCAST_FANOUT_DURATION.observe(time.perf_counter() - started)
             except Exception as e:
-                logger.error(f"[BROADCAST] ❌ Error sending message: {e}")
-                disconnected_websockets.append(websocket)
-        
-        # Clean up disconnected clients
-        for websocket in disconnected_websockets:
-            await self.disconnect(websocket, dashboard_id)
+                logger.error("[BROADCAST] Error fanning out message: %s", e, exc_info=True)
+            finally:
+                queue.task_done()
+
+    def _fan_out(self, dashboard_id: str, message: str, sender: Optional[str] = None):
+        if sender is None and self.batch_window > 0 and self._add_to_batch(dashboard_id, message):
+            return
+        self._deliver(dashboard_id, message, sender)
+
+    def _add_to_batch(self, dashboard_id: str, message: str) -> bool:
+        """Hold a batchable event until the dashboard's window closes. False if it must go out now"""
+        event = orjson.loads(message)
+        event_type = event.get("type")
+        if event_type not in BATCHED_EVENTS:
+            # Keep dashboard order: whatever is held goes out first
+            self._flush_batch(dashboard_id)
+            return False
+        data = event.get("data") or {}
+        comment_id = data.get("_id") or data.get("comment_id")
+        if comment_id is None:
+            self._flush_batch(dashboard_id)
+            return False
+
+        batch = self._batches.get(dashboard_id)
+        if batch is None:
+            batch = self._batches[dashboard_id] = EventBatch()
+            batch.timer = asyncio.get_running_loop().call_later(self.batch_window, self._flush_batch, dashboard_id)
+        batch.add(event_type, comment_id, message)
+        return True
+
+    def _flush_batch(self, dashboard_id: str):
+        """Send the events held for a dashboard as one numbered frame"""
+        batch = self._batches.pop(dashboard_id, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        try:
+            started = time.perf_counter()
+            self._deliver(dashboard_id, batch.encode())
+            BROADCAST_FANOUT_DURATION.observe(time.perf_counter() - started)
+        except Exception as e:
+            logger.error("[BROADCAST] Error fanning out batch: %s", e, exc_info=True)
+
+    def _deliver(self, dashboard_id: str, message: str, sender: Optional[str] = None):
+        # Frames sent on behalf of a client (comment_moved) are transient: the
+        # persisted position arrives later as a numbered comment_updated
+        if sender is None:
+            event_log = self._event_logs.get(dashboard_id) or self._idle_event_logs.get(dashboard_id)
+            if event_log is not None:
+                message = event_log.append(message)
 
-    async def broadcast_comment_created(self, dashboard_id: str, comment_data: dict):
+        connections = self.active_connections.get(dashboard_id)
+        if not connections:
+            return
+
+        # Hot loop: no formatting, logging or per-recipient allocation here.
+        # The MessagePack frame is built once, on the first binary client.
+        slow_clients = None
+        packed = None
+        for connection in connections.values():
+            if connection.id == sender:
+                continue
+            if connection.binary:
+                if packed is None:
+                    packed = encode_msgpack(message)
+                queued = connection.enqueue(packed)
+            else:
+                queued = connection.enqueue(message)
+            if not queued:
+                if slow_clients is None:
+                    slow_clients = []
+                slow_clients.append(connection)
+
+        if slow_clients:
+            for connection in slow_clients:
+                self._evict(connection)
+
+    async def shutdown(self):
+        """Stop every sender task and the fan-out task (application shutdown)"""
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections.values()):
+                connection.stop()
+        self.active_connections.clear()
+        for task in self._move_publishers.values():
+            task.cancel()
+        self._move_publishers.clear()
+        self._latest_moves.clear()
+        for batch in self._batches.values():
+            batch.timer.cancel()
+        self._batches.clear()
+        self._event_logs.clear()
+        self._idle_event_logs.clear()
+        if self._fanout_task is not None:
+            self._fanout_task.cancel()
+            self._fanout_task = None
+            self._fanout_queue = None
+
+    def fanout_queue_depth(self) -> int:
+        """Broadcasts received but not yet copied to the connection queues"""
+        return self._fanout_queue.qsize() if self._fanout_queue is not None else 0
+
+    async def wait_until_idle(self):
+        """Wait until every queued message has been sent (used by tests and benchmarks)"""
+        # Moves held by the interval are published now rather than waited for
+        for comment_id in list(self._latest_moves):
+            await self.broadcast_to_dashboard(*self._latest_moves.pop(comment_id))
+        if self._fanout_queue is not None:
+            await self._fanout_queue.join()
+        # Events held by the batch window are sent now rather than waited for
+        for dashboard_id in list(self._batches):
+            self._flush_batch(dashboard_id)
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections.values()):
+                if connection.started:
+                    await connection.queue.join()
+
+    def _log_broadcast(self, event_type: str, dashboard_id: str, size: int = 1):
+        count = self._broadcast_counts.get(event_type, 0) + 1
+        self._broadcast_counts[event_type] = count
+        if self.broadcast_log_every and (count - 1) % self.broadcast_log_every == 0:
+            logger.info(
+                "Broadcasted %s (%d) for dashboard %s [sampled: %d %s events so far, 1 in %d logged]",
+                event_type, size, dashboard_id, count, event_type, self.broadcast_log_every
+            )
+
+    async def broadcast_comment_created(self, dashboard_id: str, comment):
         """Broadcast a newly created comment to all clients on the dashboard"""
         try:
-            logger.info(f"[CREATE_BROADCAST] Starting broadcast for dashboard '{dashboard_id}'")
-            
-            message_data = {
-                "type": "comment_created",
-                "data": comment_data
-            }
-            
-            json_message = json.dumps(message_data)
-            await self.broadcast_to_dashboard(dashboard_id, json_message)
-            
-            logger.info(f"[CREATE_BROADCAST] ✅ Completed broadcast for dashboard {dashboard_id}")
-            
+            await self.broadcast_to_dashboard(dashboard_id, encode_event("comment_created", encode_comment(comment)))
+            self._log_broadcast("comment_created", dashboard_id)
         except Exception as e:
-            logger.error(f"[CREATE_BROADCAST] ❌ Error: {e}", exc_info=True)
+            logger.error("Error in broadcast_comment_created: %s", e, exc_info=True)
 
-    async def broadcast_comment_updated(self, dashboard_id: str, comment_data: dict):
+    async def broadcast_comment_updated(self, dashboard_id: str, comment):
         """Broadcast an updated comment to all clients on the dashboard"""
         try:
-            message_data = {
-                "type": "comment_updated",
-                "data": comment_data
-            }
-            
-            json_message = json.dumps(message_data)
-            await self.broadcast_to_dashboard(dashboard_id, json_message)
-            
-            logger.info(f"Broadcasted comment_updated for dashboard {dashboard_id}")
-            
+            await self.broadcast_to_dashboard(dashboard_id, encode_event("comment_updated", encode_comment(comment)))
+            self._log_broadcast("comment_updated", dashboard_id)
         except Exception as e:
-            logger.error(f"Error in broadcast_comment_updated: {e}")
+            logger.error("Error in broadcast_comment_updated: %s", e, exc_info=True)
 
     async def broadcast_comment_deleted(self, dashboard_id: str, comment_id: str):
         """Broadcast a deleted comment to all clients on the dashboard"""
         try:
-            message_data = {
-                "type": "comment_deleted",
-                "data": {
-                    "comment_id": comment_id
-                }
-            }
-            
-            json_message = json.dumps(message_data)
-            await self.broadcast_to_dashboard(dashboard_id, json_message)
-            
-            logger.info(f"Broadcasted comment_deleted for dashboard {dashboard_id}")
-            
+            data = json.dumps({"comment_id": comment_id})
+            await self.broadcast_to_dashboard(dashboard_id, encode_event("comment_deleted", data))
+            self._log_broadcast("comment_deleted", dashboard_id)
+        except Exception as e:
+            logger.error("Error in broadcast_comment_deleted: %s", e, exc_info=True)
+
+    async def broadcast_comment_moved(self, dashboard_id: str, comment_id: str, coordinates: list,
+                                      sender: Optional[str] = None):
+        """
+        Broadcast a position delta while a comment is being dragged. Only the
+        id and the coordinates are sent, and not to the connection that moved it
+        """
+        try:
+            data = orjson.dumps({"comment_id": comment_id, "coordinates": coordinates}).decode()
+            message = encode_event("comment_moved", data)
+            if comment_id in self._move_publishers:
+                # Published when the comment's interval ends, if still the latest
+                self._latest_moves[comment_id] = (dashboard_id, message, sender)
+                return
+            await self.broadcast_to_dashboard(dashboard_id, message, sender)
+            self._log_broadcast("comment_moved", dashboard_id)
+            if self.move_interval > 0:
+                self._move_publishers[comment_id] = asyncio.create_task(self._publish_moves(comment_id))
+        except Exception as e:
+            logger.error("Error in broadcast_comment_moved: %s", e, exc_info=True)
+
+    async def _publish_moves(self, comment_id: str):
+        """Publish the latest move of a comment once per move_interval, until it stops moving"""
+        try:
+            while True:
+                await asyncio.sleep(self.move_interval)
+                move = self._latest_moves.pop(comment_id, None)
+                if move is None:
+                    return
+                try:
+                    await self.broadcast_to_dashboard(*move)
+                    self._log_broadcast("comment_moved", move[0])
+                except Exception as e:
+                    logger.error("Error publishing comment_moved: %s", e, exc_info=True)
+        finally:
+            self._move_publishers.pop(comment_id, None)
+
+    async def broadcast_comments_created_batch(self, dashboard_id: str, comments: list):
+        """Broadcast several newly created comments as a single message"""
+        try:
+            data = '{"comments":' + encode_comment_list(comments) + '}'
+            await self.broadcast_to_dashboard(dashboard_id, encode_event("comments_created_batch", data))
+            self._log_broadcast("comments_created_batch", dashboard_id, len(comments))
+        except Exception as e:
+            logger.error("Error in broadcast_comments_created_batch: %s", e, exc_info=True)
+
+    async def broadcast_comments_updated_batch(self, dashboard_id: str, comments: list):
+        """Broadcast several updated comments as a single message"""
+        try:
+            data = '{"comments":' + encode_comment_list(comments) + '}'
+            await self.broadcast_to_dashboard(dashboard_id, encode_event("comments_updated_batch", data))
+            self._log_broadcast("comments_updated_batch", dashboard_id, len(comments))
+        except Exception as e:
+            logger.error("Error in broadcast_comments_updated_batch: %s", e, exc_info=True)
+
+    async def broadcast_comments_deleted_batch(self, dashboard_id: str, comment_ids: list):
+        """Broadcast several deleted comments as a single message"""
+        try:
+            data = json.dumps({"comment_ids": comment_ids})
+            await self.broadcast_to_dashboard(dashboard_id, encode_event("comments_deleted_batch", data))
+            self._log_broadcast("comments_deleted_batch", dashboard_id, len(comment_ids))
         except Exception as e:
-            logger.error(f"Error in broadcast_comment_deleted: {e}")
+            logger.error("Error in broadcast_comments_deleted_batch: %s", e, exc_info=True)
 
     def get_connection_count(self, dashboard_id: str) -> int:
         """Get number of clients connected to a dashboard"""
@@ -10,7 +10,10 @@ from httpx import AsyncClient, ASGITransport
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app import app
+from src.cache import dashboard_comments_cache
 from src.models import Comment
+from src.read_routing import read_router
+from src.websocket_manager import comment_connection_manager
 
 
 # --- Base de datos en memoria con mongomock ---
@@ -30,9 +33,11 @@ async def initialize_test_database():
 
 @pytest_asyncio.fixture(autouse=True)
 async def clear_collections() -> AsyncGenerator[None, None]:
-    """Limpia la colección de comentarios después de cada test."""
+    """Limpia la colección de comentarios y las cachés después de cada test."""
     yield
     await Comment.delete_all()
+    dashboard_comments_cache.clear()
+    read_router.clear()
 
 
 # --- Cliente HTTP para pruebas ---
@@ -54,3 +59,41 @@ async def created_comment() -> Comment:
     )
     await comment.insert()
     return comment
+
+
+# --- WebSocket simulado para verificar los broadcasts ---
+class FakeWebSocket:
+    """Sustituto mínimo de fastapi.WebSocket que guarda los mensajes enviados."""
+
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        self.sent.append(data)
+
+    async def send_bytes(self, data: bytes):
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000, reason: str = None):
+        self.close_code = code
+
+
+@pytest_asyncio.fixture
+async def subscribe_dashboard():
+    """Devuelve una función que conecta un FakeWebSocket a un tablero."""
+    connected = []
+
+    async def _subscribe(dashboard_id) -> FakeWebSocket:
+        websocket = FakeWebSocket()
+        await comment_connection_manager.connect(websocket, str(dashboard_id))
+        connected.append((websocket, str(dashboard_id)))
+        return websocket
+
+    yield _subscribe
+
+    for websocket, dashboard_id in connected:
+        await comment_connection_manager.disconnect(websocket, dashboard_id)
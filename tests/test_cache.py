@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import mongomock_motor
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from beanie import PydanticObjectId
+
+from src.cache import (
+    CacheBackend,
+    CachedResponse,
+    DashboardCommentsCache,
+    LRUCache,
+    MongoCacheBackend,
+    dashboard_comments_cache,
+)
+from src.models import Comment
+
+pytestmark = pytest.mark.asyncio
+
+
+class InMemoryBackend(CacheBackend):
+    """Sustituto en memoria del almacén compartido (MongoCacheBackend en producción)."""
+
+    def __init__(self):
+        self.values: Dict[str, bytes] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.values.get(key)
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float):
+        self.values[key] = value
+
+    async def delete(self, key: str):
+        self.values.pop(key, None)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def test_lru_cache_evicts_least_recently_used():
+    """Prueba que el LRU descarta la entrada usada hace más tiempo."""
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+async def test_lru_cache_expires_entries():
+    """Prueba que las entradas caducan al cumplirse su TTL."""
+    clock = FakeClock()
+    cache = LRUCache(max_entries=10, ttl_seconds=5, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=20)
+
+    clock.now = 10
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+async def test_dashboard_cache_uses_shared_backend():
+    """Prueba que un worker reutiliza lo que otro guardó en el almacén compartido."""
+    backend = InMemoryBackend()
+    worker_a = DashboardCommentsCache(max_entries=10, ttl_seconds=60, backend=backend)
+    worker_b = DashboardCommentsCache(max_entries=10, ttl_seconds=60, backend=backend)
+
+    cached = CachedResponse(b"[]", 'W/"0-0"')
+    await worker_a.set("d1", cached, worker_a.generation)
+
+    assert await worker_b.get("d1") == cached
+    assert worker_b.stats()["shared_hits"] == 1
+
+    await worker_a.invalidate("d1")
+    assert backend.values == {}
+
+
+async def test_mongo_backend_shares_entries_between_workers():
+    """Prueba que dos workers comparten el listado a través de la colección de MongoDB."""
+    collection = mongomock_motor.AsyncMongoMockClient()["test_db"]["comments_cache"]
+    worker_a = DashboardCommentsCache(max_entries=10, ttl_seconds=60)
+    worker_b = DashboardCommentsCache(max_entries=10, ttl_seconds=60)
+    await worker_a.use_backend(MongoCacheBackend(collection))
+    await worker_b.use_backend(MongoCacheBackend(collection))
+
+    cached = CachedResponse(b"[]", 'W/"0-0"', "Mon, 01 Jan 2024 00:00:00 GMT")
+    await worker_a.set("d1", cached, worker_a.generation)
+
+    assert await worker_b.get("d1") == cached
+    assert worker_b.stats()["shared_hits"] == 1
+    assert "expires_at_ttl" in await collection.index_information()
+
+    await worker_a.invalidate("d1")
+    assert await collection.count_documents({}) == 0
+
+
+async def test_mongo_backend_ignores_expired_and_oversized_entries():
+    """Prueba que no se devuelven entradas caducadas y que no se guardan valores mayores que un documento."""
+    collection = mongomock_motor.AsyncMongoMockClient()["test_db"]["comments_cache"]
+    now = [datetime(2024, 1, 1, tzinfo=timezone.utc)]
+    backend = MongoCacheBackend(collection, clock=lambda: now[0])
+
+    await backend.set("k", b"valor", ttl_seconds=30)
+    assert await backend.get("k") == b"valor"
+    now[0] += timedelta(seconds=31)
+    assert await backend.get("k") is None
+
+    backend.MAX_VALUE_BYTES = 4
+    await backend.set("k", b"valor", ttl_seconds=30)
+    assert await collection.count_documents({}) == 0
+
+
+async def test_dashboard_cache_ignores_stale_set_after_invalidate():
+    """Prueba que una lectura iniciada antes de una escritura no guarda datos viejos."""
+    cache = DashboardCommentsCache(max_entries=10, ttl_seconds=60)
+    generation = cache.generation
+
+    await cache.invalidate("d1")
+    await cache.set("d1", CachedResponse(b"[\"viejo\"]", 'W/"1-0"'), generation)
+
+    assert await cache.get("d1") is None
+
+
+async def test_dashboard_listing_is_cached_and_invalidated(async_client: AsyncClient, created_comment: Comment):
+    """Prueba que el listado se sirve desde caché y que una escritura lo invalida."""
+    url = f"/comments/dashboards/{created_comment.dashboard_id}"
+    before = dashboard_comments_cache.stats()
+
+    first = await async_client.get(url)
+    second = await async_client.get(url)
+
+    assert first.status_code == second.status_code == status.HTTP_200_OK
+    assert first.content == second.content
+    stats = dashboard_comments_cache.stats()
+    assert stats["misses"] == before["misses"] + 1
+    assert stats["local_hits"] == before["local_hits"] + 1
+
+    response = await async_client.post(
+        f"/comments/dashboards/{created_comment.dashboard_id}/users/{PydanticObjectId()}/comments",
+        json={"content": "Nuevo", "coordinates": "1,1"},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    third = await async_client.get(url)
+    assert len(third.json()) == 2
+
+
+async def test_lru_cache_respects_byte_budget():
+    """Prueba que el LRU descarta entradas para no superar max_bytes y no guarda valores mayores."""
+    cache = LRUCache(max_entries=10, ttl_seconds=60, max_bytes=10)
+    cache.set("a", b"12345")
+    cache.set("b", b"1234")
+    cache.set("c", b"123")
+
+    assert cache.get("a") is None
+    assert cache.get("b") == b"1234" and cache.get("c") == b"123"
+    assert cache.bytes == 7
+
+    cache.set("d", b"12345678901")
+    assert cache.get("d") is None
+    cache.delete("b")
+    assert cache.bytes == 3
+
+
+async def test_dashboard_cache_skips_bodies_over_budget():
+    """Prueba que un listado mayor que COMMENTS_CACHE_MAX_BYTES no se guarda ni en local ni en el almacén compartido."""
+    backend = InMemoryBackend()
+    cache = DashboardCommentsCache(max_entries=10, ttl_seconds=60, backend=backend, max_bytes=16)
+
+    await cache.set("small", CachedResponse(b"[]", 'W/"0-0"'), cache.generation)
+    await cache.set("large", CachedResponse(b"[" + b"0," * 20 + b"0]", 'W/"21-0"'), cache.generation)
+
+    assert await cache.get("small") is not None
+    assert await cache.get("large") is None
+    assert list(backend.values) == [DashboardCommentsCache.KEY_PREFIX + "small"]
+    assert cache.stats()["bytes"] == 2
@@ -1,14 +1,37 @@
+import json
+from datetime import datetime
+
 import pytest
 from httpx import AsyncClient
-from fastapi import status
+from fastapi import WebSocketDisconnect, status
 from beanie import PydanticObjectId
+from bson import ObjectId
 
 from app import app
 from src.models import Comment
+from src.cache import dashboard_comments_cache
+from src.routes import comments_routes, websocket_routes
+from src.routes.comments_routes import persist_comment_move, viewport_query
+from src.routes.websocket_routes import move_coalescer, websocket_comments_endpoint
+from src.websocket_manager import comment_connection_manager
+from tests.conftest import FakeWebSocket
 
 pytestmark = pytest.mark.asyncio
 
 
+class ScriptedWebSocket(FakeWebSocket):
+    """Cliente que envía los mensajes indicados y después se desconecta."""
+
+    def __init__(self, incoming):
+        super().__init__()
+        self.incoming = list(incoming)
+
+    async def receive_text(self) -> str:
+        if not self.incoming:
+            raise WebSocketDisconnect()
+        return self.incoming.pop(0)
+
+
 async def test_create_comment(async_client: AsyncClient):
     """Prueba la creación exitosa de un comentario."""
     dashboard_id = "615d08a7a8b2b2a7c2f8a8b3"
@@ -99,6 +122,51 @@ async def test_update_comment(async_client: AsyncClient, created_comment: Commen
     assert comment_in_db.content == update_data["content"]
 
 
+async def test_update_comment_returns_new_version_and_etag(async_client: AsyncClient, created_comment: Comment):
+    """Prueba que cada actualización incrementa la versión y devuelve su ETag."""
+    first = await async_client.put(f"/comments/{created_comment.id}", json={"content": "Uno"})
+    second = await async_client.put(f"/comments/{created_comment.id}/coordinates", json=[5, 6])
+
+    assert first.json()["version"] == 1
+    assert first.headers["ETag"] == '"1"'
+    assert second.json()["version"] == 2
+    assert second.headers["ETag"] == '"2"'
+    assert second.json()["content"] == "Uno"
+
+
+async def test_update_comment_with_stale_if_match_is_rejected(async_client: AsyncClient, created_comment: Comment):
+    """Prueba que un arrastre con un ETag viejo no pisa una edición del contenido (412)."""
+    etag = (await async_client.get(f"/comments/{created_comment.id}")).headers["ETag"]
+    edited = await async_client.put(
+        f"/comments/{created_comment.id}", json={"content": "Editado"}, headers={"If-Match": etag}
+    )
+    assert edited.status_code == status.HTTP_200_OK
+
+    dragged = await async_client.put(
+        f"/comments/{created_comment.id}/coordinates", json=[9, 9], headers={"If-Match": etag}
+    )
+
+    assert dragged.status_code == status.HTTP_412_PRECONDITION_FAILED
+    comment_in_db = await Comment.get(created_comment.id)
+    assert comment_in_db.content == "Editado"
+    assert comment_in_db.coordinates == [0, 0]
+
+    retried = await async_client.put(
+        f"/comments/{created_comment.id}/coordinates", json=[9, 9], headers={"If-Match": edited.headers["ETag"]}
+    )
+    assert retried.status_code == status.HTTP_200_OK
+    assert retried.json()["content"] == "Editado"
+
+
+async def test_update_comment_if_match_on_missing_comment_is_404(async_client: AsyncClient):
+    """Prueba que If-Match sobre un comentario inexistente responde 404, no 412."""
+    response = await async_client.put(
+        f"/comments/{PydanticObjectId()}", json={"content": "X"}, headers={"If-Match": '"0"'}
+    )
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
 async def test_update_comment_not_found(async_client: AsyncClient):
     """Prueba que se obtiene un 404 al intentar actualizar un comentario inexistente."""
     non_existent_id = PydanticObjectId()
@@ -121,8 +189,12 @@ async def test_delete_comment(async_client: AsyncClient, created_comment: Commen
 
     assert response.status_code == status.HTTP_204_NO_CONTENT
 
+    # El comentario queda como marca de borrado para /changes
     comment_in_db = await Comment.get(created_comment.id)
-    assert comment_in_db is None
+    assert comment_in_db.deleted_at is not None
+    assert comment_in_db.version == 1
+    assert (await async_client.get(f"/comments/{created_comment.id}")).status_code == status.HTTP_404_NOT_FOUND
+    assert (await async_client.delete(f"/comments/{created_comment.id}")).status_code == status.HTTP_404_NOT_FOUND
 
 
 async def test_delete_comment_not_found(async_client: AsyncClient):
@@ -132,3 +204,469 @@ async def test_delete_comment_not_found(async_client: AsyncClient):
 
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
+
+
+async def _create_dashboard_comments(dashboard_id: PydanticObjectId, count: int) -> list:
+    comments = []
+    for i in range(count):
+        comment = Comment(
+            dashboard_id=dashboard_id,
+            user_id=PydanticObjectId(),
+            content=f"Comentario {i}",
+            coordinates=[i, i],
+        )
+        await comment.insert()
+        comments.append(comment)
+    return comments
+
+
+async def test_get_dashboard_comments_paginated(async_client: AsyncClient):
+    """Prueba recorrer un tablero página a página con el cursor X-Next-Cursor."""
+    dashboard_id = PydanticObjectId()
+    created = await _create_dashboard_comments(dashboard_id, 5)
+
+    seen = []
+    after = None
+    pages = 0
+    while True:
+        params = {"limit": 2}
+        if after:
+            params["after"] = after
+        response = await async_client.get(f"/comments/dashboards/{dashboard_id}", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        seen.extend(item["_id"] for item in response.json())
+        pages += 1
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+
+    assert pages == 3
+    assert seen == [str(c.id) for c in created]
+
+
+async def test_get_dashboard_comments_invalid_cursor(async_client: AsyncClient):
+    """Prueba que un cursor malformado devuelve 400."""
+    response = await async_client.get(
+        f"/comments/dashboards/{PydanticObjectId()}", params={"after": "no-es-un-cursor"}
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_get_dashboard_comments_stream(async_client: AsyncClient):
+    """Prueba el modo NDJSON en streaming."""
+    dashboard_id = PydanticObjectId()
+    created = await _create_dashboard_comments(dashboard_id, 3)
+
+    response = await async_client.get(f"/comments/dashboards/{dashboard_id}", params={"stream": "true"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["_id"] for item in lines] == [str(c.id) for c in created]
+    assert lines[0]["content"] == "Comentario 0"
+
+
+async def test_viewport_query_normalizes_corners():
+    """Prueba que el filtro de viewport acepta las esquinas en cualquier orden."""
+    dashboard_id = PydanticObjectId()
+
+    query = viewport_query(dashboard_id, 50, -10, -20, 30)
+
+    assert query["dashboard_id"] == dashboard_id
+    assert query["coordinates"]["$geoWithin"]["$box"] == [[-20, -10], [50, 30]]
+
+
+async def test_get_comments_in_viewport_requires_bounds(async_client: AsyncClient):
+    """Prueba que el viewport exige las cuatro coordenadas."""
+    response = await async_client.get(
+        f"/comments/dashboards/{PydanticObjectId()}/viewport", params={"x0": 0, "y0": 0}
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.parametrize("x0", ["nan", "inf", "-inf"])
+async def test_get_comments_in_viewport_rejects_non_finite_bounds(async_client: AsyncClient, x0):
+    """Prueba que nan/inf en el viewport responden 400 en lugar de llegar al índice 2d."""
+    response = await async_client.get(
+        f"/comments/dashboards/{PydanticObjectId()}/viewport", params={"x0": x0, "y0": 0, "x1": 10, "y1": 10}
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_get_comment_clusters(async_client: AsyncClient):
+    """Prueba el agrupamiento de comentarios por celdas."""
+    dashboard_id = PydanticObjectId()
+    for coordinates in ([10, 10], [20, 30], [150, 160], [-5, 5]):
+        await Comment(
+            dashboard_id=dashboard_id,
+            user_id=PydanticObjectId(),
+            content="Comentario",
+            coordinates=coordinates,
+        ).insert()
+    single = await Comment.find_one(Comment.coordinates == [150, 160])
+
+    response = await async_client.get(
+        f"/comments/dashboards/{dashboard_id}/clusters", params={"cell_size": 100}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    clusters = {tuple(c["cell"]): c for c in response.json()}
+    assert set(clusters) == {(0, 0), (1, 1), (-1, 0)}
+    assert clusters[(0, 0)]["count"] == 2
+    assert clusters[(0, 0)]["centroid"] == [15, 20]
+    assert clusters[(0, 0)]["comment_id"] is None
+    assert clusters[(1, 1)]["count"] == 1
+    assert clusters[(1, 1)]["comment_id"] == str(single.id)
+
+
+async def test_get_comment_clusters_invalid_cell_size(async_client: AsyncClient):
+    """Prueba que el tamaño de celda debe ser positivo."""
+    response = await async_client.get(
+        f"/comments/dashboards/{PydanticObjectId()}/clusters", params={"cell_size": 0}
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_create_comments_batch(async_client: AsyncClient, subscribe_dashboard):
+    """Prueba crear varios comentarios con un único evento WebSocket."""
+    dashboard_id = PydanticObjectId()
+    user_id = PydanticObjectId()
+    websocket = await subscribe_dashboard(dashboard_id)
+    batch = {"comments": [
+        {"content": f"Importado {i}", "coordinates": f"{i}.5,{i}.0"} for i in range(3)
+    ]}
+
+    response = await async_client.post(
+        f"/comments/dashboards/{dashboard_id}/users/{user_id}/comments/batch", json=batch
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    data = response.json()
+    assert [item["content"] for item in data] == ["Importado 0", "Importado 1", "Importado 2"]
+    assert data[1]["coordinates"] == [1.5, 1.0]
+    assert await Comment.find(Comment.dashboard_id == dashboard_id).count() == 3
+
+    await comment_connection_manager.wait_until_idle()
+    assert len(websocket.sent) == 1
+    message = json.loads(websocket.sent[0])
+    assert message["type"] == "comments_created_batch"
+    assert [c["_id"] for c in message["data"]["comments"]] == [item["_id"] for item in data]
+
+
+async def test_update_comments_batch(async_client: AsyncClient, subscribe_dashboard):
+    """Prueba actualizar varios comentarios con un único evento WebSocket."""
+    dashboard_id = PydanticObjectId()
+    first, second = await _create_dashboard_comments(dashboard_id, 2)
+    other_dashboard = await _create_dashboard_comments(PydanticObjectId(), 1)
+    websocket = await subscribe_dashboard(dashboard_id)
+    batch = {"comments": [
+        {"id": str(first.id), "content": "Editado"},
+        {"id": str(second.id), "coordinates": [7, 8]},
+        {"id": str(other_dashboard[0].id), "content": "No debería cambiar"},
+    ]}
+
+    response = await async_client.put(f"/comments/dashboards/{dashboard_id}/comments/batch", json=batch)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert {item["_id"] for item in response.json()} == {str(first.id), str(second.id)}
+    assert (await Comment.get(first.id)).content == "Editado"
+    assert (await Comment.get(second.id)).coordinates == [7, 8]
+    assert (await Comment.get(other_dashboard[0].id)).content == "Comentario 0"
+
+    await comment_connection_manager.wait_until_idle()
+    assert len(websocket.sent) == 1
+    message = json.loads(websocket.sent[0])
+    assert message["type"] == "comments_updated_batch"
+    assert len(message["data"]["comments"]) == 2
+
+
+@pytest.mark.parametrize("fields", [{"content": None}, {"coordinates": None}])
+async def test_update_with_null_fields_is_rejected(async_client: AsyncClient, subscribe_dashboard, fields):
+    """Prueba que un campo null responde 400 sin escribir ni notificar nada."""
+    dashboard_id = PydanticObjectId()
+    (comment,) = await _create_dashboard_comments(dashboard_id, 1)
+    websocket = await subscribe_dashboard(dashboard_id)
+
+    batch = await async_client.put(
+        f"/comments/dashboards/{dashboard_id}/comments/batch", json={"comments": [{"id": str(comment.id), **fields}]}
+    )
+    single = await async_client.put(f"/comments/{comment.id}", json=fields)
+
+    assert batch.status_code == status.HTTP_400_BAD_REQUEST
+    assert single.status_code == status.HTTP_400_BAD_REQUEST
+    stored = await Comment.get(comment.id)
+    assert stored.content == "Comentario 0" and stored.version == comment.version
+    await comment_connection_manager.wait_until_idle()
+    assert websocket.sent == []
+
+
+async def test_delete_comments_batch(async_client: AsyncClient, subscribe_dashboard):
+    """Prueba eliminar varios comentarios con un único evento WebSocket."""
+    dashboard_id = PydanticObjectId()
+    comments = await _create_dashboard_comments(dashboard_id, 3)
+    websocket = await subscribe_dashboard(dashboard_id)
+    ids = [str(comments[0].id), str(comments[2].id), str(PydanticObjectId())]
+
+    response = await async_client.post(
+        f"/comments/dashboards/{dashboard_id}/comments/batch/delete", json={"ids": ids}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"deleted": 2}
+    remaining = await Comment.find(Comment.dashboard_id == dashboard_id, Comment.deleted_at == None).to_list()
+    assert [c.id for c in remaining] == [comments[1].id]
+
+    await comment_connection_manager.wait_until_idle()
+    assert len(websocket.sent) == 1
+    message = json.loads(websocket.sent[0])
+    assert message["type"] == "comments_deleted_batch"
+    assert message["data"]["comment_ids"] == ids[:2]
+
+
+async def test_get_comment_not_modified(async_client: AsyncClient, created_comment: Comment):
+    """Prueba que un comentario sin cambios responde 304 con If-None-Match."""
+    first = await async_client.get(f"/comments/{created_comment.id}")
+    etag = first.headers["ETag"]
+    assert first.headers["Last-Modified"]
+
+    response = await async_client.get(f"/comments/{created_comment.id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+
+async def test_get_all_comments_not_modified(async_client: AsyncClient, created_comment: Comment):
+    """Prueba ETag / If-None-Match del listado, con y sin caché."""
+    url = f"/comments/dashboards/{created_comment.dashboard_id}"
+    first = await async_client.get(url)
+    etag = first.headers["ETag"]
+
+    cached = await async_client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # Sin entrada en caché la versión se calcula con una agregación
+    dashboard_comments_cache.clear()
+    uncached = await async_client.get(url, headers={"If-None-Match": etag})
+    assert uncached.status_code == status.HTTP_304_NOT_MODIFIED
+
+    await async_client.put(f"/comments/{created_comment.id}", json={"content": "Cambiado"})
+    changed = await async_client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == status.HTTP_200_OK
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["content"] == "Cambiado"
+
+
+async def test_get_all_comments_if_modified_since(async_client: AsyncClient, created_comment: Comment):
+    """Prueba Last-Modified / If-Modified-Since del listado."""
+    url = f"/comments/dashboards/{created_comment.dashboard_id}"
+    last_modified = (await async_client.get(url)).headers["Last-Modified"]
+
+    response = await async_client.get(url, headers={"If-Modified-Since": last_modified})
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+async def test_create_comment_broadcasts_one_shared_frame(async_client: AsyncClient, subscribe_dashboard):
+    """Prueba que el evento se serializa una vez y se comparte entre clientes."""
+    dashboard_id = PydanticObjectId()
+    first = await subscribe_dashboard(dashboard_id)
+    second = await subscribe_dashboard(dashboard_id)
+
+    response = await async_client.post(
+        f"/comments/dashboards/{dashboard_id}/users/{PydanticObjectId()}/comments",
+        json={"content": "Hola", "coordinates": "1,2", "user_name": "ana"},
+    )
+    await comment_connection_manager.wait_until_idle()
+
+    assert first.sent[0] is second.sent[0]
+    message = json.loads(first.sent[0])
+    assert message["type"] == "comment_created"
+    assert message["data"]["_id"] == response.json()["_id"]
+    assert message["data"]["user_name"] == "ana"
+    assert message["data"]["coordinates"] == [1, 2]
+
+
+async def test_persist_comment_move_updates_position(created_comment: Comment, subscribe_dashboard):
+    """Prueba que la posición final de un arrastre se guarda y se notifica con la nueva versión."""
+    listener = await subscribe_dashboard(created_comment.dashboard_id)
+
+    await persist_comment_move(str(created_comment.dashboard_id), str(created_comment.id), [7.0, 8.0])
+    await comment_connection_manager.wait_until_idle()
+
+    stored = await Comment.get(created_comment.id)
+    assert stored.coordinates == [7.0, 8.0]
+    assert stored.version == 1
+    message = json.loads(listener.sent[0])
+    assert message["type"] == "comment_updated"
+    assert message["data"]["version"] == 1
+
+
+async def test_persist_comment_move_ignores_other_dashboard(created_comment: Comment):
+    """Prueba que un movimiento no modifica comentarios de otro tablero."""
+    await persist_comment_move(str(PydanticObjectId()), str(created_comment.id), [7.0, 8.0])
+
+    stored = await Comment.get(created_comment.id)
+    assert stored.coordinates == [0, 0]
+
+
+async def test_websocket_move_is_relayed_and_persisted(created_comment: Comment, subscribe_dashboard):
+    """Prueba que un mensaje move llega a los demás clientes y la posición se guarda al vaciar el coalescer."""
+    dashboard_id = str(created_comment.dashboard_id)
+    peer = await subscribe_dashboard(dashboard_id)
+    mover = ScriptedWebSocket([
+        "no es json",
+        json.dumps({"type": "move", "comment_id": str(created_comment.id), "coordinates": [3, 4]}),
+        json.dumps({"type": "move", "comment_id": str(created_comment.id), "coordinates": [5, 6]}),
+    ])
+
+    await websocket_comments_endpoint(mover, dashboard_id, user_id=None, last_seq=None, snapshot=False, encoding="json")
+    await move_coalescer.flush()
+    await comment_connection_manager.wait_until_idle()
+
+    moved = [json.loads(m) for m in peer.sent if json.loads(m)["type"] == "comment_moved"]
+    assert [m["data"]["coordinates"] for m in moved] == [[3.0, 4.0], [5.0, 6.0]]
+    assert all(json.loads(m)["type"] != "comment_moved" for m in mover.sent)
+    stored = await Comment.get(created_comment.id)
+    assert stored.coordinates == [5.0, 6.0]
+    assert stored.version == 1
+
+
+async def test_coordinates_outside_index_bounds_are_rejected(async_client: AsyncClient, created_comment: Comment):
+    """Prueba que las coordenadas fuera de los límites del índice 2d responden 400 en lugar de un 500."""
+    dashboard_id, user_id = created_comment.dashboard_id, created_comment.user_id
+
+    create = await async_client.post(
+        f"/comments/dashboards/{dashboard_id}/users/{user_id}/comments",
+        json={"content": "Lejos", "coordinates": "2000000000,0"}
+    )
+    create_batch = await async_client.post(
+        f"/comments/dashboards/{dashboard_id}/users/{user_id}/comments/batch",
+        json={"comments": [{"content": "Lejos", "coordinates": "0,-1000000000.5"}]}
+    )
+    update = await async_client.put(f"/comments/{created_comment.id}", json={"coordinates": [0, 1e9]})
+    coordinates = await async_client.put(f"/comments/{created_comment.id}/coordinates", json=[1e300, 0])
+    update_batch = await async_client.put(
+        f"/comments/dashboards/{dashboard_id}/comments/batch",
+        json={"comments": [{"id": str(created_comment.id), "coordinates": [-2e9, 0]}]}
+    )
+
+    for response in (create, create_batch, update, coordinates, update_batch):
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert (await Comment.get(created_comment.id)).coordinates == [0, 0]
+    with pytest.raises(ValueError):
+        websocket_routes.parse_move({"comment_id": str(created_comment.id), "coordinates": [float("nan"), 0]})
+
+
+@pytest.fixture
+def no_cursor_lag(monkeypatch):
+    monkeypatch.setattr(comments_routes.settings, "CHANGES_CURSOR_LAG_SECONDS", 0)
+
+
+async def test_dashboard_changes_returns_delta_and_tombstones(async_client: AsyncClient, no_cursor_lag):
+    """Prueba que /changes devuelve solo lo modificado y lo borrado desde el cursor."""
+    dashboard_id = PydanticObjectId()
+    comments = await _create_dashboard_comments(dashboard_id, 3)
+
+    first = await async_client.get(f"/comments/dashboards/{dashboard_id}/changes")
+    assert first.status_code == status.HTTP_200_OK
+    assert len(first.json()["updated"]) == 3
+    assert first.json()["deleted"] == []
+
+    await async_client.put(f"/comments/{comments[0].id}", json={"content": "Editado"})
+    await async_client.delete(f"/comments/{comments[1].id}")
+    second = await async_client.get(
+        f"/comments/dashboards/{dashboard_id}/changes", params={"since": first.json()["cursor"]}
+    )
+
+    body = second.json()
+    assert [c["_id"] for c in body["updated"]] == [str(comments[0].id)]
+    assert body["updated"][0]["content"] == "Editado"
+    assert body["deleted"] == [str(comments[1].id)]
+    assert body["has_more"] is False
+
+    listing = await async_client.get(f"/comments/dashboards/{dashboard_id}")
+    assert str(comments[1].id) not in [c["_id"] for c in listing.json()]
+
+    third = await async_client.get(
+        f"/comments/dashboards/{dashboard_id}/changes", params={"since": body["cursor"]}
+    )
+    assert third.json()["updated"] == [] and third.json()["deleted"] == []
+
+
+async def test_dashboard_changes_paginates_with_has_more(async_client: AsyncClient, no_cursor_lag):
+    """Prueba que los cambios se paginan con limit y has_more."""
+    dashboard_id = PydanticObjectId()
+    await _create_dashboard_comments(dashboard_id, 5)
+
+    seen, since = [], None
+    for _ in range(5):
+        params = {"limit": 2, **({"since": since} if since else {})}
+        body = (await async_client.get(f"/comments/dashboards/{dashboard_id}/changes", params=params)).json()
+        seen += [c["_id"] for c in body["updated"]]
+        since = body["cursor"]
+        if not body["has_more"]:
+            break
+
+    assert len(seen) == len(set(seen)) == 5
+
+
+async def test_dashboard_changes_cursor_lags_behind_recent_writes(async_client: AsyncClient):
+    """Prueba que los cambios más recientes que el margen del cursor se vuelven a enviar."""
+    dashboard_id = PydanticObjectId()
+    await _create_dashboard_comments(dashboard_id, 2)
+
+    first = await async_client.get(f"/comments/dashboards/{dashboard_id}/changes")
+    second = await async_client.get(
+        f"/comments/dashboards/{dashboard_id}/changes", params={"since": first.json()["cursor"]}
+    )
+
+    assert len(second.json()["updated"]) == 2
+
+
+async def test_dashboard_changes_rejects_expired_cursor(async_client: AsyncClient):
+    """Prueba que un cursor anterior a las marcas de borrado conservadas responde 410."""
+    old = comments_routes.encode_page_cursor(datetime(2000, 1, 1), ObjectId())
+
+    response = await async_client.get(
+        f"/comments/dashboards/{PydanticObjectId()}/changes", params={"since": old}
+    )
+
+    assert response.status_code == status.HTTP_410_GONE
+
+
+async def test_websocket_unknown_last_seq_gets_snapshot(created_comment: Comment):
+    """Prueba que un last_seq que el registro no cubre recibe un snapshot con los comentarios vivos."""
+    dashboard_id = str(created_comment.dashboard_id)
+    await _create_dashboard_comments(created_comment.dashboard_id, 1)
+    await Comment.find_one(Comment.content == "Comentario 0").update({"$set": {"deleted_at": datetime(2030, 1, 1)}})
+    client = ScriptedWebSocket([])
+
+    await websocket_comments_endpoint(client, dashboard_id, user_id=None, last_seq=-5, snapshot=False, encoding="json")
+
+    snapshot = json.loads(client.sent[0])
+    assert snapshot["type"] == "snapshot"
+    assert isinstance(snapshot["seq"], int)
+    assert [c["_id"] for c in snapshot["data"]["comments"]] == [str(created_comment.id)]
+
+
+async def test_websocket_snapshot_on_connect_uses_cached_list(async_client: AsyncClient, monkeypatch):
+    """Prueba que ?snapshot=1 envía el listado en trozos y lo toma de la caché compartida con GET."""
+    dashboard_id = PydanticObjectId()
+    comments = await _create_dashboard_comments(dashboard_id, 3)
+    await async_client.get(f"/comments/dashboards/{dashboard_id}")
+    hits = dashboard_comments_cache.local_hits
+    monkeypatch.setattr(websocket_routes.settings, "WS_SNAPSHOT_CHUNK_SIZE", 2)
+    client = ScriptedWebSocket([])
+
+    await websocket_comments_endpoint(client, str(dashboard_id), user_id=None, last_seq=None, snapshot=True, encoding="json")
+
+    frames = [json.loads(m) for m in client.sent]
+    assert [f["type"] for f in frames] == ["snapshot", "snapshot"]
+    assert [f["data"]["done"] for f in frames] == [False, True]
+    assert [c["_id"] for f in frames for c in f["data"]["comments"]] == [str(c.id) for c in comments]
+    assert dashboard_comments_cache.local_hits == hits + 1
@@ -0,0 +1,118 @@
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+
+from src.config import Config
+from src.database import PoolMonitor, client_options, sync_index_options
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_client_options_from_environment(monkeypatch):
+    """Prueba que el pool, la compresión y la consistencia salen de la configuración."""
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "50")
+    monkeypatch.setenv("MONGO_MIN_POOL_SIZE", "5")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zstd,snappy")
+    monkeypatch.setenv("MONGO_READ_PREFERENCE", "secondaryPreferred")
+    monkeypatch.setenv("MONGO_WRITE_CONCERN", "majority")
+
+    options = client_options(Config())
+
+    assert options["maxPoolSize"] == 50
+    assert options["minPoolSize"] == 5
+    assert options["compressors"] == "zstd,snappy"
+    assert options["readPreference"] == "secondaryPreferred"
+    assert options["w"] == "majority"
+
+
+async def test_client_options_defaults_leave_server_defaults():
+    """Prueba que sin configuración no se fuerza compresión ni write concern."""
+    options = client_options(Config())
+
+    assert "compressors" not in options
+    assert "w" not in options
+    assert options["readPreference"] == "primary"
+
+
+class FakeIndexDatabase:
+    """Base de datos que devuelve unos índices dados y registra los comandos."""
+
+    def __init__(self, indexes):
+        self.indexes = indexes
+        self.commands = []
+
+    def __getitem__(self, name):
+        async def index_information():
+            return self.indexes
+        return SimpleNamespace(index_information=index_information)
+
+    async def command(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+
+async def test_sync_index_options_updates_changed_tombstone_ttl(monkeypatch):
+    """Prueba que un COMMENT_TOMBSTONE_TTL_SECONDS distinto se aplica con collMod en lugar de fallar."""
+    monkeypatch.setenv("COMMENT_TOMBSTONE_TTL_SECONDS", "3600")
+    config = Config()
+    database = FakeIndexDatabase({
+        "deleted_at_ttl": {"key": [("deleted_at", 1)], "expireAfterSeconds": 604800},
+        "coordinates_2d_dashboard": {"min": config.COORDINATES_INDEX_MIN, "max": config.COORDINATES_INDEX_MAX},
+    })
+
+    await sync_index_options(database, config)
+
+    assert database.commands == [(
+        ("collMod", "comments"), {"index": {"name": "deleted_at_ttl", "expireAfterSeconds": 3600}}
+    )]
+    await sync_index_options(FakeIndexDatabase({}), config)
+
+
+async def test_sync_index_options_rejects_changed_2d_bounds(monkeypatch):
+    """Prueba que unos límites del índice 2d distintos dan un error que explica cómo reconstruirlo."""
+    monkeypatch.setenv("COORDINATES_INDEX_MAX", "5000")
+    database = FakeIndexDatabase({"coordinates_2d_dashboard": {"min": -1e9, "max": 1e9}})
+
+    with pytest.raises(RuntimeError, match="dropIndex"):
+        await sync_index_options(database, Config())
+    assert database.commands == []
+
+
+async def test_pool_monitor_counts_connections():
+    """Prueba que el monitor lleva la cuenta de conexiones abiertas y en uso."""
+    monitor = PoolMonitor()
+    event = SimpleNamespace(address=("mongo_db", 27017))
+
+    monitor.pool_created(event)
+    monitor.connection_created(event)
+    monitor.connection_created(event)
+    monitor.connection_checked_out(event)
+    monitor.connection_check_out_failed(event)
+
+    assert monitor.stats() == {
+        "mongo_db:27017": {"open": 2, "checked_out": 1, "checkout_failures": 1, "cleared": 0}
+    }
+
+    monitor.connection_checked_in(event)
+    monitor.connection_closed(event)
+    assert monitor.stats()["mongo_db:27017"]["open"] == 1
+    assert monitor.stats()["mongo_db:27017"]["checked_out"] == 0
+
+
+async def test_readiness_reports_ping_latency(async_client: AsyncClient):
+    """Prueba que /health/ready hace ping a MongoDB y devuelve la latencia."""
+    response = await async_client.get("/health/ready")
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["status"] == "ready"
+    assert data["mongo"]["ping_ms"] >= 0
+    assert "pools" in data["mongo"]
+
+
+async def test_liveness(async_client: AsyncClient):
+    response = await async_client.get("/health/live")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"status": "alive"}
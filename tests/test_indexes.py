@@ -0,0 +1,142 @@
+import os
+
+import pytest
+from beanie import PydanticObjectId
+from pymongo import MongoClient
+
+from src.models import Comment, settings
+from src.routes.comments_routes import (
+    CHANGES_SORT,
+    DASHBOARD_SORT,
+    changes_query,
+    dashboard_page_query,
+    viewport_query,
+)
+
+# mongomock no implementa explain(), así que estas pruebas necesitan un
+# MongoDB real: MONGODB_TEST_URL=mongodb://localhost:27017 pytest
+MONGODB_TEST_URL = os.getenv("MONGODB_TEST_URL")
+
+requires_mongodb = pytest.mark.skipif(
+    not MONGODB_TEST_URL, reason="MONGODB_TEST_URL no está definido"
+)
+
+
+async def test_indexes_created_on_init():
+    """init_beanie crea los índices declarados en el modelo."""
+    index_info = await Comment.get_motor_collection().index_information()
+
+    assert {
+        "dashboard_created_at_id",
+        "dashboard_updated_at",
+        "dashboard_user",
+        "content_hashed",
+        "coordinates_2d_dashboard",
+        "deleted_at_ttl",
+    } <= set(index_info)
+    assert index_info["deleted_at_ttl"]["expireAfterSeconds"] == settings.COMMENT_TOMBSTONE_TTL_SECONDS
+
+
+@pytest.fixture(scope="module")
+def comments_collection():
+    """Colección real con los índices declarados en Comment.Settings."""
+    client = MongoClient(MONGODB_TEST_URL)
+    db = client["comments_service_index_tests"]
+    collection = db[Comment.Settings.name]
+    collection.drop()
+    collection.create_indexes(Comment.Settings.indexes)
+
+    dashboards = [PydanticObjectId() for _ in range(5)]
+    users = [PydanticObjectId() for _ in range(5)]
+    collection.insert_many([
+        Comment(
+            dashboard_id=dashboards[i % 5],
+            user_id=users[i % 5],
+            content=f"Comentario {i}",
+            coordinates=[float(i), float(i)],
+        ).model_dump(exclude={"id"})
+        for i in range(500)
+    ])
+
+    yield collection, dashboards, users
+
+    client.drop_database(db.name)
+    client.close()
+
+
+def _stages(plan):
+    """Recorre recursivamente un plan de ejecución y devuelve sus etapas."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+def _assert_no_collscan(cursor):
+    winning_plan = cursor.explain()["queryPlanner"]["winningPlan"]
+    stages = list(_stages(winning_plan))
+    assert "COLLSCAN" not in stages, f"Plan sin índice: {winning_plan}"
+
+
+@requires_mongodb
+def test_dashboard_listing_uses_index(comments_collection):
+    """El listado por tablero, primera página y siguientes, no debe recorrer toda la colección."""
+    collection, dashboards, _ = comments_collection
+    first_page = list(collection.find(dashboard_page_query(dashboards[0]), sort=DASHBOARD_SORT, limit=10))
+    after = (first_page[-1]["created_at"], first_page[-1]["_id"])
+    next_page = list(collection.find(dashboard_page_query(dashboards[0], after), sort=DASHBOARD_SORT, limit=10))
+
+    assert len(next_page) == 10
+    assert not {d["_id"] for d in first_page} & {d["_id"] for d in next_page}
+    _assert_no_collscan(collection.find(dashboard_page_query(dashboards[0]), sort=DASHBOARD_SORT, limit=10))
+    _assert_no_collscan(collection.find(dashboard_page_query(dashboards[0], after), sort=DASHBOARD_SORT, limit=10))
+
+
+@requires_mongodb
+def test_dashboard_user_lookup_uses_index(comments_collection):
+    """La búsqueda por tablero y usuario no debe recorrer toda la colección."""
+    collection, dashboards, users = comments_collection
+    _assert_no_collscan(
+        collection.find({"dashboard_id": dashboards[0], "user_id": users[0], "deleted_at": None})
+    )
+
+
+@requires_mongodb
+def test_content_lookup_uses_index(comments_collection):
+    """Las rutas por texto no deben recorrer toda la colección."""
+    collection, _, _ = comments_collection
+    # Mismo filtro que _update_comment_atomically y _soft_delete
+    _assert_no_collscan(collection.find({"content": "Comentario 42", "deleted_at": None}).limit(1))
+
+
+@requires_mongodb
+def test_viewport_query_uses_index(comments_collection):
+    """La consulta por viewport devuelve solo el rectángulo y usa un índice."""
+    collection, dashboards, _ = comments_collection
+    query = viewport_query(dashboards[0], 100, 100, 10, 10)
+
+    found = list(collection.find(query))
+    assert found
+    for document in found:
+        x, y = document["coordinates"]
+        assert 10 <= x <= 100 and 10 <= y <= 100
+        assert document["dashboard_id"] == dashboards[0]
+    _assert_no_collscan(collection.find(query))
+
+
+@requires_mongodb
+def test_dashboard_changes_use_index(comments_collection):
+    """/changes filtra por tablero y (updated_at, _id) sin recorrer toda la colección."""
+    collection, dashboards, _ = comments_collection
+    first = collection.find_one({"dashboard_id": dashboards[0]}, sort=CHANGES_SORT)
+    since = (first["updated_at"], first["_id"])
+
+    changes = list(collection.find(changes_query(dashboards[0], since), sort=CHANGES_SORT, limit=101))
+    assert len(changes) == 99
+    assert first["_id"] not in {d["_id"] for d in changes}
+    _assert_no_collscan(collection.find(changes_query(dashboards[0]), sort=CHANGES_SORT, limit=101))
+    _assert_no_collscan(collection.find(changes_query(dashboards[0], since), sort=CHANGES_SORT, limit=101))
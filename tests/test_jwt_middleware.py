@@ -0,0 +1,349 @@
+import asyncio
+import json
+import time
+
+from datetime import datetime, timezone
+
+import httpx
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+
+from src.middleware import jwt_middleware
+from src.middleware.jwt_middleware import CircuitBreaker, LocalTokenVerifier, TokenValidator, seconds_until_expiry
+
+pytestmark = pytest.mark.asyncio
+
+
+def _generate_key(kid: str):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+    return private_key, jwk
+
+
+SIGNING_KEY, SIGNING_JWK = _generate_key("key-1")
+OTHER_KEY, _ = _generate_key("key-2")
+
+
+def _token(private_key=SIGNING_KEY, kid="key-1", expires_in=300, **claims) -> str:
+    payload = {
+        "sub": "user-123",
+        "email": "ana@example.com",
+        "scopes": ["read", "write"],
+        "exp": int(time.time()) + expires_in,
+        **claims,
+    }
+    return jwt.encode(payload, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+class StubAuthService:
+    """Serves the JWKS and the remote validation endpoint through httpx.MockTransport."""
+
+    def __init__(self, jwks_keys=None, expires_in=60):
+        self.jwks = {"keys": jwks_keys if jwks_keys is not None else [SIGNING_JWK]}
+        self.jwks_requests = 0
+        self.validate_requests = 0
+        self.expires_in = expires_in
+        self.delay = 0.0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/.well-known/jwks.json":
+            self.jwks_requests += 1
+            return httpx.Response(200, json=self.jwks)
+        if request.url.path == "/auth/token/validate":
+            self.validate_requests += 1
+            await asyncio.sleep(self.delay)
+            if request.headers["Authorization"] == "Bearer revoked":
+                return httpx.Response(401)
+            return httpx.Response(200, json={
+                "valid": True, "user_id": "remote-user", "email": "remote@example.com",
+                "scopes": [], "expires_at": int(time.time()) + self.expires_in,
+            })
+        return httpx.Response(404)
+
+
+def _validator(mode: str, auth_service: StubAuthService) -> TokenValidator:
+    validator = TokenValidator(mode="remote")
+    validator.auth_service_url = "http://auth"
+    validator._client = httpx.AsyncClient(transport=httpx.MockTransport(auth_service.handler))
+    validator.mode = mode
+    validator.local_verifier = LocalTokenVerifier(
+        validator.get_client, jwks_url="http://auth/.well-known/jwks.json", algorithms=["RS256"]
+    )
+    return validator
+
+
+async def test_local_validation_uses_cached_jwks():
+    """Valid tokens are verified locally; the JWKS is fetched only once."""
+    auth_service = StubAuthService()
+    validator = _validator("local", auth_service)
+
+    for _ in range(3):
+        user = await validator.validate_token(_token())
+
+    assert user["user_id"] == "user-123"
+    assert user["email"] == "ana@example.com"
+    assert user["scopes"] == ["read", "write"]
+    assert auth_service.jwks_requests == 1
+    assert auth_service.validate_requests == 0
+    await validator.close()
+
+
+async def test_local_validation_rejects_bad_signature_and_expired_token():
+    """Tokens signed with another key or already expired are rejected with 401."""
+    validator = _validator("local", StubAuthService())
+
+    with pytest.raises(HTTPException) as forged:
+        await validator.validate_token(_token(private_key=OTHER_KEY))
+    with pytest.raises(HTTPException) as expired:
+        await validator.validate_token(_token(expires_in=-10))
+
+    assert forged.value.status_code == status.HTTP_401_UNAUTHORIZED
+    assert expired.value.status_code == status.HTTP_401_UNAUTHORIZED
+    await validator.close()
+
+
+async def test_unknown_kid_falls_back_to_remote_validation():
+    """A token whose kid is not in the JWKS is sent to the Auth Service in fallback mode."""
+    auth_service = StubAuthService()
+    validator = _validator("local_with_fallback", auth_service)
+
+    user = await validator.validate_token(_token(private_key=OTHER_KEY, kid="key-2"))
+
+    assert user["user_id"] == "remote-user"
+    assert auth_service.validate_requests == 1
+    await validator.close()
+
+
+async def test_unknown_kid_without_fallback_is_unavailable():
+    """Without fallback, an unverifiable token yields 503 instead of a remote call."""
+    auth_service = StubAuthService()
+    validator = _validator("local", auth_service)
+
+    with pytest.raises(HTTPException) as error:
+        await validator.validate_token(_token(private_key=OTHER_KEY, kid="key-2"))
+
+    assert error.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert auth_service.validate_requests == 0
+    await validator.close()
+
+
+async def test_rotated_key_is_picked_up_by_refresh():
+    """A new kid triggers an early JWKS refresh."""
+    rotated_key, rotated_jwk = _generate_key("key-3")
+    auth_service = StubAuthService()
+    validator = _validator("local", auth_service)
+    validator.local_verifier.min_refresh_interval = 0
+    await validator.validate_token(_token())
+
+    auth_service.jwks["keys"].append(rotated_jwk)
+    user = await validator.validate_token(_token(private_key=rotated_key, kid="key-3"))
+
+    assert user["user_id"] == "user-123"
+    assert auth_service.jwks_requests == 2
+    await validator.close()
+
+
+async def test_repeated_token_is_served_from_cache():
+    """The same bearer token reaches the Auth Service once."""
+    auth_service = StubAuthService()
+    validator = _validator("remote", auth_service)
+
+    for _ in range(50):
+        user = await validator.validate_token("token-a")
+
+    assert user["user_id"] == "remote-user"
+    assert auth_service.validate_requests == 1
+    stats = validator.cache_stats()
+    assert stats["hits"] == 49
+    assert stats["auth_service_calls"] == 1
+    assert stats["auth_service_calls_saved"] == 49
+    assert stats["hit_ratio"] == pytest.approx(49 / 50)
+    await validator.close()
+
+
+async def test_concurrent_validations_share_one_call():
+    """Concurrent validations of one token are coalesced into a single request."""
+    auth_service = StubAuthService()
+    auth_service.delay = 0.05
+    validator = _validator("remote", auth_service)
+
+    users = await asyncio.gather(*(validator.validate_token("token-a") for _ in range(20)))
+
+    assert all(user["user_id"] == "remote-user" for user in users)
+    assert auth_service.validate_requests == 1
+    assert validator.cache_stats()["coalesced"] == 19
+    await validator.close()
+
+
+async def test_cancelled_first_caller_does_not_cancel_the_others():
+    """The caller that started a shared validation can go away; the others still get the claims."""
+    auth_service = StubAuthService()
+    auth_service.delay = 0.05
+    validator = _validator("remote", auth_service)
+
+    leader = asyncio.create_task(validator.validate_token("token-a"))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(validator.validate_token("token-a"))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    user = await waiter
+    assert user["user_id"] == "remote-user"
+    assert leader.cancelled()
+    assert auth_service.validate_requests == 1
+    await validator.close()
+
+
+async def test_failed_validation_is_shared_but_not_cached():
+    """A rejection reaches every concurrent caller and is not remembered."""
+    auth_service = StubAuthService()
+    auth_service.delay = 0.05
+    validator = _validator("remote", auth_service)
+
+    results = await asyncio.gather(
+        *(validator.validate_token("revoked") for _ in range(5)), return_exceptions=True
+    )
+    assert all(isinstance(r, HTTPException) and r.status_code == 401 for r in results)
+    assert auth_service.validate_requests == 1
+
+    with pytest.raises(HTTPException):
+        await validator.validate_token("revoked")
+    assert auth_service.validate_requests == 2
+    await validator.close()
+
+
+async def test_expired_validation_is_not_cached():
+    """A result whose expires_at is already past is not cached."""
+    auth_service = StubAuthService(expires_in=-1)
+    validator = _validator("remote", auth_service)
+
+    await validator.validate_token("token-a")
+    await validator.validate_token("token-a")
+
+    assert auth_service.validate_requests == 2
+    await validator.close()
+
+
+async def test_seconds_until_expiry_accepts_epoch_and_iso():
+    now = time.time()
+    iso = datetime.fromtimestamp(now + 30, timezone.utc).isoformat().replace("+00:00", "Z")
+
+    assert seconds_until_expiry(int(now) + 30) == pytest.approx(30, abs=1)
+    assert seconds_until_expiry(iso) == pytest.approx(30, abs=1)
+    assert seconds_until_expiry(None) is None
+    assert seconds_until_expiry("not a date") is None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _stub_auth_app() -> FastAPI:
+    """Auth Service stub served over ASGI; app.state.healthy toggles 500 responses."""
+    app = FastAPI()
+    app.state.healthy = True
+    app.state.requests = 0
+
+    @app.post("/auth/token/validate")
+    async def validate(request: Request):
+        app.state.requests += 1
+        if not app.state.healthy:
+            return JSONResponse({"detail": "down"}, status_code=500)
+        return {"valid": True, "user_id": "asgi-user", "email": None,
+                "scopes": [], "expires_at": int(time.time()) + 300}
+
+    return app
+
+
+def _asgi_validator(app: FastAPI, breaker: CircuitBreaker, cache_ttl: float = 60) -> TokenValidator:
+    validator = TokenValidator(mode="remote", cache_ttl=cache_ttl, breaker=breaker)
+    validator.auth_service_url = "http://auth"
+    validator._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    return validator
+
+
+async def test_circuit_opens_and_fails_fast():
+    """After repeated 5xx the Auth Service is no longer called until the reset timeout."""
+    app = _stub_auth_app()
+    app.state.healthy = False
+    clock = FakeClock()
+    validator = _asgi_validator(app, CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=clock))
+
+    for i in range(10):
+        with pytest.raises(HTTPException) as error:
+            await validator.validate_token(f"token-{i}")
+        assert error.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    assert app.state.requests == 3
+    assert validator.cache_stats()["circuit_state"] == "open"
+    assert validator.cache_stats()["circuit_rejections"] == 7
+    await validator.close()
+
+
+async def test_half_open_trial_closes_circuit():
+    """Once the reset timeout elapses one trial call goes through and closes the circuit."""
+    app = _stub_auth_app()
+    app.state.healthy = False
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    validator = _asgi_validator(app, breaker)
+    with pytest.raises(HTTPException):
+        await validator.validate_token("token-a")
+
+    app.state.healthy = True
+    clock.now = 31
+    user = await validator.validate_token("token-b")
+
+    assert user["user_id"] == "asgi-user"
+    assert breaker.state == "closed"
+    await validator.close()
+
+
+async def test_failed_half_open_trial_reopens_circuit():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 31
+
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+
+async def test_cached_validation_is_served_while_auth_service_is_down():
+    """A token validated earlier is still accepted after its cache TTL while the circuit is open."""
+    app = _stub_auth_app()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=FakeClock())
+    validator = _asgi_validator(app, breaker, cache_ttl=0)
+    await validator.validate_token("token-a")
+
+    app.state.healthy = False
+    with pytest.raises(HTTPException):
+        await validator.validate_token("token-b")
+    user = await validator.validate_token("token-a")
+
+    assert breaker.state == "open"
+    assert user["user_id"] == "asgi-user"
+    assert app.state.requests == 2
+    assert validator.cache_stats()["stale_served"] == 1
+    await validator.close()
+
+
+async def test_client_uses_configured_pool_and_timeouts():
+    validator = TokenValidator(mode="remote")
+    client = await validator.get_client()
+
+    assert client.timeout.connect == jwt_middleware.AUTH_CONNECT_TIMEOUT
+    assert client.timeout.read == jwt_middleware.AUTH_READ_TIMEOUT
+    await validator.close()
@@ -0,0 +1,78 @@
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from prometheus_client import CollectorRegistry, generate_latest
+
+from src.metrics import ConnectionCollector, DashboardCacheCollector, TokenCacheCollector
+from src.models import Comment
+from src.websocket_manager import CommentConnectionManager, comment_connection_manager
+from tests.conftest import FakeWebSocket
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_metrics_endpoint_records_route_and_mongo_latency(async_client: AsyncClient, created_comment: Comment):
+    """Prueba que /metrics expone la latencia por plantilla de ruta y por operación de MongoDB."""
+    await async_client.get(f"/comments/{created_comment.id}")
+
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/comments/{comment_id}",status="200"}' in body
+    assert 'mongo_operation_duration_seconds_count{operation="find_one"}' in body
+
+
+async def test_metrics_endpoint_reports_connections_and_fanout(async_client: AsyncClient, subscribe_dashboard):
+    """Prueba que las conexiones por tablero y el fan-out aparecen en /metrics."""
+    await subscribe_dashboard("d1")
+    await subscribe_dashboard("d1")
+    await comment_connection_manager.broadcast_comment_deleted("d1", "c1")
+    await comment_connection_manager.wait_until_idle()
+
+    body = (await async_client.get("/metrics")).text
+
+    assert 'ws_active_connections{dashboard_id="d1"} 2.0' in body
+    assert "ws_broadcast_fanout_duration_seconds_count" in body
+
+
+async def test_connection_collector_reports_queue_depths():
+    """Prueba que las colas pendientes se leen en el momento del scrape."""
+    manager = CommentConnectionManager()
+    registry = CollectorRegistry()
+    registry.register(ConnectionCollector(manager))
+    await manager.connect(FakeWebSocket(), "d1")
+    await manager.connect(FakeWebSocket(), "d2")
+    manager.active_connections["d1"][next(iter(manager.active_connections["d1"]))].enqueue("x")
+
+    assert registry.get_sample_value("ws_active_connections_total") == 2
+    assert registry.get_sample_value("ws_send_queue_depth") == 1
+    await manager.shutdown()
+
+
+async def test_token_cache_collector_exposes_counters():
+    registry = CollectorRegistry()
+    registry.register(TokenCacheCollector(lambda: {
+        "hits": 9, "coalesced": 0, "misses": 1, "stale_served": 0, "auth_service_calls": 1,
+        "circuit_rejections": 0, "entries": 1, "hit_ratio": 0.9, "circuit_state": "closed",
+    }))
+
+    assert registry.get_sample_value("auth_token_cache_hits_total") == 9
+    assert registry.get_sample_value("auth_token_cache_hit_ratio") == 0.9
+    assert registry.get_sample_value("auth_circuit_open") == 0
+    assert b"auth_token_cache_misses_total 1.0" in generate_latest(registry)
+
+
+async def test_dashboard_cache_collector_exposes_stats():
+    """Prueba que las estadísticas de la caché del listado se exportan como contadores y gauges."""
+    registry = CollectorRegistry()
+    registry.register(DashboardCacheCollector(lambda: {
+        "entries": 2, "bytes": 512, "local_hits": 7, "shared_hits": 3, "misses": 1,
+    }))
+
+    assert registry.get_sample_value("comments_cache_local_hits_total") == 7
+    assert registry.get_sample_value("comments_cache_shared_hits_total") == 3
+    assert registry.get_sample_value("comments_cache_misses_total") == 1
+    assert registry.get_sample_value("comments_cache_entries") == 2
+    assert registry.get_sample_value("comments_cache_bytes") == 512
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from src.moves import MoveCoalescer
+
+pytestmark = pytest.mark.asyncio
+
+
+class RecordingPersist:
+    """Registra las posiciones escritas; delay simula la latencia de MongoDB."""
+
+    def __init__(self, delay: float = 0.0):
+        self.calls = []
+        self.delay = delay
+
+    async def __call__(self, dashboard_id, comment_id, coordinates):
+        await asyncio.sleep(self.delay)
+        self.calls.append((dashboard_id, comment_id, coordinates))
+
+
+async def test_moves_are_coalesced_into_one_write():
+    """Prueba que muchos movimientos seguidos producen una sola escritura con la última posición."""
+    persist = RecordingPersist()
+    coalescer = MoveCoalescer(persist, interval_seconds=0.02)
+
+    for i in range(50):
+        coalescer.move("d1", "c1", [float(i), 0.0])
+    await asyncio.sleep(0.05)
+
+    assert persist.calls == [("d1", "c1", [49.0, 0.0])]
+    assert coalescer.moves == 50
+    assert coalescer.writes == 1
+    assert coalescer.pending_count() == 0
+
+
+async def test_each_comment_is_written_separately():
+    persist = RecordingPersist()
+    coalescer = MoveCoalescer(persist, interval_seconds=0.01)
+
+    coalescer.move("d1", "c1", [1.0, 1.0])
+    coalescer.move("d1", "c2", [2.0, 2.0])
+    await asyncio.sleep(0.03)
+
+    assert sorted(persist.calls) == [("d1", "c1", [1.0, 1.0]), ("d1", "c2", [2.0, 2.0])]
+
+
+async def test_move_during_write_is_written_next_interval():
+    """Prueba que una posición recibida durante una escritura no se pierde."""
+    persist = RecordingPersist(delay=0.02)
+    coalescer = MoveCoalescer(persist, interval_seconds=0.01)
+
+    coalescer.move("d1", "c1", [1.0, 1.0])
+    await asyncio.sleep(0.02)
+    coalescer.move("d1", "c1", [2.0, 2.0])
+    await asyncio.sleep(0.08)
+
+    assert [call[2] for call in persist.calls] == [[1.0, 1.0], [2.0, 2.0]]
+    assert coalescer.pending_count() == 0
+
+
+async def test_flush_writes_pending_positions():
+    persist = RecordingPersist()
+    coalescer = MoveCoalescer(persist, interval_seconds=60)
+
+    coalescer.move("d1", "c1", [3.0, 4.0])
+    await coalescer.flush()
+
+    assert persist.calls == [("d1", "c1", [3.0, 4.0])]
+    assert coalescer.pending_count() == 0
@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from beanie import PydanticObjectId
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+from src.read_routing import ReadRouter, read_router
+from tests.test_cache import FakeClock
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeCollection:
+    """Colección que solo registra las preferencias de lectura pedidas."""
+
+    def __init__(self, read_preference=None, client=None):
+        self.full_name = "test_db.comments"
+        self.read_preference = read_preference
+        self.database = SimpleNamespace(client=client or object())
+
+    def with_options(self, read_preference):
+        return FakeCollection(read_preference, self.database.client)
+
+
+def _router(clock: FakeClock, enabled: bool = True) -> ReadRouter:
+    return ReadRouter(
+        enabled=enabled, max_staleness_seconds=90, recent_write_window_seconds=90, clock=clock
+    )
+
+
+async def test_reads_go_to_secondaries_with_max_staleness():
+    """Prueba que sin escrituras recientes la lectura va a un secundario."""
+    router = _router(FakeClock())
+
+    collection = router.collection_for_read(FakeCollection(), "d1")
+
+    assert isinstance(collection.read_preference, SecondaryPreferred)
+    assert collection.read_preference.max_staleness == 90
+
+
+async def test_recent_write_keeps_reads_on_primary_until_window_closes():
+    """Prueba que tras escribir en un tablero sus lecturas van al primario durante la ventana."""
+    clock = FakeClock()
+    router = _router(clock)
+    router.note_write("d1", "c1")
+
+    assert router.collection_for_read(FakeCollection(), "d1").read_preference == Primary()
+    assert router.collection_for_read(FakeCollection(), "c1").read_preference == Primary()
+    assert isinstance(router.collection_for_read(FakeCollection(), "d2").read_preference, SecondaryPreferred)
+
+    clock.now = 91
+    assert isinstance(router.collection_for_read(FakeCollection(), "d1").read_preference, SecondaryPreferred)
+
+
+async def test_disabled_router_returns_collection_unchanged():
+    """Prueba que desactivado no se cambia la preferencia de lectura del cliente."""
+    router = _router(FakeClock(), enabled=False)
+    collection = FakeCollection()
+
+    assert router.collection_for_read(collection, "d1") is collection
+    assert router.read_preference("d1") == Primary()
+
+
+async def test_routed_collections_are_reused():
+    router = _router(FakeClock())
+    collection = FakeCollection()
+
+    assert router.collection_for_read(collection, "d1") is router.collection_for_read(collection, "d2")
+
+
+async def test_write_routes_record_recent_writes(async_client: AsyncClient):
+    """Prueba que crear un comentario marca el tablero y el comentario como escritos."""
+    dashboard_id = PydanticObjectId()
+    response = await async_client.post(
+        f"/comments/dashboards/{dashboard_id}/users/{PydanticObjectId()}/comments",
+        json={"content": "Nuevo", "coordinates": "1,1"},
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert read_router.recently_wrote(dashboard_id)
+    assert read_router.recently_wrote(response.json()["_id"])
+
+
+async def test_changes_feed_reads_from_primary(async_client: AsyncClient, monkeypatch):
+    """Prueba que /changes no pasa por el enrutado a secundarios, aunque esté activado."""
+    routed = []
+
+    def collection_for_read(collection, *keys):
+        routed.append(keys)
+        return collection
+
+    monkeypatch.setattr(read_router, "enabled", True)
+    monkeypatch.setattr(read_router, "collection_for_read", collection_for_read)
+
+    response = await async_client.get(f"/comments/dashboards/{PydanticObjectId()}/changes")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert routed == []
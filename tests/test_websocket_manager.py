@@ -0,0 +1,407 @@
+import asyncio
+import json
+import logging
+
+import mongomock_motor
+import msgpack
+import pytest
+import uvicorn
+from fastapi import FastAPI, WebSocket, status
+from websockets.asyncio.client import connect
+
+from app import server_options
+from src.backplane import InMemoryBackplane, MongoChangeStreamBackplane
+from src.cache import CachedResponse, dashboard_comments_cache
+from src.config import Config
+from src.websocket_manager import CommentConnectionManager, EventLog, encode_snapshot
+from tests.conftest import FakeWebSocket
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_broadcast_reaches_sockets_on_other_workers():
+    """A comment created on worker A reaches a socket held by worker B."""
+    backplane = InMemoryBackplane()
+    worker_a = CommentConnectionManager(backplane)
+    worker_b = CommentConnectionManager(backplane)
+    socket_a = FakeWebSocket()
+    socket_b = FakeWebSocket()
+    await worker_a.connect(socket_a, "d1")
+    await worker_b.connect(socket_b, "d1")
+
+    await worker_a.broadcast_comment_deleted("d1", "c1")
+    await worker_a.wait_until_idle()
+    await worker_b.wait_until_idle()
+
+    assert len(socket_a.sent) == len(socket_b.sent) == 1
+    message = json.loads(socket_b.sent[0])
+    assert isinstance(message.pop("seq"), int)
+    assert message == {"type": "comment_deleted", "data": {"comment_id": "c1"}}
+
+
+async def test_broadcast_without_local_connections_is_still_published():
+    """A worker with no sockets on the dashboard still publishes the event."""
+    backplane = InMemoryBackplane()
+    worker_a = CommentConnectionManager(backplane)
+    worker_b = CommentConnectionManager(backplane)
+    socket_b = FakeWebSocket()
+    await worker_b.connect(socket_b, "d1")
+
+    await worker_a.broadcast_comment_deleted("d1", "c1")
+    await worker_b.wait_until_idle()
+
+    assert worker_a.get_connection_count("d1") == 0
+    assert len(socket_b.sent) == 1
+
+
+async def test_mongo_backplane_publish_stores_event():
+    """The MongoDB backplane publishes by inserting into the events collection."""
+    collection = mongomock_motor.AsyncMongoMockClient()["test_db"]["comment_events"]
+    backplane = MongoChangeStreamBackplane(collection)
+
+    await backplane.publish("d1", '{"type": "comment_deleted"}')
+
+    event = await collection.find_one({"dashboard_id": "d1"})
+    assert event["message"] == '{"type": "comment_deleted"}'
+    assert event["created_at"] is not None
+
+
+class StalledWebSocket(FakeWebSocket):
+    """A client whose network never drains."""
+
+    def __init__(self):
+        super().__init__()
+        self.unblock = asyncio.Event()
+
+    async def send_text(self, data: str):
+        await self.unblock.wait()
+        await super().send_text(data)
+
+
+class BrokenWebSocket(FakeWebSocket):
+    async def send_text(self, data: str):
+        raise RuntimeError("connection reset")
+
+
+async def test_slow_client_does_not_block_broadcast_and_is_evicted():
+    """A stalled client overflows its own queue and is dropped; others keep receiving."""
+    manager = CommentConnectionManager(send_queue_size=2)
+    stalled = StalledWebSocket()
+    healthy = FakeWebSocket()
+    await manager.connect(stalled, "d1")
+    await manager.connect(healthy, "d1")
+
+    for i in range(5):
+        await asyncio.wait_for(manager.broadcast_comment_deleted("d1", f"c{i}"), timeout=1)
+    await manager.wait_until_idle()
+
+    assert len(healthy.sent) == 5
+    assert manager.get_connection_count("d1") == 1
+    await asyncio.sleep(0)
+    assert stalled.close_code == status.WS_1008_POLICY_VIOLATION
+
+
+async def test_send_error_disconnects_client():
+    """A client whose send fails is removed from the dashboard."""
+    manager = CommentConnectionManager()
+    await manager.connect(BrokenWebSocket(), "d1")
+
+    await manager.broadcast_comment_deleted("d1", "c1")
+    await manager.wait_until_idle()
+
+    assert manager.get_connection_count("d1") == 0
+
+
+async def test_broadcast_logs_are_sampled(caplog):
+    """Only one broadcast in broadcast_log_every is logged at INFO, per event type."""
+    manager = CommentConnectionManager(broadcast_log_every=10)
+    caplog.set_level(logging.INFO, logger="src.websocket_manager")
+
+    for i in range(25):
+        await manager.broadcast_comment_deleted("d1", f"c{i}")
+    await manager.broadcast_comments_deleted_batch("d1", ["c1", "c2"])
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert len([m for m in messages if m.startswith("Broadcasted comment_deleted ")]) == 3
+    assert len([m for m in messages if m.startswith("Broadcasted comments_deleted_batch ")]) == 1
+
+
+async def test_moved_event_skips_sender():
+    """comment_moved reaches every other socket, on every worker, but not the one that moved the comment."""
+    backplane = InMemoryBackplane()
+    worker_a = CommentConnectionManager(backplane)
+    worker_b = CommentConnectionManager(backplane)
+    mover, peer, remote_peer = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    connection = await worker_a.connect(mover, "d1")
+    await worker_a.connect(peer, "d1")
+    await worker_b.connect(remote_peer, "d1")
+
+    await worker_a.broadcast_comment_moved("d1", "c1", [1.5, 2.0], sender=connection.id)
+    await worker_a.wait_until_idle()
+    await worker_b.wait_until_idle()
+
+    assert mover.sent == []
+    assert json.loads(peer.sent[0]) == {
+        "type": "comment_moved", "data": {"comment_id": "c1", "coordinates": [1.5, 2.0]}
+    }
+    assert remote_peer.sent == peer.sent
+
+
+
+async def _frames(socket: FakeWebSocket) -> list:
+    return [json.loads(m) for m in socket.sent]
+
+
+async def test_frames_carry_consecutive_seq():
+    manager = CommentConnectionManager()
+    socket = FakeWebSocket()
+    await manager.connect(socket, "d1")
+
+    for i in range(3):
+        await manager.broadcast_comment_deleted("d1", f"c{i}")
+    await manager.wait_until_idle()
+
+    seqs = [frame["seq"] for frame in await _frames(socket)]
+    assert seqs == list(range(seqs[0], seqs[0] + 3))
+
+
+async def test_reconnect_with_last_seq_replays_missed_events():
+    """Events broadcast while the client was away are replayed, in order, before live ones."""
+    manager = CommentConnectionManager()
+    first = FakeWebSocket()
+    await manager.connect(first, "d1")
+    await manager.broadcast_comment_deleted("d1", "c0")
+    await manager.wait_until_idle()
+    last_seq = json.loads(first.sent[-1])["seq"]
+    await manager.disconnect(first, "d1")
+
+    await manager.broadcast_comment_deleted("d1", "c1")
+    await manager.broadcast_comment_deleted("d1", "c2")
+    await manager.wait_until_idle()
+    second = FakeWebSocket()
+    connection = await manager.connect(second, "d1", last_seq=last_seq)
+    await manager.broadcast_comment_deleted("d1", "c3")
+    await manager.wait_until_idle()
+    await asyncio.sleep(0)
+
+    frames = await _frames(second)
+    assert not connection.needs_snapshot
+    assert [f["data"]["comment_id"] for f in frames] == ["c1", "c2", "c3"]
+    assert [f["seq"] for f in frames] == [last_seq + 1, last_seq + 2, last_seq + 3]
+
+
+async def test_gap_larger_than_log_needs_snapshot():
+    """A last_seq the log no longer covers leaves the connection waiting for a snapshot."""
+    manager = CommentConnectionManager(replay_buffer_size=2)
+    first = FakeWebSocket()
+    await manager.connect(first, "d1")
+    await manager.broadcast_comment_deleted("d1", "c0")
+    await manager.wait_until_idle()
+    last_seq = json.loads(first.sent[-1])["seq"]
+    for i in range(1, 4):
+        await manager.broadcast_comment_deleted("d1", f"c{i}")
+    await manager.wait_until_idle()
+
+    second = FakeWebSocket()
+    connection = await manager.connect(second, "d1", last_seq=last_seq)
+    await manager.broadcast_comment_deleted("d1", "c4")
+    await manager.wait_until_idle()
+
+    assert connection.needs_snapshot
+    assert connection.snapshot_seq == last_seq + 3
+    assert second.sent == []
+    assert connection.queue.qsize() == 1
+
+    connection.start()
+    await manager.wait_until_idle()
+    assert [f["seq"] for f in await _frames(second)] == [last_seq + 4]
+
+
+async def test_event_log_rejects_unknown_seq():
+    log = EventLog(max_events=3)
+    base = log.last_seq
+    for i in range(5):
+        log.append('{"type":"x","data":%d}' % i)
+
+    assert log.since(base + 5) == []
+    assert [json.loads(f)["data"] for f in log.since(base + 3)] == [3, 4]
+    assert log.since(base + 1) is None
+    assert log.since(base + 6) is None
+
+
+async def test_snapshot_connection_holds_live_events_until_started():
+    """With snapshot=True the sender waits; events broadcast meanwhile follow the snapshot."""
+    manager = CommentConnectionManager()
+    socket = FakeWebSocket()
+    connection = await manager.connect(socket, "d1", snapshot=True)
+    await manager.broadcast_comment_deleted("d1", "c1")
+    await manager.wait_until_idle()
+
+    assert connection.needs_snapshot
+    assert socket.sent == []
+
+    for frame in encode_snapshot(connection.snapshot_seq, b'[{"_id": "c0"}]', chunk_size=10):
+        await socket.send_text(frame)
+    connection.start()
+    await manager.wait_until_idle()
+
+    frames = [json.loads(m) for m in socket.sent]
+    assert [f["type"] for f in frames] == ["snapshot", "comment_deleted"]
+    assert frames[1]["seq"] == frames[0]["seq"] + 1
+
+
+async def test_encode_snapshot_splits_large_boards():
+    comments = json.dumps([{"_id": f"c{i}"} for i in range(5)]).encode()
+
+    frames = [json.loads(f) for f in encode_snapshot(7, comments, chunk_size=2)]
+
+    assert [len(f["data"]["comments"]) for f in frames] == [2, 2, 1]
+    assert [f["data"]["done"] for f in frames] == [False, False, True]
+    assert {f["seq"] for f in frames} == {7}
+
+
+async def test_delivered_event_drops_local_cached_list():
+    """An event from any worker invalidates this process's cached list of the dashboard."""
+    manager = CommentConnectionManager()
+    await dashboard_comments_cache.set("d1", CachedResponse(b"[]", 'W/"0-0"'), dashboard_comments_cache.generation)
+
+    await manager.deliver_local("d1", '{"type":"comment_deleted","data":{}}')
+
+    assert await dashboard_comments_cache.get("d1") is None
+
+
+async def test_msgpack_clients_get_binary_frames_encoded_once():
+    """Binary clients share one packed frame per event; JSON clients are unaffected."""
+    manager = CommentConnectionManager()
+    text, first, second = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await manager.connect(text, "d1")
+    await manager.connect(first, "d1", encoding="msgpack")
+    await manager.connect(second, "d1", encoding="msgpack")
+
+    await manager.broadcast_comment_deleted("d1", "c1")
+    await manager.wait_until_idle()
+
+    assert isinstance(text.sent[0], str)
+    assert first.sent[0] is second.sent[0]
+    assert msgpack.unpackb(first.sent[0]) == json.loads(text.sent[0])
+
+
+async def test_msgpack_replay_is_transcoded():
+    manager = CommentConnectionManager()
+    first = FakeWebSocket()
+    await manager.connect(first, "d1")
+    await manager.broadcast_comment_deleted("d1", "c0")
+    await manager.broadcast_comment_deleted("d1", "c1")
+    await manager.wait_until_idle()
+    last_seq = json.loads(first.sent[0])["seq"]
+
+    second = FakeWebSocket()
+    await manager.connect(second, "d1", last_seq=last_seq, encoding="msgpack")
+    await asyncio.sleep(0)
+
+    assert [msgpack.unpackb(m) for m in second.sent] == [json.loads(first.sent[1])]
+
+
+def _comment(comment_id: str, content: str) -> dict:
+    return {"_id": comment_id, "dashboard_id": "d1", "user_id": "u1", "content": content,
+            "coordinates": [0.0, 0.0], "version": 0}
+
+
+async def test_batch_window_merges_events_into_one_frame():
+    """Within the window a dashboard gets one numbered "batch" frame; updates of a comment collapse."""
+    manager = CommentConnectionManager(batch_window=0.01)
+    socket = FakeWebSocket()
+    await manager.connect(socket, "d1")
+
+    await manager.broadcast_comment_created("d1", _comment("c1", "a"))
+    await manager.broadcast_comment_updated("d1", _comment("c1", "b"))
+    await manager.broadcast_comment_updated("d2", _comment("x", "other dashboard"))
+    await manager.broadcast_comment_updated("d1", _comment("c2", "a"))
+    await manager.broadcast_comment_updated("d1", _comment("c2", "b"))
+    await manager.broadcast_comment_deleted("d1", "c3")
+    await asyncio.sleep(0.05)
+    await manager.wait_until_idle()
+
+    assert len(socket.sent) == 1
+    frame = json.loads(socket.sent[0])
+    assert frame["type"] == "batch"
+    events = frame["data"]["events"]
+    assert [(e["type"], e["data"].get("content")) for e in events] == [
+        ("comment_created", "b"), ("comment_updated", "b"), ("comment_deleted", None)
+    ]
+    assert "seq" not in events[0]
+
+
+async def test_batch_window_is_flushed_before_other_events():
+    manager = CommentConnectionManager(batch_window=60)
+    socket = FakeWebSocket()
+    await manager.connect(socket, "d1")
+
+    await manager.broadcast_comment_deleted("d1", "c1")
+    await manager.broadcast_comments_deleted_batch("d1", ["c2", "c3"])
+    await manager.wait_until_idle()
+
+    frames = await _frames(socket)
+    assert [f["type"] for f in frames] == ["comment_deleted", "comments_deleted_batch"]
+    assert frames[1]["seq"] == frames[0]["seq"] + 1
+
+
+class CountingBackplane(InMemoryBackplane):
+    def __init__(self):
+        super().__init__()
+        self.published = []
+
+    async def publish(self, dashboard_id, message, sender=None):
+        self.published.append(message)
+        await super().publish(dashboard_id, message, sender)
+
+
+async def test_moves_are_throttled_per_comment_before_the_backplane():
+    """A drag publishes its first position at once and then only the latest one per interval."""
+    backplane = CountingBackplane()
+    manager = CommentConnectionManager(backplane, move_interval=0.02)
+    peer = FakeWebSocket()
+    await manager.connect(peer, "d1")
+
+    for i in range(20):
+        await manager.broadcast_comment_moved("d1", "c1", [float(i), 0.0], sender="mover")
+    await manager.broadcast_comment_moved("d1", "c2", [9.0, 9.0], sender="mover")
+    await asyncio.sleep(0.05)
+    await manager.wait_until_idle()
+
+    positions = [(f["data"]["comment_id"], f["data"]["coordinates"]) for f in await _frames(peer)]
+    assert positions == [("c1", [0.0, 0.0]), ("c2", [9.0, 9.0]), ("c1", [19.0, 0.0])]
+    assert len(backplane.published) == 3
+    await manager.shutdown()
+
+
+async def _handshake_extensions(**options):
+    """Sec-WebSocket-Extensions answered by a real uvicorn server started with the given options."""
+    probe = FastAPI()
+
+    @probe.websocket("/ws")
+    async def echo(websocket: WebSocket):
+        await websocket.accept()
+        await websocket.close()
+
+    server = uvicorn.Server(uvicorn.Config(probe, log_level="error", lifespan="off", **{**options, "port": 0}))
+    serving = asyncio.create_task(server.serve())
+    try:
+        while not server.started:
+            await asyncio.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        async with connect(f"ws://127.0.0.1:{port}/ws", compression="deflate") as client:
+            return client.response.headers.get("Sec-WebSocket-Extensions")
+    finally:
+        server.should_exit = True
+        await serving
+
+
+@pytest.mark.parametrize("deflate, negotiated", [("true", True), ("false", False)])
+async def test_handshake_negotiates_permessage_deflate_unless_disabled(monkeypatch, deflate, negotiated):
+    """uvicorn accepts permessage-deflate by default; WS_PER_MESSAGE_DEFLATE=false turns it off."""
+    monkeypatch.setenv("WS_PER_MESSAGE_DEFLATE", deflate)
+    monkeypatch.setenv("SERVICE_HOST", "127.0.0.1")
+    extensions = await _handshake_extensions(**server_options(Config()))
+
+    assert ("permessage-deflate" in (extensions or "")) is negotiated